@@ -1,12 +1,26 @@
 
-import os, uuid, random
-from flask import Flask, render_template, request, redirect, url_for, jsonify, session, send_from_directory, flash, abort
-from werkzeug.utils import secure_filename
-from werkzeug.security import generate_password_hash, check_password_hash
+import os, uuid, random, json, base64, zlib, hmac
+from flask import Flask, render_template, request, redirect, url_for, jsonify, session, flash, abort, make_response, g
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge, UnsupportedMediaType
 from db import Database
+from sqlite_store import migrate_json_to_sqlite
+from page_cache import PageCache
+from mail_queue import MailQueue
+from smtp_pool import SMTPPool
+from uploads import UploadStore
+from images import ImageVariants, srcset, variant
+from assets import Assets
+from viewmodels import View
+from search import SearchIndex
+from suggest import Suggester
+from hashing import PasswordHasher, HashingBusy
+from sessions import ServerSessionInterface, MemoryStore, SQLiteSessionStore
+from compression import Compressor
+from metrics import Metrics
 from dotenv import load_dotenv
 from flask_mail import Mail, Message
 from functools import wraps
+import click
 import datetime as dt
 
 
@@ -14,13 +28,68 @@ load_dotenv()
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY','dev-secret-key')
+# Sessions live on the server and the cookie carries only a random id.
+# SESSION_BACKEND: 'sqlite' (SESSION_DB, shared by all workers), 'memory'
+# (single process only) or 'cookie' (Flask's signed cookie). Sessions end
+# after SESSION_IDLE_MINUTES without a request.
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'sqlite').lower()
+SESSION_DB = os.environ.get('SESSION_DB', os.path.join(os.getcwd(), 'sessions.sqlite3'))
+SESSION_IDLE_MINUTES = int(os.environ.get('SESSION_IDLE_MINUTES', 24 * 60))
+session_store = None
+if SESSION_BACKEND in ('sqlite', 'memory'):
+    session_store = SQLiteSessionStore(SESSION_DB) if SESSION_BACKEND == 'sqlite' else MemoryStore()
+    app.session_interface = ServerSessionInterface(session_store, idle=SESSION_IDLE_MINUTES * 60)
+# After `flask build-assets`, url_for('static', ...) points at fingerprinted,
+# precompressed copies served with year-long caching.
+assets = Assets(app)
 UPLOAD_FOLDER = os.path.join(os.getcwd(), 'static', 'uploads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Uploads are stored once per distinct content, named by SHA-256 digest.
+uploads = UploadStore(UPLOAD_FOLDER)
 
 ALLOWED_IMG = {'png','jpg','jpeg','gif'}
 ALLOWED_DOC = {'pdf','doc','docx'}
 
+# Request body caps. Uploaded files are streamed to disk as they arrive and
+# checked (type by magic bytes, size) on the way; a request declaring a
+# larger Content-Length than its endpoint allows is refused unread.
+MB = 1024 * 1024
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 16)) * MB
+UPLOAD_LIMITS = {
+    'edit_profile': 4 * MB,
+    'add_faculty': 12 * MB, 'edit_faculty': 12 * MB,
+    'add_event': 8 * MB, 'edit_event': 8 * MB,
+    'add_gallery_item': 8 * MB,
+    'add_alumni': 4 * MB,
+    'api_blog_post': 12 * MB,
+    'add_research': 32 * MB,
+    'add_notification': 32 * MB,
+    'admin_csa_past_add': 32 * MB,
+    'upload_curriculum': 32 * MB,
+}
+# File types each endpoint accepts; a file of another type is refused (415)
+# while the body is still arriving. Endpoints not listed accept any type
+# (add_notification takes arbitrary attachments).
+UPLOAD_TYPES = {
+    'edit_profile': ALLOWED_IMG,
+    'add_faculty': ALLOWED_IMG | ALLOWED_DOC, 'edit_faculty': ALLOWED_IMG | ALLOWED_DOC,
+    'add_event': ALLOWED_IMG, 'edit_event': ALLOWED_IMG,
+    'add_gallery_item': ALLOWED_IMG,
+    'add_alumni': ALLOWED_IMG,
+    'api_blog_post': ALLOWED_IMG | ALLOWED_DOC,
+    'add_research': {'pdf'},
+    'admin_csa_past_add': {'pdf'},
+    'upload_curriculum': {'pdf'},
+}
+app.request_class = uploads.request_class(UPLOAD_LIMITS, UPLOAD_TYPES)
+# Behind nginx, let it send upload bodies: set UPLOADS_ACCEL_PREFIX to an
+# internal location aliasing UPLOAD_FOLDER, e.g.
+#   location /_uploads/ { internal; alias /srv/portal/static/uploads/; }
+# USE_X_SENDFILE does the same for Apache / lighttpd (X-Sendfile).
+UPLOADS_ACCEL_PREFIX = os.environ.get('UPLOADS_ACCEL_PREFIX', '')
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE','false').lower() == 'true'
+
 # Mail config
 app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER','smtp.gmail.com')
 app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
@@ -31,23 +100,237 @@ app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD','')
 app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', app.config['MAIL_USERNAME'])
 
 mail = Mail(app)
+# Outgoing mail is spooled to disk and sent by background workers, so request
+# handlers never wait on SMTP; failed sends are retried with backoff.
+MAIL_QUEUE_DIR = os.environ.get('MAIL_QUEUE_DIR', os.path.join(os.getcwd(), 'mail_spool'))
+MAIL_QUEUE_WORKERS = int(os.environ.get('MAIL_QUEUE_WORKERS', 2))
+MAIL_MAX_ATTEMPTS = int(os.environ.get('MAIL_MAX_ATTEMPTS', 6))
+# Workers send over a small pool of kept-open SMTP connections, up to
+# MAIL_BATCH_SIZE queued messages per connection checkout.
+SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE', MAIL_QUEUE_WORKERS or 1))
+MAIL_BATCH_SIZE = int(os.environ.get('MAIL_BATCH_SIZE', 20))
+smtp_pool = SMTPPool(mail, size=SMTP_POOL_SIZE)
+mail_queue = MailQueue(app, mail, MAIL_QUEUE_DIR, workers=MAIL_QUEUE_WORKERS,
+                       max_attempts=MAIL_MAX_ATTEMPTS, batch_size=MAIL_BATCH_SIZE,
+                       pool=smtp_pool)
+mail_queue.start()
 
 USE_MONGODB = os.environ.get('USE_MONGODB','false').lower() == 'true'
 MONGO_URI = os.environ.get('MONGO_URI','')
-db = Database(use_mongo=USE_MONGODB, mongo_uri=MONGO_URI)
+# JSON mode only: append each change to database.json.log instead of
+# rewriting the whole file; the log is compacted every DB_COMPACT_EVERY records.
+DB_JOURNAL = os.environ.get('DB_JOURNAL','false').lower() == 'true'
+DB_COMPACT_EVERY = int(os.environ.get('DB_COMPACT_EVERY', 500))
+# Embedded SQLite backend (indexed lookups, row-level writes); migrate the
+# existing data once with `flask --app app migrate-sqlite`.
+USE_SQLITE = os.environ.get('USE_SQLITE','false').lower() == 'true'
+SQLITE_PATH = os.environ.get('SQLITE_PATH', os.path.join(os.getcwd(), 'database.sqlite3'))
+db = Database(use_mongo=USE_MONGODB, mongo_uri=MONGO_URI,
+              journal=DB_JOURNAL, compact_every=DB_COMPACT_EVERY,
+              use_sqlite=USE_SQLITE, sqlite_path=SQLITE_PATH)
+
+# Rendered public pages are cached per login state and dropped whenever one of
+# the collections they were built from changes; PAGE_CACHE_TTL (seconds) bounds
+# staleness for writes made by other processes. PAGE_CACHE_SIZE=0 disables it.
+PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE', 256))
+PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 300))
+page_cache = PageCache(max_entries=PAGE_CACHE_SIZE, ttl=PAGE_CACHE_TTL)
+db.on_change(page_cache.on_db_change)
+
+# HTML and JSON responses are gzip/brotli encoded on the way out; the encoded
+# copy of a page-cache entry is kept and reused. COMPRESS_ENDPOINTS overrides
+# the level per endpoint, e.g. "api_blogs=9,admin_cache_stats=0" (0 = off).
+COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 512))
+COMPRESS_ENDPOINTS = {'uploaded_file': 0}
+for item in filter(None, os.environ.get('COMPRESS_ENDPOINTS', '').split(',')):
+    endpoint, _, level = item.partition('=')
+    COMPRESS_ENDPOINTS[endpoint.strip()] = int(level)
+compressor = Compressor(app, endpoints=COMPRESS_ENDPOINTS, level=COMPRESS_LEVEL,
+                        min_size=COMPRESS_MIN_SIZE)
+
+# Uploaded photos get resized WebP/JPEG copies (needs Pillow), made by
+# IMAGE_WORKERS background processes and served through srcset.
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 1))
+image_variants = ImageVariants(uploads, workers=IMAGE_WORKERS)
+app.add_template_filter(srcset)
+app.add_template_filter(variant)
+
+# Full-text search (/api/search) over blogs, research, events and notices.
+# The index follows database writes and is saved to SEARCH_INDEX_PATH, so a
+# restart only re-tokenizes records that changed while it was down.
+SEARCH_INDEX_PATH = os.environ.get('SEARCH_INDEX_PATH', os.path.join(os.getcwd(), 'search_index.json'))
+search_index = SearchIndex(db, SEARCH_INDEX_PATH)
+db.on_change(search_index.on_db_change)
+# Typeahead (/api/suggest) over student names / IDs, faculty names and blog
+# titles: an in-memory sorted list kept current by database writes.
+suggester = Suggester(db)
+db.on_change(suggester.on_db_change)
+
+# Password hashing / checking runs on HASH_WORKERS processes so a burst of
+# logins cannot occupy every request thread; beyond HASH_QUEUE waiting calls
+# logins get a 503 with Retry-After. Hashes not made with
+# PASSWORD_HASH_METHOD are replaced on the user's next successful login.
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:260000')
+HASH_WORKERS = int(os.environ.get('HASH_WORKERS', os.cpu_count() or 1))
+HASH_QUEUE = int(os.environ.get('HASH_QUEUE', 32))
+hasher = PasswordHasher(PASSWORD_HASH_METHOD, workers=HASH_WORKERS, max_queue=HASH_QUEUE)
+
+# Request timing: responses carry a Server-Timing header with the time spent
+# in the database, template rendering, mail and password hashing
+# (SERVER_TIMING=false leaves it out), and per-endpoint latency histograms
+# are shown at /admin/metrics and served to Prometheus at /metrics (admin
+# session, or "Authorization: Bearer <METRICS_TOKEN>").
+SERVER_TIMING = os.environ.get('SERVER_TIMING','true').lower() in ('1','true','yes')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN','')
+metrics = Metrics(app, server_timing=SERVER_TIMING)
+metrics.instrument(db, 'db')
+metrics.instrument(db, 'db-read', ['_read'])    # JSON parse (cache misses) / SQLite dump
+metrics.instrument(db, 'db-write', ['_write'])  # serialize + fsync of the snapshot
+metrics.instrument(mail_queue, 'mail', ['enqueue'])
+metrics.instrument(mail, 'smtp', ['send'])
+metrics.instrument(smtp_pool, 'smtp', ['send_batch'])
+metrics.instrument(hasher, 'hash', ['hash', 'verify'])
+render_template = metrics.timed('render', render_template)
 
 ADMIN_USER = os.environ.get('ADMIN_USER','admin')
 ADMIN_PASS = os.environ.get('ADMIN_PASS','admin123')
 ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL','admin@example.com')
 
+BLOG_PAGE_SIZE = int(os.environ.get('BLOG_PAGE_SIZE', 12))
+ADMIN_PAGE_SIZE = int(os.environ.get('ADMIN_PAGE_SIZE', 25))
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
 def allowed_file(filename, allowed_set):
     return '.' in filename and filename.rsplit('.',1)[1].lower() in allowed_set
 
+@app.errorhandler(RequestEntityTooLarge)
+@app.errorhandler(UnsupportedMediaType)
+def upload_rejected(e):
+    """Report a refused upload the way the form that sent it reports errors."""
+    message = e.description
+    if message == RequestEntityTooLarge.description:
+        message = 'The uploaded file is too large.'
+    if request.path.startswith('/api/'):
+        return jsonify({'success': False, 'message': message}), e.code
+    flash(message, 'error')
+    return redirect(request.referrer or url_for('home'))
+
+@app.errorhandler(HashingBusy)
+def hashing_busy(e):
+    """Shed a login / signup while the password hashing pool is saturated."""
+    if request.path.startswith('/api/'):
+        resp = jsonify({'success': False, 'message': e.description})
+        resp.status_code = e.code
+    else:
+        flash(e.description, 'error')
+        resp = redirect(request.referrer or url_for('home'))
+    resp.headers['Retry-After'] = str(hasher.retry_after)
+    return resp
+
+def rehash_password(coll, record, password):
+    """After a successful login, upgrade a hash made with outdated parameters."""
+    stored = record.get('password_hash')
+    if hasher.needs_rehash(stored):
+        match = {'id': record['id'], 'password_hash': stored}  # unless changed meanwhile
+        hasher.rehash_later(password, lambda new: db.bulk_update(coll, [(match, {'password_hash': new})]))
+
+def make_variants(coll, record_id, field, src):
+    """Have resized copies of the image `src` made and stored on the record."""
+    def store(variants):
+        if not db.set_variants(coll, record_id, field, src, variants):
+            release_uploads(variants)  # record deleted or image replaced meanwhile
+    image_variants.submit(src, store)
+
+def release_uploads(*refs):
+    """Delete uploaded files (paths or whole records) no record uses any more."""
+    try:
+        uploads.release(db, *refs)
+    except OSError as e:
+        app.logger.error('Failed to release uploads: %s', e)
+
+# ---------- PAGINATION ----------
+
+def _encode_cursor(blog):
+    """Opaque keyset cursor for the blog after which the next page starts."""
+    raw = json.dumps([str(blog.get('created_at') or ''), str(blog.get('id') or '')])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def _decode_cursor(token):
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        created_at, blog_id = json.loads(raw)
+        return (str(created_at), str(blog_id))
+    except Exception:
+        abort(400)
+
+def _paged_blogs(page_size, endpoint, **filters):
+    """One page of blogs for ?page= / ?cursor=, plus prev/next URLs.
+
+    Extra query args (e.g. status) are carried into the generated URLs.
+    """
+    try:
+        page = max(int(request.args.get('page') or 1), 1)
+    except ValueError:
+        page = 1
+    cursor = _decode_cursor(request.args.get('cursor'))
+    offset = 0 if cursor else (page - 1) * page_size
+    blogs = db.list_blogs(limit=page_size + 1, offset=offset, after=cursor, **filters)
+    has_next = len(blogs) > page_size
+    blogs = blogs[:page_size]
+
+    carry = {k: v for k, v in request.args.items() if k not in ('page', 'cursor')}
+    next_url = prev_url = None
+    next_cursor = _encode_cursor(blogs[-1]) if has_next else None
+    if has_next:
+        if cursor:
+            next_url = url_for(endpoint, cursor=next_cursor, **carry)
+        else:
+            next_url = url_for(endpoint, page=page + 1, **carry)
+    if page > 1 and not cursor:
+        prev_url = url_for(endpoint, page=page - 1, **carry)
+    return blogs, {'page': page, 'next_url': next_url, 'prev_url': prev_url,
+                   'next_cursor': next_cursor}
+
+def conditional(*colls):
+    """ETag / Last-Modified for a GET API built only from the collections `colls`.
+
+    The validator comes from the collections' change counters, so a repeat
+    request whose If-None-Match (or If-Modified-Since) still matches gets a
+    304 before the view reads or serializes anything.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            token, modified = db.collection_version(*colls)
+            etag = f'{token}-{zlib.crc32(request.query_string):08x}'
+            # HTTP dates have whole seconds: a date is only handed out once its
+            # second is over, so no later write can share it
+            if modified and int(modified) >= int(dt.datetime.now().timestamp()):
+                modified = None
+            if request.if_none_match:
+                fresh = request.if_none_match.contains(etag)
+            else:
+                since = request.if_modified_since
+                fresh = bool(since and modified and since.timestamp() >= int(modified))
+            resp = app.response_class(status=304) if fresh else make_response(fn(*args, **kwargs))
+            if resp.status_code in (200, 304):
+                resp.set_etag(etag)
+                if modified:
+                    resp.last_modified = int(modified)
+                resp.cache_control.no_cache = True
+            return resp
+        return wrapper
+    return decorator
+
 def login_required_any(fn):
     """Require either student OR faculty to be logged in."""
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        if not session.get('student') and not session.get('faculty'):
+        if not session_user('student') and not session_user('faculty'):
             # not logged in → send to home (or you can redirect to login modal)
             flash('Please login to access your profile.', 'error')
             return redirect(url_for('home'))
@@ -57,49 +340,76 @@ def login_required_any(fn):
 # ---------- PUBLIC PAGES ----------
 # ---------- GLOBAL: expose current user (student/faculty) to all templates ----------
 
+# The session stores only the account id under 'student' / 'faculty'; the
+# profile is read from the database (a keyed lookup) once per request, so a
+# profile edit or a deactivation shows up on the next request.
+SESSION_PROFILE_FIELDS = {
+    'student': ('id', 'name', 'student_id', 'email', 'phone', 'class', 'avatar', 'avatar_variants'),
+    'faculty': ('id', 'name', 'email', 'designation', 'phone', 'avatar', 'avatar_variants'),
+}
+
+def session_user(role):
+    """Database record of the logged-in `role` ('student' / 'faculty'), or None."""
+    users = g.setdefault('session_users', {})
+    if role not in users:
+        uid = session.get(role)
+        if isinstance(uid, dict):  # signed-cookie sessions made before ids were stored
+            uid = uid.get('id')
+        user = _get_user_by_id(role, uid) if uid else None
+        if uid and not (user and user.get('is_active', True)):
+            session.pop(role, None)  # account deleted or deactivated
+            user = None
+        users[role] = user
+    return users[role]
+
+def session_profile(role, user):
+    """The fields of a student / faculty record shown in the navbar and session APIs."""
+    profile = {f: user.get(f) for f in SESSION_PROFILE_FIELDS[role]}
+    profile['avatar'] = user.get('avatar') or user.get('profile_image')
+    return profile
+
+def start_user_session(role, user):
+    """Log `user` in as `role`, under a fresh session id."""
+    if hasattr(session, 'rotate'):
+        session.rotate()
+    session.pop('faculty' if role == 'student' else 'student', None)
+    session[role] = user['id']
+    g.setdefault('session_users', {})[role] = user
+    return session_profile(role, user)
+
 @app.context_processor
 def inject_current_user():
     """Make current logged-in student or faculty available in all templates."""
-    stu = session.get('student')
-    fac = session.get('faculty')
-
-    role = None
-    user = None
-    if stu:
-        role = 'student'
-        user = stu
-    elif fac:
-        role = 'faculty'
-        user = fac
-
+    stu = session_user('student')
+    fac = None if stu else session_user('faculty')
+    student = stu and session_profile('student', stu)
+    faculty = fac and session_profile('faculty', fac)
     return {
-        'current_user': user,
-        'current_user_role': role
+        'current_student': student,
+        'current_faculty': faculty,
+        'current_user': student or faculty,
+        'current_user_role': 'student' if stu else 'faculty' if fac else None,
     }
+
 def _get_user_by_id(role, user_id):
     """Return full user dict (student or faculty) from DB by id."""
     if role == 'student':
-        if db.use_mongo:
-            return db.db.students.find_one({'id': user_id})
-        data = db._read()
-        return next((s for s in data.get('students', []) if s.get('id') == user_id), None)
-    else:
-        if db.use_mongo:
-            return db.db.faculty.find_one({'id': user_id})
-        data = db._read()
-        return next((f for f in data.get('faculty', []) if f.get('id') == user_id), None)
+        return db.get_student(user_id)
+    return db.get_faculty(user_id)
 
 @app.route('/', endpoint='home')
+@page_cache.cached()
 def home():
     return render_template('home.html')
 
 @app.route('/about', endpoint='about')
+@page_cache.cached('faculty', 'gallery')
 def about():
     # Public about page includes dynamic faculty list
     faculty_list = db.list_faculty()
     faculty_objs = []
     for f in faculty_list:
-        faculty_objs.append(type("FacObj",(object,),f)())
+        faculty_objs.append(View(f))
 
     # Infrastructure images come from gallery with category='infrastructure'
     infra_items = []
@@ -107,20 +417,20 @@ def about():
         gal_items = db.list_gallery()
     except Exception:
         gal_items = []
-    for g in gal_items:
-        if g.get('category') != 'infrastructure':
+    for item in gal_items:
+        if item.get('category') != 'infrastructure':
             continue
-        img = g.get('image') or g.get('file') or g.get('path')
+        img = item.get('image') or item.get('file') or item.get('path')
         if img and not str(img).startswith('http'):
             img = '/uploads/' + img if not str(img).startswith('/uploads/') else img
-        infra_items.append(type("InfraObj",(object,),{'image': img})())
+        infra_items.append(View({'image': img, 'image_variants': item.get('image_variants')}))
 
     return render_template('about.html', faculty=faculty_objs, infra=infra_items)
 
 @app.route('/blog', endpoint='blog')
 def blog():
-    """Public blog listing showing all approved posts with summary info."""
-    raw_blogs = db.list_blogs(approved_only=True)
+    """Public blog listing showing one page of approved posts with summary info."""
+    raw_blogs, pager = _paged_blogs(BLOG_PAGE_SIZE, 'blog', approved_only=True)
     posts = []
 
     for b in raw_blogs:
@@ -147,9 +457,6 @@ def blog():
             else:
                 file_type = 'file'
 
-        likes = b.get('likes') or []
-        comments = b.get('comments') or []
-
         posts.append({
             'id': b.get('id'),
             'title': b.get('title'),
@@ -161,11 +468,11 @@ def blog():
             'file_path': file_path,
             'file_url': file_url,
             'file_type': file_type,
-            'like_count': len(likes),
-            'comment_count': len(comments),
+            'like_count': b.get('like_count') or 0,
+            'comment_count': b.get('comment_count') or 0,
             'created_at': created_at_dt,
         })
-    return render_template('blog.html', posts=posts)
+    return render_template('blog.html', posts=posts, pager=pager)
 
 
 @app.route('/blog/<blog_id>', endpoint='blog_detail')
@@ -197,14 +504,13 @@ def blog_detail(blog_id):
         else:
             file_type = 'file'
 
-    likes = b.get('likes') or []
-    comments = b.get('comments') or []
+    comments = db.list_blog_comments(blog_id)
 
     # Determine if current user liked this post
     like_key = None
     user_label = None
-    stu = session.get('student')
-    fac = session.get('faculty')
+    stu = session_user('student')
+    fac = session_user('faculty')
     if stu:
         like_key = f"student:{stu.get('student_id')}"
         user_label = f"{stu.get('name')} ({stu.get('student_id')})"
@@ -212,7 +518,7 @@ def blog_detail(blog_id):
         like_key = f"faculty:{fac.get('email')}"
         user_label = f"{fac.get('name')} (Faculty)"
 
-    liked = like_key in likes if like_key else False
+    liked = db.has_liked(blog_id, like_key) if like_key else False
 
     # Wrap comments as simple objects
     comment_objs = []
@@ -220,12 +526,12 @@ def blog_detail(blog_id):
         c_dt = c.get('created_at')
         if isinstance(c_dt, str):
             try:
-                c_dt = datetime.datetime.fromisoformat(c_dt)
+                c_dt = dt.datetime.fromisoformat(c_dt)
             except Exception:
                 c_dt = None
-        comment_objs.append(type("CommentObj",(object,),{**c, "created_at": c_dt})())
+        comment_objs.append(View(c, created_at=c_dt))
 
-    post = type("PostObj",(object,),{
+    post = View({
         "id": b.get("id"),
         "title": b.get("title"),
         "content": b.get("content",""),
@@ -235,9 +541,9 @@ def blog_detail(blog_id):
         "file_url": file_url,
         "file_type": file_type,
         "created_at": created_at_dt,
-        "like_count": len(likes),
+        "like_count": b.get("like_count") or 0,
         "comment_count": len(comments),
-    })()
+    })
 
     return render_template('blog_detail.html', post=post, comments=comment_objs, liked=liked, user_label=user_label)
 
@@ -245,8 +551,8 @@ def blog_detail(blog_id):
 @app.route('/api/blog/<blog_id>/like', methods=['POST'])
 def api_blog_like(blog_id):
     """Toggle like for current logged-in user on a blog post."""
-    stu = session.get('student')
-    fac = session.get('faculty')
+    stu = session_user('student')
+    fac = session_user('faculty')
     if not stu and not fac:
         return jsonify({'success': False, 'message': 'Please login to like posts.'}), 401
 
@@ -259,16 +565,8 @@ def api_blog_like(blog_id):
     if not b or not b.get('approved', False):
         return jsonify({'success': False, 'message': 'Post not found.'}), 404
 
-    likes = b.get('likes') or []
-    if like_key in likes:
-        likes.remove(like_key)
-        liked = False
-    else:
-        likes.append(like_key)
-        liked = True
-
-    db.update_blog(blog_id, {'likes': likes})
-    return jsonify({'success': True, 'liked': liked, 'like_count': len(likes)})
+    liked, like_count = db.toggle_blog_like(blog_id, like_key)
+    return jsonify({'success': True, 'liked': liked, 'like_count': like_count})
 
 
 @app.route('/api/blog/<blog_id>/comment', methods=['POST'])
@@ -280,35 +578,36 @@ def api_blog_comment(blog_id):
     if not text:
         return jsonify({'success': False, 'message': 'Comment text is required.'}), 400
 
-    stu = session.get('student')
-    fac = session.get('faculty')
+    stu = session_user('student')
+    fac = session_user('faculty')
     if not stu and not fac:
         return jsonify({'success': False, 'message': 'Please login to comment.'}), 401
 
     if stu:
         author_name = stu.get('name')
         author_type = 'student'
+        author_key = f"student:{stu.get('student_id')}"
     else:
         author_name = fac.get('name')
         author_type = 'faculty'
+        author_key = f"faculty:{fac.get('email')}"
 
     b = db.get_blog(blog_id)
     if not b or not b.get('approved', False):
         return jsonify({'success': False, 'message': 'Post not found.'}), 404
 
-    comments = b.get('comments') or []
-    comment = {
+    comment = db.add_blog_comment(blog_id, {
         'id': str(uuid.uuid4()),
         'author_name': author_name,
         'author_type': author_type,
+        'author_key': author_key,
         'text': text,
         'created_at': dt.datetime.utcnow().isoformat()
-    }
-    comments.append(comment)
-    db.update_blog(blog_id, {'comments': comments})
+    })
     return jsonify({'success': True, 'comment': comment})
 
 @app.route('/csa', endpoint='csa')
+@page_cache.cached('csa_members', 'past_csa', 'events')
 def csa_page():
     """Public CSA page showing *current* CSA members and past CSA PDFs/events."""
     csa_members = db.list_csa_members() or []
@@ -326,7 +625,7 @@ def csa_page():
             is_current = m.get('is_current', True)
         if is_current:
             # Convert to simple object so template can use dot-notation
-            current_members.append(type("MemObj", (object,), dict(m))())
+            current_members.append(View(m))
 
     # Sort by 'order' field if present
     current_members.sort(key=lambda m: getattr(m, 'order', 0))
@@ -340,11 +639,13 @@ def csa_page():
 
 
 @app.route('/events', endpoint='events')
+@page_cache.cached('events')
 def events_page():
     events_raw = db.list_events()
     upcoming, past = [], []
     now = dt.datetime.now()
     for e in events_raw:
+        e = dict(e)  # records are shared with the DB cache; decorate a copy
         date_val = e.get('date')
         if isinstance(date_val, str):
             dt_obj = None
@@ -369,6 +670,7 @@ def events_page():
     return render_template('events.html', upcoming=upcoming, past=past)
 
 @app.route('/gallery', endpoint='gallery')
+@page_cache.cached('gallery')
 def gallery_page():
     all_items = db.list_gallery() or []
 
@@ -383,10 +685,10 @@ def gallery_page():
     tour_slider = []
     tour_cards = []
 
-    for g in all_items:
-        cat = (g.get('category') or '').strip()
-        obj = dict(g)
-        obj['image'] = normalize_img(g)
+    for item in all_items:
+        cat = (item.get('category') or '').strip()
+        obj = dict(item)
+        obj['image'] = normalize_img(item)
 
         # -------- GALLERY PAGE: EVENTS --------
         # big slider
@@ -405,7 +707,7 @@ def gallery_page():
             tour_cards.append(obj)
 
     # Wrap as simple objects for template (dot notation)
-    wrap = lambda lst: [type("Obj", (object,), x)() for x in lst]
+    wrap = lambda lst: [View(x) for x in lst]
 
     return render_template(
         'gallery.html',
@@ -418,7 +720,7 @@ def gallery_page():
 
 
 @app.route('/research', endpoint='research')
-
+@page_cache.cached('research')
 def research_page():
     """Public research listing used from home-page section and dedicated page."""
     raw = db.list_research()
@@ -450,7 +752,7 @@ def research_page():
         # These two are used by the research.html template
         paper_obj['file'] = file_url
         paper_obj['link'] = link_url
-        papers.append(type("PaperObj", (object,), paper_obj)())
+        papers.append(View(paper_obj))
     return render_template('research.html', research_papers=papers)
 
 @app.route('/contact', endpoint='contact')
@@ -462,27 +764,29 @@ def contact_page():
 
 def _current_user_and_role():
     """Return (role, full_user_dict) or (None, None) if not logged in."""
-    stu = session.get("student")
-    fac = session.get("faculty")
-
+    stu = session_user('student')
     if stu:
-        email = stu.get("email")
-        db_student = db.find_student_by_email(email)
-        if not db_student:
-            return None, None
-        return "student", db_student
-
+        return "student", stu
+    fac = session_user('faculty')
     if fac:
-        email = fac.get("email")
-        faculty_list = db.list_faculty() or []
-        db_fac = next((f for f in faculty_list if f.get("email") == email), None)
-        if not db_fac:
-            return None, None
-        return "faculty", db_fac
-
+        return "faculty", fac
     return None, None
 
 
+def _user_key(role, user):
+    """Key of a student/faculty in likes, comments and the activity index."""
+    if role == 'student':
+        return f"student:{user.get('student_id')}"
+    return f"faculty:{user.get('email')}"
+
+
+def _blogs_by_ids(blog_ids):
+    """Blogs with the given ids (skipping deleted ones), newest first."""
+    blogs = [b for b in (db.get_blog(i) for i in blog_ids) if b]
+    blogs.sort(key=lambda b: str(b.get('created_at') or ''), reverse=True)
+    return blogs
+
+
 @app.route("/profile", endpoint="profile")
 def profile():
     """Single profile page for both students and faculty."""
@@ -491,48 +795,18 @@ def profile():
         # not logged in or user not found -> back to home
         return redirect(url_for("home"))
 
-    # Get all blogs (approved + pending) to compute stats
-    all_blogs = db.list_blogs(approved_only=False) or []
-
-    # My own posts
-    if role == "student":
-        my_posts = [
-            b for b in all_blogs
-            if b.get("student_id") == user.get("student_id")
-        ]
-        like_key = f"student:{user.get('student_id')}"
-    else:
-        my_posts = [
-            b for b in all_blogs
-            if (b.get("author_email") or "").lower()
-               == (user.get("email") or "").lower()
-        ]
-        like_key = f"faculty:{user.get('email')}"
-
-    # Likes given + comments made
-    like_count = 0
-    comment_count = 0
-    user_name = user.get("name")
-
-    for b in all_blogs:
-        likes = b.get("likes") or []
-        comments = b.get("comments") or []
-
-        if like_key in likes:
-            like_count += 1
-
-        for c in comments:
-            if c.get("author_name") == user_name:
-                comment_count += 1
+    # Posts, likes given and comments made, from the user's activity record
+    activity = db.get_user_activity(_user_key(role, user))
+    my_posts = _blogs_by_ids(activity["posts"])
 
     stats = {
         "posts": len(my_posts),
-        "likes": like_count,
-        "comments": comment_count,
+        "likes": len(activity["liked"]),
+        "comments": sum(activity["commented"].values()),
     }
 
     # simple object so Jinja can do user.name
-    user_obj = type("UserObj", (object,), user)()
+    user_obj = View(user)
 
     return render_template(
         "profile.html",
@@ -560,21 +834,15 @@ def faculty_profile():
 def edit_profile():
     # 1) Who is logged in?
     user_role = None
-    session_user = None
-    if session.get('student'):
+    if session_user('student'):
         user_role = 'student'
-        session_user = session['student']
-    elif session.get('faculty'):
+    elif session_user('faculty'):
         user_role = 'faculty'
-        session_user = session['faculty']
     else:
         return redirect(url_for('home'))
 
-    user_id = session_user.get('id')
-    user = _get_user_by_id(user_role, user_id)
-    if not user:
-        flash('User not found.', 'error')
-        return redirect(url_for('home'))
+    user = session_user(user_role)
+    user_id = user.get('id')
 
     if request.method == 'POST':
         name = (request.form.get('name') or '').strip()
@@ -607,42 +875,28 @@ def edit_profile():
             if new_password != new_password2:
                 flash('New password and confirm password do not match.', 'error')
                 return redirect(url_for('edit_profile'))
-            changes['password_hash'] = generate_password_hash(new_password)
+            changes['password_hash'] = hasher.hash(new_password)
 
         # Handle avatar upload
         avatar_file = request.files.get('avatar')
         if avatar_file and allowed_file(avatar_file.filename, ALLOWED_IMG):
-            filename = secure_filename(str(uuid.uuid4()) + "-" + avatar_file.filename)
-            avatar_file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-            avatar_path = '/uploads/' + filename
-            changes['avatar'] = avatar_path
+            changes['avatar'] = uploads.save(avatar_file)
+            changes['avatar_variants'] = []
 
         # Persist to DB
         if user_role == 'student':
             db.update_student(user_id, changes)
         else:
             db.update_faculty(user_id, changes)
-
-        # 🔹 Update session copy so navbar/profile use latest data
-        if user_role == 'student':
-            session['student']['name'] = name
-            session['student']['phone'] = phone
-            if student_class:                      # only overwrite if provided
-                session['student']['class'] = student_class
-            if 'avatar' in changes:
-                session['student']['avatar'] = changes['avatar']
-        else:
-            session['faculty']['name'] = name
-            session['faculty']['phone'] = phone
-            session['faculty']['designation'] = changes.get('designation')
-            if 'avatar' in changes:
-                session['faculty']['avatar'] = changes['avatar']
+        if 'avatar' in changes:
+            release_uploads(user.get('avatar'), user.get('avatar_variants'))
+            make_variants('students' if user_role == 'student' else 'faculty', user_id, 'avatar', changes['avatar'])
 
         flash('Profile updated successfully.', 'success')
         return redirect(url_for('profile'))
 
     # GET → show form
-    user_obj = type("UserObj", (object,), user)()
+    user_obj = View(user)
     return render_template('edit_profile.html', user=user_obj, role=user_role)
 
 
@@ -654,24 +908,13 @@ def edit_profile():
 @login_required_any
 def my_posts_page():
     """Show all blog posts created by the current user."""
-    stu = session.get('student')
-    fac = session.get('faculty')
+    stu = session_user('student')
+    fac = session_user('faculty')
 
-    is_student = bool(stu)
-    if is_student:
-        key_id = stu.get('student_id')
+    if stu:
+        my_posts = _blogs_by_ids(db.get_user_activity(_user_key('student', stu))['posts'])
     else:
-        key_email = fac.get('email')
-
-    all_blogs = db.list_blogs(approved_only=False)
-    my_posts = []
-    for b in all_blogs:
-        if is_student and b.get('student_id') == key_id:
-            my_posts.append(b)
-        elif (not is_student and
-              b.get('author_type') == 'faculty' and
-              b.get('author_email') == key_email):
-            my_posts.append(b)
+        my_posts = _blogs_by_ids(db.get_user_activity(_user_key('faculty', fac))['posts'])
 
     decorated = []
     for b in my_posts:
@@ -686,12 +929,12 @@ def my_posts_page():
 
         status_val = b.get('status') or ('approved' if b.get('approved') else 'pending')
 
-        decorated.append(type("BlogObj", (object,), {
+        decorated.append(View({
             '_id': b.get('id'),
             'title': b.get('title'),
             'status': status_val,
             'created_at': created_dt
-        })())
+        }))
 
     return render_template('my_posts.html', posts=decorated)
 
@@ -700,36 +943,16 @@ def my_posts_page():
 @login_required_any
 def my_activity_page():
     """Show posts liked and commented by the current user."""
-    stu = session.get('student')
-    fac = session.get('faculty')
-
-    is_student = bool(stu)
-    if is_student:
-        identifier = stu.get('student_id')
-        like_key = f"student:{identifier}"
-        display_name = stu.get('name')
-    else:
-        identifier = fac.get('email')
-        like_key = f"faculty:{identifier}"
-        display_name = fac.get('name')
-
-    all_blogs = db.list_blogs(approved_only=False)
+    stu = session_user('student')
+    fac = session_user('faculty')
 
-    liked_posts = []
-    commented_posts = []
-    commented_ids = set()
-
-    for b in all_blogs:
-        likes = b.get('likes') or []
-        if like_key in likes:
-            liked_posts.append(b)
+    if stu:
+        activity = db.get_user_activity(_user_key('student', stu))
+    else:
+        activity = db.get_user_activity(_user_key('faculty', fac))
 
-        comments = b.get('comments') or []
-        for c in comments:
-            if c.get('author_name') == display_name and b.get('id') not in commented_ids:
-                commented_posts.append(b)
-                commented_ids.add(b.get('id'))
-                break
+    liked_posts = _blogs_by_ids(activity['liked'])
+    commented_posts = _blogs_by_ids(activity['commented'])
 
     def wrap_blog_list(lst):
         result = []
@@ -743,12 +966,12 @@ def my_activity_page():
             else:
                 created_dt = created
 
-            result.append(type("BlogObj", (object,), {
+            result.append(View({
                 '_id': b.get('id'),
                 'title': b.get('title'),
                 'author_name': b.get('author_name') or b.get('student_name') or 'Anonymous',
                 'created_at': created_dt
-            })())
+            }))
         return result
 
     liked_wrapped = wrap_blog_list(liked_posts)
@@ -785,7 +1008,7 @@ def api_student_signup():
         'name': name,
         'student_id': student_id,
         'email': email,
-        'password_hash': generate_password_hash(password),
+        'password_hash': hasher.hash(password),
         'is_active': True,
         'created_at': dt.datetime.utcnow().isoformat(),
 
@@ -823,33 +1046,19 @@ def api_student_login():
         if not student.get('is_active', True):
             return jsonify({'success': False, 'message': 'Account is inactive. Contact admin.'}), 403
 
-        # Safely check password hash so bad / old hashes don't crash the app
+        # Bad / old hashes count as a wrong password instead of crashing the app
         stored_hash = student.get('password_hash')
-        valid_password = False
-        if stored_hash:
-            try:
-                valid_password = check_password_hash(stored_hash, password)
-            except Exception:
-                # If hash is broken or in old format, treat as invalid password
-                valid_password = False
+        valid_password = bool(stored_hash) and hasher.verify(stored_hash, password)
 
         if not valid_password:
             return jsonify({'success': False, 'message': 'Invalid email or password.'}), 401
+        rehash_password('students', student, password)
 
-        # Build session object (include avatar if present)
-        session['student'] = {
-    'id': student['id'],
-    'name': student['name'],
-    'student_id': student['student_id'],
-    'email': student['email'],
-    'phone': student.get('phone'),
-    'class': student.get('class'),   # 👈 this must exist
-    'avatar': student.get('avatar') or student.get('profile_image'),
-}
-
-
-        return jsonify({'success': True, 'message': 'Login successful', 'student': session['student']})
+        profile = start_user_session('student', student)
+        return jsonify({'success': True, 'message': 'Login successful', 'student': profile})
 
+    except HTTPException:
+        raise  # e.g. 503 while the hashing pool is saturated
     except Exception as e:
         # Log server-side, but always return JSON to the browser
         app.logger.exception("Student login failed: %s", e)
@@ -872,33 +1081,30 @@ def api_student_request_otp():
     if not student.get('is_active', True):
         return jsonify({'success': False, 'message': 'Account is inactive. Contact admin.'}), 403
 
-    all_data = db._read()
-    for s in all_data.get('students', []):
-        if s.get('email') == email:
-            otp_code = f"{random.randint(0, 999999):06d}"
-            expires_at = dt.datetime.utcnow() + dt.datetime.timedelta(minutes=10)
-            s['otp_code'] = otp_code
-            s['otp_expires_at'] = expires_at.isoformat()
-            db._write(all_data)
-
-            otp_debug = otp_code
-            # Try to send email if mail configured
-            try:
-                if app.config.get('MAIL_USERNAME') and app.config.get('MAIL_PASSWORD') and email:
-                    msg = Message(subject="Your student login OTP", recipients=[email])
-                    msg.body = f"Your OTP is: {otp_code}\nIt will expire in 10 minutes."
-                    mail.send(msg)
-                    otp_debug = None
-            except Exception as e:
-                app.logger.error("Failed to send student OTP email: %s", e)
+    otp_code = f"{random.randint(0, 999999):06d}"
+    expires_at = dt.datetime.utcnow() + dt.timedelta(minutes=10)
+    if not db.update_student(student.get('id'), {
+        'otp_code': otp_code,
+        'otp_expires_at': expires_at.isoformat(),
+    }):
+        return jsonify({'success': False, 'message': 'Unexpected error.'}), 500
 
-            return jsonify({
-                'success': True,
-                'message': 'OTP sent to your email. Please verify.',
-                'otp_debug': otp_debug
-            })
+    otp_debug = otp_code
+    # Try to send email if mail configured
+    try:
+        if app.config.get('MAIL_USERNAME') and app.config.get('MAIL_PASSWORD') and email:
+            msg = Message(subject="Your student login OTP", recipients=[email])
+            msg.body = f"Your OTP is: {otp_code}\nIt will expire in 10 minutes."
+            mail_queue.enqueue(msg)
+            otp_debug = None
+    except Exception as e:
+        app.logger.error("Failed to send student OTP email: %s", e)
 
-    return jsonify({'success': False, 'message': 'Unexpected error.'}), 500
+    return jsonify({
+        'success': True,
+        'message': 'OTP sent to your email. Please verify.',
+        'otp_debug': otp_debug
+    })
 
 
 @app.route('/api/student/verify-otp', methods=['POST'])
@@ -911,13 +1117,7 @@ def api_student_verify_otp():
     if not (email and otp):
         return jsonify({'success': False, 'message': 'Email and OTP are required.'}), 400
 
-    all_data = db._read()
-    target = None
-    for s in all_data.get('students', []):
-        if s.get('email') == email:
-            target = s
-            break
-
+    target = db.find_student_by_email(email)
     if not target:
         return jsonify({'success': False, 'message': 'Student not found.'}), 404
 
@@ -936,24 +1136,12 @@ def api_student_verify_otp():
         except Exception:
             pass
 
-    # Create student session
-        student_session = {
-        'id': target.get('id'),
-        'name': target.get('name'),
-        'student_id': target.get('student_id'),
-        'email': target.get('email'),
-        'phone': target.get('phone'),
-        'avatar': target.get('avatar') or target.get('profile_image'),
-    }
-
-    session['student'] = student_session
+    profile = start_user_session('student', target)
 
     # Clear OTP to prevent reuse
-    target['otp_code'] = None
-    target['otp_expires_at'] = None
-    db._write(all_data)
+    db.update_student(target.get('id'), {'otp_code': None, 'otp_expires_at': None})
 
-    return jsonify({'success': True, 'message': 'Login successful.', 'student': student_session})
+    return jsonify({'success': True, 'message': 'Login successful.', 'student': profile})
 @app.route('/api/student/logout', methods=['POST'])
 def api_student_logout():
     session.pop('student', None)
@@ -961,16 +1149,16 @@ def api_student_logout():
 
 @app.route('/api/student/check-session')
 def api_student_check_session():
-    stu = session.get('student')
+    stu = session_user('student')
     if stu:
-        return jsonify({'logged_in': True, 'student': stu})
+        return jsonify({'logged_in': True, 'student': session_profile('student', stu)})
     return jsonify({'logged_in': False})
 
 @app.route('/api/blog/post', methods=['POST'])
 def api_blog_post():
     """Submit a blog post from either a logged-in student or faculty member."""
-    stu = session.get('student')
-    fac = session.get('faculty')
+    stu = session_user('student')
+    fac = session_user('faculty')
 
     if not stu and not fac:
         return jsonify({'success': False, 'message': 'Please login (student or faculty) to submit a blog.'}), 401
@@ -999,10 +1187,8 @@ def api_blog_post():
     file_type = None
 
     if upload_file and allowed_file(upload_file.filename, ALLOWED_IMG | ALLOWED_DOC):
-        filename = secure_filename(str(uuid.uuid4()) + "-" + upload_file.filename)
-        upload_file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-        file_path = '/uploads/' + filename
-        ext = filename.rsplit('.', 1)[-1].lower()
+        file_path = uploads.save(upload_file)
+        ext = file_path.rsplit('.', 1)[-1]
         if ext == 'pdf':
             file_type = 'pdf'
         elif ext in ALLOWED_IMG:
@@ -1027,15 +1213,16 @@ def api_blog_post():
         'author_name': author_name,
         'author_type': author_type,
         'student_id': student_id,
-        'author_class': user.get('class'),
+        'author_key': _user_key(author_type, stu or fac),
+        'author_class': (stu or {}).get('class'),
         'author_email': author_email,
         'file_link': file_link or None,
         'file_path': file_path,
         'file_type': file_type,
         'status': 'pending',
         'approved': False,
-        'likes': [],
-        'comments': [],
+        'like_count': 0,
+        'comment_count': 0,
         'created_at': dt.datetime.utcnow().isoformat()
     }
     db.add_blog(blog)
@@ -1056,7 +1243,7 @@ def api_blog_post():
                 "Log in to the admin panel to review and approve:\n"
                 "URL: /admin/blogs?status=pending"
             )
-            mail.send(msg)
+            mail_queue.enqueue(msg)
     except Exception as e:
         app.logger.error("Failed to send blog notification email: %s", e)
     # ---------------------------------------------------------------
@@ -1065,9 +1252,33 @@ def api_blog_post():
 
 
 @app.route('/api/blogs')
+@conditional('blogs')
 def api_blogs():
-    blogs = db.list_blogs(approved_only=True)
-    return jsonify(blogs)
+    """Approved blogs, newest first, one page per request.
+
+    ?limit= sets the page size; follow the X-Next-Cursor header (also sent
+    as a Link rel=next) with ?cursor= for the next page. Like and comment
+    counts come from the blog's like_count / comment_count.
+    """
+    try:
+        limit = min(max(int(request.args.get('limit') or API_PAGE_SIZE), 1), API_MAX_PAGE_SIZE)
+    except ValueError:
+        limit = API_PAGE_SIZE
+    blogs, pager = _paged_blogs(limit, 'api_blogs', approved_only=True)
+
+    result = []
+    for b in blogs:
+        item = {k: v for k, v in b.items() if k != '_id'}
+        item.setdefault('like_count', 0)
+        item.setdefault('comment_count', 0)
+        result.append(item)
+
+    resp = jsonify(result)
+    if pager['next_cursor']:
+        resp.headers['X-Next-Cursor'] = pager['next_cursor']
+        next_link = url_for('api_blogs', cursor=pager['next_cursor'], limit=limit)
+        resp.headers['Link'] = f'<{next_link}>; rel="next"'
+    return resp
 
 # ---------- FACULTY LOGIN WITH EMAIL + PASSWORD + OTP ----------
 
@@ -1081,23 +1292,8 @@ def api_faculty_login():
     if not (email and password):
         return jsonify({'success': False, 'message': 'Email and password are required.'}), 400
 
-    faculty = None
-    json_data = None
-    faculty_list = None
-
     # --- Look up faculty by email ---
-    if getattr(db, "use_mongo", False):
-        # Using MongoDB backend
-        faculty = db.db.faculty.find_one({'email': email})
-    else:
-        # Using JSON file backend (database.json)
-        json_data = db._read()
-        faculty_list = json_data.get('faculty', [])
-        for f in faculty_list:
-            if f.get('email') == email:
-                faculty = f
-                break
-
+    faculty = db.find_faculty_by_email(email)
     if not faculty:
         return jsonify({'success': False, 'message': 'Invalid email or password.'}), 401
 
@@ -1109,35 +1305,19 @@ def api_faculty_login():
 
     # --- First-time login: set password if no hash stored yet ---
     if not stored_hash:
-        new_hash = generate_password_hash(password)
-        if getattr(db, "use_mongo", False):
-            db.db.faculty.update_one({'id': faculty.get('id')}, {'$set': {'password_hash': new_hash}})
-        else:
-            for f in faculty_list:
-                if f.get('email') == email:
-                    f['password_hash'] = new_hash
-                    break
-            json_data['faculty'] = faculty_list
-            db._write(json_data)
+        new_hash = hasher.hash(password)
+        db.update_faculty(faculty.get('id'), {'password_hash': new_hash})
         stored_hash = new_hash
 
     # --- Verify password ---
-    if not check_password_hash(stored_hash, password):
+    if not hasher.verify(stored_hash, password):
         return jsonify({'success': False, 'message': 'Invalid email or password.'}), 401
+    rehash_password('faculty', dict(faculty, password_hash=stored_hash), password)
 
-    # --- Build session object (used in navbar + profile) ---
-    faculty_session = {
-        'id': faculty.get('id'),
-        'name': faculty.get('name'),
-        'email': faculty.get('email'),
-        'designation': faculty.get('designation'),
-        'phone': faculty.get('phone'),
-        'avatar': faculty.get('avatar') or faculty.get('profile_image'),
-    }
-    session['faculty'] = faculty_session
-    session.pop('student', None)  # ensure not both at once
+    # --- Start the session (only the id is stored; see session_user) ---
+    profile = start_user_session('faculty', faculty)
 
-    return jsonify({'success': True, 'message': 'Faculty login successful.', 'faculty': faculty_session})
+    return jsonify({'success': True, 'message': 'Faculty login successful.', 'faculty': profile})
 
 
 
@@ -1154,22 +1334,15 @@ def api_faculty_signup():
         return jsonify({'success': False, 'message': 'Name, email and password are required.'}), 400
 
     # --- Check for existing email ---
-    if getattr(db, "use_mongo", False):
-        existing = db.db.faculty.find_one({'email': email})
-        if existing:
-            return jsonify({'success': False, 'message': 'A faculty account already exists for this email.'}), 400
-    else:
-        all_data = db._read()
-        faculty_list = all_data.get('faculty', [])
-        if any(f.get('email') == email for f in faculty_list):
-            return jsonify({'success': False, 'message': 'A faculty account already exists for this email.'}), 400
+    if db.find_faculty_by_email(email):
+        return jsonify({'success': False, 'message': 'A faculty account already exists for this email.'}), 400
 
     new_fac = {
         'id': str(uuid.uuid4()),
         'name': name,
         'email': email,
         'designation': designation,
-        'password_hash': generate_password_hash(password),
+        'password_hash': hasher.hash(password),
         'is_active': True,
         'created_at': dt.datetime.utcnow().isoformat()
     }
@@ -1186,9 +1359,9 @@ def api_faculty_logout():
 
 @app.route('/api/faculty/check-session')
 def api_faculty_check_session():
-    fac = session.get('faculty')
+    fac = session_user('faculty')
     if fac:
-        return jsonify({'logged_in': True, 'faculty': fac})
+        return jsonify({'logged_in': True, 'faculty': session_profile('faculty', fac)})
     return jsonify({'logged_in': False})
 
 # ---------- CONTACT API ----------
@@ -1221,7 +1394,7 @@ def api_contact():
             if ADMIN_EMAIL:
                 msg = Message(subject=f"Contact: {subject}", recipients=[ADMIN_EMAIL])
                 msg.body = f"From: {name} <{email}>\n\n{message}"
-                mail.send(msg)
+                mail_queue.enqueue(msg)
 
             # 2) Thank-you email to student
             if email:
@@ -1238,7 +1411,7 @@ def api_contact():
                     "Regards,\n"
                     "Department of Computer Science"
                 )
-                mail.send(thanks)
+                mail_queue.enqueue(thanks)
     except Exception as e:
         app.logger.error("Failed to send contact emails: %s", e)
 
@@ -1246,6 +1419,7 @@ def api_contact():
 # ---------- PUBLIC DATA APIs FOR HOME PAGE ----------
 
 @app.route('/api/notifications')
+@conditional('notifications')
 def api_notifications():
     """
     Returns rich announcements for:
@@ -1266,8 +1440,7 @@ def api_notifications():
         date_str = 'Notification'
         if isinstance(date_val, str):
             try:
-                dt = dt.datetime.fromisoformat(date_val)
-                date_str = dt.strftime('%d %b %Y')
+                date_str = dt.datetime.fromisoformat(date_val).strftime('%d %b %Y')
             except Exception:
                 pass
         elif isinstance(date_val, dt.datetime):
@@ -1296,23 +1469,26 @@ def api_notifications():
     return jsonify(result)
 
 @app.route('/api/gallery')
+@conditional('gallery')
 def api_gallery():
     """Return gallery items; optional ?category=events / industrial_tour / infrastructure / general."""
     category = request.args.get('category')
     items = db.list_gallery()
     result = []
-    for g in items:
-        if category and g.get('category') != category:
+    for item in items:
+        if category and item.get('category') != category:
             continue
-        img = g.get('image') or g.get('file') or g.get('path')
+        img = item.get('image') or item.get('file') or item.get('path')
         if img and not img.startswith('http'):
             img = '/uploads/' + img if not img.startswith('/uploads/') else img
         result.append({
-            'id': g.get('id'),
-            'title': g.get('title'),
-            'category': g.get('category'),
-            'description': g.get('description'),
-            'image': img or ''
+            'id': item.get('id'),
+            'title': item.get('title'),
+            'category': item.get('category'),
+            'description': item.get('description'),
+            'image': img or '',
+            'srcset': srcset(item.get('image_variants')),
+            'srcset_jpeg': srcset(item.get('image_variants'), 'image/jpeg'),
         })
     return jsonify(result)
 
@@ -1320,14 +1496,60 @@ def api_gallery():
     return jsonify(events)
 
 @app.route('/api/faculty')
+@conditional('faculty')
 def api_faculty():
     return jsonify(db.list_faculty())
 
+@app.route('/api/search')
+@conditional('blogs', 'research', 'events', 'notifications')
+def api_search():
+    """Ranked full-text search: ?q=words, optional ?type=blogs,events and ?limit= / ?offset=."""
+    q = (request.args.get('q') or '').strip()
+    try:
+        limit = min(max(int(request.args.get('limit') or API_PAGE_SIZE), 1), API_MAX_PAGE_SIZE)
+        offset = max(int(request.args.get('offset') or 0), 0)
+    except ValueError:
+        limit, offset = API_PAGE_SIZE, 0
+    colls = {t for t in (request.args.get('type') or '').split(',') if t} or None
+    total, hits = search_index.search(q, limit=limit, offset=offset, colls=colls) if q else (0, [])
+    for hit in hits:
+        hit['url'] = _search_result_url(hit)
+    return jsonify({'success': True, 'query': q, 'total': total, 'results': hits})
+
+def _search_result_url(hit):
+    coll = hit['coll']
+    if coll == 'blogs':
+        return url_for('blog_detail', blog_id=hit['id'])
+    if coll == 'research':
+        if hit.get('pdf_link'):
+            return hit['pdf_link']
+        if hit.get('pdf_path'):
+            return url_for('static', filename=str(hit['pdf_path']).lstrip('/'))
+        return url_for('research')
+    if coll == 'events':
+        return url_for('events')
+    return hit.get('link_url') or hit.get('file_path') or url_for('home')
+
+
+@app.route('/api/suggest')
+def api_suggest():
+    """Completions for ?prefix=, optionally only ?type=faculty,blogs; students are admin-only."""
+    try:
+        limit = min(max(int(request.args.get('limit') or 8), 1), 50)
+    except ValueError:
+        limit = 8
+    colls = {t for t in (request.args.get('type') or '').split(',') if t} or None
+    items = suggester.suggest(request.args.get('prefix') or '', limit=limit, colls=colls,
+                              public_only=not session.get('admin'))
+    return jsonify({'success': True, 'suggestions': items})
+
 # ---------- UPLOADS ----------
 
+# Older records point at /static/uploads/...; both prefixes serve the same files.
 @app.route('/uploads/<path:filename>')
+@app.route('/static/uploads/<path:filename>')
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    return uploads.send(filename, UPLOADS_ACCEL_PREFIX)
 
 
 # ---------- ADMIN (complete admin section) ----------
@@ -1357,10 +1579,7 @@ def _to_dt(value):
     return None
 
 def _wrap_list_with_id(items):
-    wrapped = []
-    for d in items:
-        wrapped.append(type("Obj", (object,), {**d, "_id": d.get("id")})())
-    return wrapped
+    return [View(d, _id=d.get("id")) for d in items]
 
 # ---- Admin Auth ----
 
@@ -1376,6 +1595,8 @@ def admin_login_post():
     username = request.form.get('username')
     password = request.form.get('password')
     if username == ADMIN_USER and password == ADMIN_PASS:
+        if hasattr(session, 'rotate'):
+            session.rotate()
         session['admin'] = True
         return redirect(url_for('admin_dashboard'))
     flash('Invalid username or password', 'error')
@@ -1390,6 +1611,41 @@ def admin_logout():
 
 # ---- Dashboard ----
 
+@app.route('/admin/metrics', endpoint='admin_metrics')
+@admin_required
+def admin_metrics():
+    if request.args.get('format') == 'json':
+        return jsonify(metrics.snapshot())
+    return render_template('admin/metrics.html', metrics=metrics.snapshot())
+
+@app.route('/admin/metrics/reset', methods=['POST'], endpoint='admin_metrics_reset')
+@admin_required
+def admin_metrics_reset():
+    metrics.reset()
+    flash('Metrics reset', 'success')
+    return redirect(url_for('admin_metrics'))
+
+@app.route('/metrics', endpoint='metrics_prometheus')
+def metrics_prometheus():
+    auth = request.headers.get('Authorization', '')
+    if not (session.get('admin') or (METRICS_TOKEN and hmac.compare_digest(auth, f'Bearer {METRICS_TOKEN}'))):
+        abort(403)
+    resp = make_response(metrics.prometheus())
+    resp.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    resp.headers['Cache-Control'] = 'no-store'
+    return resp
+
+@app.route('/admin/cache-stats', endpoint='admin_cache_stats')
+@admin_required
+def admin_cache_stats():
+    return jsonify({'db': db.cache_stats(), 'pages': page_cache.stats(), 'mail': mail_queue.stats(),
+                    'images': image_variants.stats(), 'compression': compressor.stats(),
+                    'search': search_index.stats(), 'suggest': suggester.stats(),
+                    'hashing': hasher.stats(),
+                    'sessions': {'backend': SESSION_BACKEND,
+                                 'stored': session_store.count() if session_store else None}})
+
+
 @app.route('/admin', endpoint='admin_dashboard')
 @admin_required
 def admin_dashboard():
@@ -1400,30 +1656,30 @@ def admin_dashboard():
     faculty = db.list_faculty()
 
     # stats object used in dashboard.html
-    stats = type("Stats", (object,), {
+    stats = View({
         "total_students": len(students),
         "pending_blogs": len(blogs_pending),
         "total_contacts": len(contacts),
         "total_events": len(events),
         "total_faculty": len(faculty),
-    })()
+    })
 
     # decorate recent contacts with datetime
     contacts_sorted = sorted(contacts, key=lambda c: _to_dt(c.get("created_at")) or dt.datetime.min, reverse=True)
     recent_contacts = []
     for c in contacts_sorted[:5]:
         dt_val = _to_dt(c.get("created_at"))
-        recent_contacts.append(type("ContactObj", (object,), {**c, "created_at": dt_val})())
+        recent_contacts.append(View(c, created_at=dt_val))
 
     # pending blogs list for dashboard card
     pending_objs = []
     for b in blogs_pending[:5]:
         created = _to_dt(b.get("created_at"))
-        pending_objs.append(type("BlogObj", (object,), {
+        pending_objs.append(View({
             "title": b.get("title"),
             "author_name": b.get("author_name") or b.get("student_name") or "Anonymous",
             "created_at": created
-        })())
+        }))
 
     return render_template(
         'admin/dashboard.html',
@@ -1439,14 +1695,10 @@ def admin_dashboard():
 @admin_required
 def admin_blogs():
     status = request.args.get('status', 'all')
-    if status == 'pending':
-        blogs = db.list_blogs(approved_only=False, status='pending')
-    elif status == 'approved':
-        blogs = db.list_blogs(approved_only=False, status='approved')
-    elif status == 'rejected':
-        blogs = db.list_blogs(approved_only=False, status='rejected')
+    if status in ('pending', 'approved', 'rejected'):
+        blogs, pager = _paged_blogs(ADMIN_PAGE_SIZE, 'admin_blogs', approved_only=False, status=status)
     else:
-        blogs = db.list_blogs(approved_only=False)
+        blogs, pager = _paged_blogs(ADMIN_PAGE_SIZE, 'admin_blogs', approved_only=False)
 
     decorated = []
     for b in blogs:
@@ -1454,15 +1706,15 @@ def admin_blogs():
         if not status_val:
             status_val = 'approved' if b.get('approved') else 'pending'
         created = _to_dt(b.get('created_at'))
-        decorated.append(type('BlogObj', (object,),{
+        decorated.append(View({
             '_id': b.get('id'),
             'title': b.get('title'),
             'student_id': b.get('student_id'),
             'author_name': b.get('author_name'),
             'status': status_val,
             'created_at': created
-        })())
-    return render_template('admin/blogs.html', blogs=decorated, current_filter=status)
+        }))
+    return render_template('admin/blogs.html', blogs=decorated, current_filter=status, pager=pager)
 
 
 @app.route('/admin/blogs/approve/<blog_id>', methods=['POST'], endpoint='approve_blog')
@@ -1495,7 +1747,7 @@ def approve_blog(blog_id):
                     "Regards,\n"
                     "Department of Computer Science"
                 )
-                mail.send(msg)
+                mail_queue.enqueue(msg)
         except Exception as e:
             app.logger.error("Failed to send blog approval email: %s", e)
 
@@ -1513,7 +1765,9 @@ def reject_blog(blog_id):
 @app.route('/admin/blogs/delete/<blog_id>', methods=['POST'], endpoint='delete_blog')
 @admin_required
 def delete_blog(blog_id):
+    blog = db.get_blog(blog_id)
     db.delete_blog(blog_id)
+    release_uploads(blog)
     return redirect(url_for('admin_blogs'))
 
 
@@ -1526,7 +1780,7 @@ def admin_contacts():
     decorated = []
     for c in contacts:
         ca_dt = _to_dt(c.get('created_at'))
-        decorated.append(type("ContactObj", (object,), {**c, "_id": c.get("id"), "created_at": ca_dt})())
+        decorated.append(View(c, _id=c.get("id"), created_at=ca_dt))
     return render_template('admin/contacts.html', contacts=decorated)
 
 
@@ -1553,22 +1807,21 @@ def admin_students():
     decorated = []
     for s in students:
         ca_dt = _to_dt(s.get('created_at'))
-        decorated.append(type('Stu',(object,),{
+        decorated.append(View({
             '_id': s.get('id'),
             'name': s.get('name'),
             'student_id': s.get('student_id'),
             'email': s.get('email'),
             'is_active': s.get('is_active', True),
             'created_at': ca_dt
-        })())
+        }))
     return render_template('admin/students.html', students=decorated)
 
 
 @app.route('/admin/students/toggle/<student_id>', methods=['POST'], endpoint='toggle_student')
 @admin_required
 def toggle_student(student_id):
-    students = db.list_students()
-    target = next((s for s in students if s.get('id') == student_id), None)
+    target = db.get_student(student_id)
     if target:
         db.update_student(student_id, {'is_active': not target.get('is_active', True)})
     return redirect(url_for('admin_students'))
@@ -1577,7 +1830,9 @@ def toggle_student(student_id):
 @app.route('/admin/students/delete/<student_id>', methods=['POST'], endpoint='delete_student')
 @admin_required
 def delete_student(student_id):
+    student = db.get_student(student_id)
     db.delete_student(student_id)
+    release_uploads(student)
     return redirect(url_for('admin_students'))
 
 
@@ -1610,14 +1865,10 @@ def add_faculty():
         resume_path = None
 
         if photo_file and allowed_file(photo_file.filename, ALLOWED_IMG):
-            filename = secure_filename(str(uuid.uuid4()) + "-" + photo_file.filename)
-            photo_file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-            photo_path = '/uploads/' + filename
+            photo_path = uploads.save(photo_file)
 
         if resume_file and allowed_file(resume_file.filename, ALLOWED_DOC):
-            filename = secure_filename(str(uuid.uuid4()) + "-" + resume_file.filename)
-            resume_file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-            resume_path = '/uploads/' + filename
+            resume_path = uploads.save(resume_file)
 
         faculty = {
             'id': str(uuid.uuid4()),
@@ -1633,6 +1884,8 @@ def add_faculty():
             'order': order,
         }
         db.add_faculty(faculty)
+        if photo_path:
+            make_variants('faculty', faculty['id'], 'photo', photo_path)
         return redirect(url_for('admin_faculty'))
 
     return render_template('admin/faculty_form.html', faculty=None)
@@ -1641,9 +1894,7 @@ def add_faculty():
 @app.route('/admin/faculty/edit/<faculty_id>', methods=['GET', 'POST'], endpoint='edit_faculty')
 @admin_required
 def edit_faculty(faculty_id):
-    # Use list_faculty so it works in Mongo or JSON mode
-    faculty_list = db.list_faculty() or []
-    fac = next((f for f in faculty_list if str(f.get('id')) == str(faculty_id)), None)
+    fac = db.get_faculty(faculty_id)
 
     if not fac:
         flash('Faculty not found', 'error')
@@ -1665,20 +1916,20 @@ def edit_faculty(faculty_id):
         resume_file = request.files.get('resume')
 
         if photo_file and allowed_file(photo_file.filename, ALLOWED_IMG):
-            filename = secure_filename(str(uuid.uuid4()) + "-" + photo_file.filename)
-            photo_file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-            changes['photo'] = '/uploads/' + filename
+            changes['photo'] = uploads.save(photo_file)
+            changes['photo_variants'] = []
 
         if resume_file and allowed_file(resume_file.filename, ALLOWED_DOC):
-            filename = secure_filename(str(uuid.uuid4()) + "-" + resume_file.filename)
-            resume_file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-            changes['resume'] = '/uploads/' + filename
+            changes['resume'] = uploads.save(resume_file)
 
         db.update_faculty(faculty_id, changes)
+        release_uploads(*(fac.get(k) for k in ('photo', 'photo_variants', 'resume') if k in changes))
+        if 'photo' in changes:
+            make_variants('faculty', faculty_id, 'photo', changes['photo'])
         flash('Faculty updated successfully.', 'success')
         return redirect(url_for('admin_faculty'))
 
-    fac_obj = type("FacObj", (object,), dict(fac))()
+    fac_obj = View(fac)
     return render_template('admin/faculty_form.html', faculty=fac_obj)
 
 
@@ -1686,7 +1937,9 @@ def edit_faculty(faculty_id):
 @app.route('/admin/faculty/delete/<faculty_id>', methods=['POST'], endpoint='delete_faculty')
 @admin_required
 def delete_faculty(faculty_id):
+    fac = db.get_faculty(faculty_id)
     db.delete_faculty(faculty_id)
+    release_uploads(fac)
     return redirect(url_for('admin_faculty'))
 
 
@@ -1699,7 +1952,7 @@ def admin_events():
     decorated = []
     for e in events:
         dt_val = _to_dt(e.get('date'))
-        decorated.append(type("EventObj",(object,),{**e, "_id": e.get("id"), "date": dt_val})())
+        decorated.append(View(e, _id=e.get("id"), date=dt_val))
     return render_template('admin/events.html', events=decorated)
 
 
@@ -1716,9 +1969,7 @@ def add_event():
         image_file = request.files.get('image')
         image_path = None
         if image_file and allowed_file(image_file.filename, ALLOWED_IMG):
-            filename = secure_filename(str(uuid.uuid4()) + "-" + image_file.filename)
-            image_file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-            image_path = '/uploads/' + filename
+            image_path = uploads.save(image_file)
 
         event = {
             'id': str(uuid.uuid4()),
@@ -1730,6 +1981,8 @@ def add_event():
             'order': order,
         }
         db.add_event(event)
+        if image_path:
+            make_variants('events', event['id'], 'image', image_path)
         return redirect(url_for('admin_events'))
 
     return render_template('admin/event_form.html', event=None)
@@ -1738,8 +1991,7 @@ def add_event():
 @app.route('/admin/events/edit/<event_id>', methods=['GET', 'POST'], endpoint='edit_event')
 @admin_required
 def edit_event(event_id):
-    events = db.list_events() or []
-    ev = next((e for e in events if str(e.get('id')) == str(event_id)), None)
+    ev = db.get_event(event_id)
 
     if not ev:
         flash('Event not found', 'error')
@@ -1756,22 +2008,26 @@ def edit_event(event_id):
 
         image_file = request.files.get('image')
         if image_file and allowed_file(image_file.filename, ALLOWED_IMG):
-            filename = secure_filename(str(uuid.uuid4()) + "-" + image_file.filename)
-            image_file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-            changes['image'] = '/uploads/' + filename
+            changes['image'] = uploads.save(image_file)
+            changes['image_variants'] = []
 
         db.update_event(event_id, changes)
+        if 'image' in changes:
+            release_uploads(ev.get('image'), ev.get('image_variants'))
+            make_variants('events', event_id, 'image', changes['image'])
         flash('Event updated successfully.', 'success')
         return redirect(url_for('admin_events'))
 
-    ev_obj = type("EventObj", (object,), dict(ev))()
+    ev_obj = View(ev)
     return render_template('admin/event_form.html', event=ev_obj)
 
 
 @app.route('/admin/events/delete/<event_id>', methods=['POST'], endpoint='delete_event')
 @admin_required
 def delete_event(event_id):
+    ev = db.get_event(event_id)
     db.delete_event(event_id)
+    release_uploads(ev)
     return redirect(url_for('admin_events'))
 
 
@@ -1797,9 +2053,7 @@ def add_gallery_item():
         image_file = request.files.get('image')
         image_path = None
         if image_file and allowed_file(image_file.filename, ALLOWED_IMG):
-            filename = secure_filename(str(uuid.uuid4()) + "-" + image_file.filename)
-            image_file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-            image_path = '/uploads/' + filename
+            image_path = uploads.save(image_file)
 
         item = {
             'id': str(uuid.uuid4()),
@@ -1810,6 +2064,8 @@ def add_gallery_item():
             'description': description,
         }
         db.add_gallery(item)
+        if image_path:
+            make_variants('gallery', item['id'], 'image', image_path)
         return redirect(url_for('admin_gallery'))
 
     return render_template('admin/gallery_form.html')
@@ -1818,7 +2074,9 @@ def add_gallery_item():
 @app.route('/admin/gallery/delete/<item_id>', methods=['POST'], endpoint='delete_gallery_item')
 @admin_required
 def delete_gallery_item(item_id):
+    item = db.get_gallery(item_id)
     db.delete_gallery(item_id)
+    release_uploads(item)
     return redirect(url_for('admin_gallery'))
 
 
@@ -1855,9 +2113,7 @@ def add_research():
         pdf_file = request.files.get('pdf')
         pdf_path = None
         if pdf_file and allowed_file(pdf_file.filename, {'pdf'}):
-            filename = secure_filename(str(uuid.uuid4()) + "-" + pdf_file.filename)
-            pdf_file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-            pdf_path = '/uploads/' + filename
+            pdf_path = uploads.save(pdf_file)
 
         paper = {
             'id': str(uuid.uuid4()),
@@ -1877,7 +2133,9 @@ def add_research():
 @app.route('/admin/research/delete/<research_id>', methods=['POST'], endpoint='admin_delete_research')
 @admin_required
 def delete_research(research_id):
+    paper = db.get_research(research_id)
     db.delete_research(research_id)
+    release_uploads(paper)
     return redirect(url_for('admin_research'))
 
 
@@ -1890,7 +2148,7 @@ def admin_notifications():
     decorated = []
     for n in notifications:
         dt_val = _to_dt(n.get('date') or n.get('created_at'))
-        decorated.append(type("NotifObj",(object,),{**n, "_id": n.get("id"), "date": dt_val})())
+        decorated.append(View(n, _id=n.get("id"), date=dt_val))
     return render_template('admin/notifications.html', notifications=decorated)
 
 
@@ -1916,9 +2174,7 @@ def add_notification():
         file = request.files.get('file')
         file_path = None
         if file and file.filename:
-            filename = secure_filename(str(uuid.uuid4()) + "-" + file.filename)
-            file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-            file_path = '/uploads/' + filename
+            file_path = uploads.save(file)
 
         notif = {
             'id': str(uuid.uuid4()),
@@ -1941,8 +2197,7 @@ def add_notification():
 @app.route('/admin/notifications/toggle/<notif_id>', methods=['POST'], endpoint='toggle_notification')
 @admin_required
 def toggle_notification(notif_id):
-    notifications = db.list_notifications() or []
-    n = next((x for x in notifications if str(x.get('id')) == str(notif_id)), None)
+    n = db.get_notification(notif_id)
 
     if n:
         new_state = not n.get('is_active', True)
@@ -1955,7 +2210,9 @@ def toggle_notification(notif_id):
 @app.route('/admin/notifications/delete/<notif_id>', methods=['POST'], endpoint='delete_notification')
 @admin_required
 def delete_notification(notif_id):
+    notif = db.get_notification(notif_id)
     db.delete_notification(notif_id)
+    release_uploads(notif)
     return redirect(url_for('admin_notifications'))
 
 
@@ -2004,9 +2261,7 @@ def add_csa_member():
 @app.route('/admin/csa/edit/<member_id>', methods=['GET', 'POST'], endpoint='edit_csa_member')
 @admin_required
 def edit_csa_member(member_id):
-    # Works for both MongoDB and JSON
-    members = db.list_csa_members() or []
-    mem = next((m for m in members if str(m.get('id')) == str(member_id)), None)
+    mem = db.get_csa_member(member_id)
 
     if not mem:
         flash('CSA member not found', 'error')
@@ -2025,7 +2280,7 @@ def edit_csa_member(member_id):
         flash('CSA member updated successfully.', 'success')
         return redirect(url_for('admin_csa_members'))
 
-    mem_obj = type("MemObj", (object,), dict(mem))()
+    mem_obj = View(mem)
     return render_template('admin/csa_member_form.html', member=mem_obj)
 
 
@@ -2049,17 +2304,8 @@ def admin_csa_past_add():
         flash('Year and PDF file are required.', 'danger')
         return redirect(url_for('admin_csa_members'))
 
-    filename = secure_filename(pdf_file.filename)
-    # ensure uploads folder
-    upload_dir = os.path.join(app.root_path, 'static', 'uploads', 'past_csa')
-    os.makedirs(upload_dir, exist_ok=True)
-
-    file_id = f"{uuid.uuid4().hex}_{filename}"
-    save_path = os.path.join(upload_dir, file_id)
-    pdf_file.save(save_path)
-
-    # store relative path for URL
-    rel_path = f"uploads/past_csa/{file_id}"
+    # stored relative to /static for url_for('static', ...)
+    rel_path = uploads.save(pdf_file).lstrip('/')
 
     entry = {
         'id': str(uuid.uuid4()),
@@ -2076,29 +2322,20 @@ def admin_csa_past_add():
 @app.route('/admin/csa/past/delete/<entry_id>', methods=['POST'], endpoint='admin_csa_past_delete')
 @admin_required
 def admin_csa_past_delete(entry_id):
-    # optionally also remove file from disk
-    items = db.list_past_csa()
-    target = next((e for e in items if e.get('id') == entry_id), None)
-    if target:
-        path = target.get('pdf_path')
-        if path:
-            full = os.path.join(app.root_path, 'static', path)
-            try:
-                if os.path.exists(full):
-                    os.remove(full)
-            except Exception as e:
-                app.logger.error('Failed to remove past CSA pdf: %s', e)
+    target = db.get_past_csa(entry_id)
     db.delete_past_csa(entry_id)
+    release_uploads(target)
     flash('Past CSA entry removed.', 'success')
     return redirect(url_for('admin_csa_members'))
 @app.route("/curriculum")
+@page_cache.cached('curriculum')
 def curriculum():
     data = db.list_curriculum()
-    print("CURRICULUM DATA:", data)  # DEBUG
     return render_template("curriculum.html", records=data)
 
 
 @app.route("/api/curriculum")
+@conditional('curriculum')
 def api_curriculum():
     data = db.list_curriculum()
     for r in data:
@@ -2122,22 +2359,16 @@ def upload_curriculum():
         flash("PDF required", "error")
         return redirect(url_for("admin_curriculum"))
 
-    filename = secure_filename(f"{degree}_{year}.pdf")
-
-    # Ensure directory exists
-    upload_dir = os.path.join("static", "uploads", "syllabus")
-    os.makedirs(upload_dir, exist_ok=True)
-
-    save_path = os.path.join(upload_dir, filename)
-    pdf.save(save_path)
+    previous = db.get_curriculum(degree, year)
 
     # Save to DB
     db.add_or_update_curriculum({
         "degree": degree,
         "year": year,
-        "pdf_url": f"/static/uploads/syllabus/{filename}",
+        "pdf_url": "/static" + uploads.save(pdf),
         "uploaded_at": dt.datetime.now().strftime("%Y-%m-%d")
     })
+    release_uploads(previous)
 
     flash("Curriculum uploaded / replaced successfully", "success")
     return redirect(url_for("admin_curriculum"))
@@ -2151,28 +2382,21 @@ def delete_curriculum():
         flash("Invalid delete request", "error")
         return redirect(url_for("admin_curriculum"))
 
-    records = db.list_curriculum()
-    rec = next(
-        (r for r in records if r.get("degree") == degree and r.get("year") == year),
-        None
-    )
+    rec = db.get_curriculum(degree, year)
 
     if not rec:
         flash("Curriculum not found", "error")
         return redirect(url_for("admin_curriculum"))
 
-    # Delete PDF file
-    pdf_path = rec.get("pdf_url", "").lstrip("/")
-    if pdf_path and os.path.exists(pdf_path):
-        os.remove(pdf_path)
-
-    # Delete from DB
+    # Delete from DB, then the PDF unless another record shares it
     db.delete_curriculum(degree, year)
+    release_uploads(rec)
 
     flash("Curriculum deleted successfully", "success")
     return redirect(url_for("admin_curriculum"))
 
 @app.route("/api/alumni")
+@conditional('alumni')
 def api_alumni():
     return jsonify(db.list_alumni())
 @app.route("/admin/alumni")
@@ -2189,33 +2413,103 @@ def add_alumni():
         flash("Photo required", "error")
         return redirect(url_for("admin_alumni"))
 
-    filename = secure_filename(photo.filename)
-    filename = f"{uuid.uuid4()}-{filename}"
-    path = os.path.join("static/uploads/alumni", filename)
-
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    photo.save(path)
-
     entry = {
         "id": str(uuid.uuid4()),
         "name": name,
         "message": message,
-        "photo": "/" + path.replace("\\", "/"),
+        "photo": "/static" + uploads.save(photo),
         "created_at": dt.datetime.now().strftime("%Y-%m-%d")
 
     }
 
     db.add_alumni(entry)
+    make_variants('alumni', entry['id'], 'photo', entry['photo'])
 
     flash("Alumni testimonial added", "success")
     return redirect(url_for("admin_alumni"))
 @app.route("/admin/alumni/delete/<aid>")
 def delete_alumni(aid):
+    entry = db.get_alumni(aid)
     db.delete_alumni(aid)
+    release_uploads(entry)
     flash("Alumni testimonial deleted", "success")
     return redirect(url_for("admin_alumni"))
 
 
+# ---------- CLI ----------
+
+@app.cli.command('migrate-sqlite')
+def migrate_sqlite_command():
+    """Copy database.json into the SQLite file at SQLITE_PATH."""
+    counts = migrate_json_to_sqlite(db.file, SQLITE_PATH)
+    for name, n in sorted(counts.items()):
+        print(f"{name}: {n}")
+    print(f"Migrated {db.file} -> {SQLITE_PATH}")
+
+
+# Record fields holding photos that get resized copies.
+IMAGE_FIELDS = [('gallery', 'image'), ('faculty', 'photo'), ('events', 'image'), ('alumni', 'photo'),
+                ('students', 'avatar'), ('faculty', 'avatar')]
+
+
+@app.cli.command('images-backfill')
+@click.option('--workers', default=os.cpu_count() or 1, show_default=True, help='Resizing processes.')
+@click.option('--progress', default=os.path.join(os.getcwd(), 'image_backfill.jsonl'), show_default=True,
+              help='Progress file; an interrupted run resumes from it.')
+def images_backfill_command(workers, progress):
+    """Make resized copies of existing photos and store them on their records."""
+    counts = image_variants.backfill(db, IMAGE_FIELDS, progress, workers=workers)
+    for name, n in sorted(counts.items()):
+        print(f"{name}: {n} record(s) updated")
+
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Fingerprint and precompress static files; restart the app to use them."""
+    totals = assets.build()
+    print(f"{totals['files']} file(s), {totals['bytes']} bytes; text files {totals['text']} bytes -> "
+          f"gzip {totals['gz']} / brotli {totals['br']}")
+    print(f"Manifest: {assets.manifest_path}")
+
+
+@app.cli.command('uploads-gc')
+@click.option('--dry-run', is_flag=True, help='Only list what would be deleted.')
+@click.option('--grace', default=3600, show_default=True, help='Keep files younger than this many seconds.')
+def uploads_gc_command(dry_run, grace):
+    """Delete uploaded files that no database record refers to."""
+    removed = uploads.gc(db, grace=grace, dry_run=dry_run)
+    for name in removed:
+        print(name)
+    print(f"{'Would remove' if dry_run else 'Removed'} {len(removed)} orphaned file(s)")
+
+
+@app.cli.command('search-rebuild')
+def search_rebuild_command():
+    """Re-tokenize every searchable record and rewrite the search index."""
+    search_index.rebuild()
+    stats = search_index.stats()
+    print(f"Indexed {stats['documents']} record(s), {stats['terms']} term(s) -> {SEARCH_INDEX_PATH}")
+
+
+@app.cli.command('sessions-purge')
+@click.option('--all', 'everything', is_flag=True, help='Log everybody out, not just expired sessions.')
+def sessions_purge_command(everything):
+    """Delete expired server-side sessions."""
+    if session_store is None:
+        print(f"SESSION_BACKEND={SESSION_BACKEND} keeps sessions in the cookie; nothing to purge")
+        return
+    print(f"Removed {session_store.purge(everything=everything)} session(s)")
+
+
+@app.cli.command('uploads-dedup')
+def uploads_dedup_command():
+    """Rename legacy uploads to their content digest, merging duplicates."""
+    renames = uploads.dedup(db)
+    for old, new in sorted(renames.items()):
+        print(f"{old} -> {new}")
+    print(f"Moved {len(renames)} file(s) into {len(set(renames.values()))} blob(s)")
+
+
 @app.route('/send-test-email')
 def send_test_email():
     if not ADMIN_EMAIL:
@@ -2223,6 +2517,7 @@ def send_test_email():
     try:
         msg = Message(subject="Test email from CSD website", recipients=[ADMIN_EMAIL])
         msg.body = "This is a test email from your CSD website."
+        # sent inline on purpose: this route reports whether SMTP works
         mail.send(msg)
         return f"Test email sent to {ADMIN_EMAIL}", 200
     except Exception as e:
@@ -0,0 +1,124 @@
+import os, json, gzip, shutil, hashlib, mimetypes
+from flask import request, send_file, abort
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # .br copies are skipped; .gz is always written
+    brotli = None
+
+# Text formats worth compressing ahead of time.
+COMPRESSIBLE = {'.css', '.js', '.json', '.svg', '.html', '.txt', '.xml', '.map', '.ico'}
+SKIP_DIRS = {'uploads'}
+
+
+class Assets:
+    """Fingerprinted, precompressed copies of the files under static/.
+
+    `flask build-assets` copies every static file (user uploads excepted)
+    to <static>/<build_dir>/<path>.<hash>.<ext>, writes .gz and .br
+    siblings for text formats and records logical -> built path in
+    manifest.json. While a manifest is loaded, url_for('static', ...)
+    returns the fingerprinted URL, and the static view serves those URLs
+    with a one-year immutable Cache-Control, picking the .br or .gz copy
+    the client accepts. Files missing from the manifest are served as
+    before.
+    """
+
+    def __init__(self, app, build_dir='build'):
+        self.app = app
+        self.build_dir = build_dir
+        self.manifest_path = os.path.join(app.static_folder, build_dir, 'manifest.json')
+        self.manifest = {}
+        self._default_static = app.view_functions['static']
+        app.url_defaults(self._fingerprint)
+        app.view_functions['static'] = self.send_static
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            self.manifest = {}
+        return self.manifest
+
+    # ---------- URLs ----------
+    def _fingerprint(self, endpoint, values):
+        if endpoint == 'static':
+            built = self.manifest.get(values.get('filename'))
+            if built:
+                values['filename'] = built
+
+    # ---------- serving ----------
+    def send_static(self, filename):
+        if not filename.startswith(self.build_dir + '/'):
+            return self._default_static(filename=filename)
+        path = safe_join(self.app.static_folder, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        encoding = None
+        for enc, ext in (('br', '.br'), ('gzip', '.gz')):
+            if request.accept_encodings[enc] and os.path.isfile(path + ext):
+                path, encoding = path + ext, enc
+                break
+        resp = send_file(path, mimetype=mimetype, conditional=True, max_age=365 * 24 * 3600)
+        resp.cache_control.immutable = True
+        resp.cache_control.public = True
+        if encoding:
+            resp.content_encoding = encoding
+        if os.path.splitext(filename)[1] in COMPRESSIBLE:
+            resp.vary.add('Accept-Encoding')
+        return resp
+
+    # ---------- build ----------
+    def build(self):
+        """Write the fingerprinted and compressed copies plus the manifest."""
+        root = self.app.static_folder
+        out = os.path.join(root, self.build_dir)
+        manifest, totals = {}, {'files': 0, 'bytes': 0, 'text': 0, 'gz': 0, 'br': 0}
+        for dirpath, dirnames, filenames in os.walk(root):
+            rel_dir = os.path.relpath(dirpath, root)
+            if rel_dir == '.':
+                dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS | {self.build_dir}]
+            for name in filenames:
+                if name.startswith('.'):
+                    continue
+                logical = os.path.normpath(os.path.join(rel_dir, name)).replace(os.sep, '/')
+                src = os.path.join(dirpath, name)
+                with open(src, 'rb') as f:
+                    data = f.read()
+                stem, ext = os.path.splitext(logical)
+                built = f"{self.build_dir}/{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+                dest = os.path.join(root, built)
+                if not os.path.exists(dest):
+                    os.makedirs(os.path.dirname(dest), exist_ok=True)
+                    shutil.copyfile(src, dest)
+                manifest[logical] = built
+                totals['files'] += 1
+                totals['bytes'] += len(data)
+                if ext.lower() in COMPRESSIBLE:
+                    totals['text'] += len(data)
+                    totals['gz'] += _compressed(dest + '.gz', data, lambda d: gzip.compress(d, 9, mtime=0))
+                    if brotli is not None:
+                        totals['br'] += _compressed(dest + '.br', data, lambda d: brotli.compress(d, quality=11))
+        os.makedirs(out, exist_ok=True)
+        tmp = self.manifest_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.manifest_path)
+        self.manifest = manifest
+        return totals
+
+
+def _compressed(path, data, compress):
+    """Write compress(data) to `path` unless it does not save anything; returns the size served."""
+    if not os.path.exists(path):
+        packed = compress(data)
+        if len(packed) >= len(data):
+            return len(data)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(packed)
+        os.replace(path + '.tmp', path)
+    return os.path.getsize(path)
@@ -0,0 +1,251 @@
+import re, zlib, hashlib, threading
+from collections import OrderedDict
+from flask import request
+from werkzeug.datastructures import Headers
+
+try:
+    import brotli
+except ImportError:  # only gzip is offered
+    brotli = None
+
+# Content types worth compressing; images, PDFs, archives etc. already are.
+COMPRESSIBLE = re.compile(r'^(text/|application/(json|javascript|xml|[\w.+-]+\+(json|xml))|image/svg\+xml)')
+# Suffix added to the ETag of each encoding, so a compressed and an identity
+# copy never share a strong validator.
+ETAG_SUFFIX = {'br': '-br', 'gzip': '-gz'}
+
+
+class Compressor:
+    """WSGI middleware that gzip- or brotli-encodes text responses.
+
+    The encoding is negotiated from Accept-Encoding (br preferred). Bodies
+    shorter than `min_size`, non-text types, responses that already carry
+    a Content-Encoding (the precompressed static build) or a Content-Range,
+    and Cache-Control: no-transform are passed through untouched. Bodies
+    with a known length up to `stream_size` are compressed in one go and
+    sent with a Content-Length; longer or unsized ones are compressed
+    chunk by chunk as the app yields them.
+
+    Responses served through the page cache (X-Page-Cache header) are the
+    same bytes over and over, so their compressed form is kept in an LRU
+    of up to `cache_bytes`, keyed by a digest of the body, and compressed
+    at `cached_level` since that cost is paid once.
+
+    `endpoints` maps a Flask endpoint to its gzip level (1-9; 0 turns
+    compression off for it). Brotli uses quality level - 1.
+    """
+
+    def __init__(self, app, endpoints=None, level=6, cached_level=9, min_size=512,
+                 stream_size=1024 * 1024, cache_bytes=8 * 1024 * 1024):
+        self.wsgi_app = app.wsgi_app
+        self.endpoints = dict(endpoints or {})
+        self.level = level
+        self.cached_level = cached_level
+        self.min_size = min_size
+        self.stream_size = stream_size
+        self.cache_bytes = cache_bytes
+        self._cache = OrderedDict()  # (encoding, level, digest) -> compressed body
+        self._cached_size = 0
+        self._lock = threading.Lock()
+        self._stats = {'compressed': 0, 'streamed': 0, 'skipped': 0, 'bytes_in': 0, 'bytes_out': 0,
+                       'cache_hits': 0, 'cache_misses': 0}
+        app.wsgi_app = self
+        app.before_request(self._endpoint_level)
+
+    def _endpoint_level(self):
+        if request.endpoint in self.endpoints:
+            request.environ['compression.level'] = self.endpoints[request.endpoint]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, cache_entries=len(self._cache), cache_size=self._cached_size)
+        stats['ratio'] = (stats['bytes_out'] / stats['bytes_in']) if stats['bytes_in'] else 0.0
+        return stats
+
+    # ---------- WSGI ----------
+    def __call__(self, environ, start_response):
+        encoding = negotiate(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if environ.get('REQUEST_METHOD') == 'HEAD':
+            encoding = None
+        suffix = _strip_etag_suffix(environ)
+        captured = []
+
+        def capture(status, headers, exc_info=None):
+            captured[:] = [status, headers, exc_info]
+            return written.append
+
+        written = []  # bodies passed to the legacy write() callable
+        body = self.wsgi_app(environ, capture)
+        status, headers, exc_info = captured
+        headers = Headers(headers)
+
+        if status.startswith('304'):
+            # the client validated a compressed copy: echo the tag it knows
+            if suffix:
+                _suffix_etag(headers, suffix)
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return body
+
+        level = environ.get('compression.level', self.level)
+        if not level or not self._compressible(status, headers):
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return _chain(written, body)
+        _vary(headers)
+        length = headers.get('Content-Length', type=int)
+        if encoding is None or (length is not None and length < self.min_size):
+            self._count('skipped')
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return _chain(written, body)
+
+        if length is not None and length <= self.stream_size:
+            try:
+                data = b''.join(_chain(written, body))
+            finally:
+                if hasattr(body, 'close'):
+                    body.close()
+            if 'X-Page-Cache' in headers:
+                packed = self._cached(encoding, self.cached_level, data)
+            else:
+                packed = compress(encoding, level, data)
+            self._count('compressed', len(data), len(packed))
+            headers['Content-Encoding'] = encoding
+            headers['Content-Length'] = str(len(packed))
+            headers.remove('Accept-Ranges')
+            _suffix_etag(headers, ETAG_SUFFIX[encoding])
+            start_response(status, headers.to_wsgi_list(), exc_info)
+            return [packed]
+
+        headers.remove('Content-Length')
+        headers.remove('Accept-Ranges')  # byte ranges of the identity copy
+        headers['Content-Encoding'] = encoding
+        _suffix_etag(headers, ETAG_SUFFIX[encoding])
+        start_response(status, headers.to_wsgi_list(), exc_info)
+        return self._stream(encoding, level, _chain(written, body), body)
+
+    def _compressible(self, status, headers):
+        if status[:3] in ('204', '206') or 'Content-Encoding' in headers or 'Content-Range' in headers:
+            return False
+        if 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        return bool(COMPRESSIBLE.match(headers.get('Content-Type', '')))
+
+    def _stream(self, encoding, level, chunks, body):
+        packer = _packer(encoding, level)
+        size_in = size_out = 0
+        try:
+            for chunk in chunks:
+                size_in += len(chunk)
+                out = packer.process(chunk) if encoding == 'br' else packer.compress(chunk)
+                if out:
+                    size_out += len(out)
+                    yield out
+            out = packer.finish() if encoding == 'br' else packer.flush()
+            size_out += len(out)
+            yield out
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+            self._count('streamed', size_in, size_out)
+
+    # ---------- compressed page cache ----------
+    def _cached(self, encoding, level, data):
+        key = (encoding, level, hashlib.blake2b(data, digest_size=16).digest())
+        with self._lock:
+            packed = self._cache.get(key)
+            if packed is not None:
+                self._cache.move_to_end(key)
+                self._stats['cache_hits'] += 1
+                return packed
+            self._stats['cache_misses'] += 1
+        packed = compress(encoding, level, data)
+        if len(packed) <= self.cache_bytes:
+            with self._lock:
+                if key not in self._cache:
+                    self._cache[key] = packed
+                    self._cached_size += len(packed)
+                while self._cached_size > self.cache_bytes:
+                    _, old = self._cache.popitem(last=False)
+                    self._cached_size -= len(old)
+        return packed
+
+    def _count(self, what, size_in=0, size_out=0):
+        with self._lock:
+            self._stats[what] += 1
+            self._stats['bytes_in'] += size_in
+            self._stats['bytes_out'] += size_out
+
+
+def negotiate(accept_encoding):
+    """'br', 'gzip' or None for an Accept-Encoding header value."""
+    offered = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        offered[name.strip()] = q
+    star = offered.get('*', 0.0)
+    best, best_q = None, 0.0
+    for name in (('br', 'gzip') if brotli is not None else ('gzip',)):
+        q = offered.get(name, star)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compress(encoding, level, data):
+    if encoding == 'br':
+        return brotli.compress(data, quality=_quality(level))
+    packer = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return packer.compress(data) + packer.flush()
+
+
+def _packer(encoding, level):
+    if encoding == 'br':
+        return brotli.Compressor(quality=_quality(level))
+    return zlib.compressobj(level, zlib.DEFLATED, 31)
+
+
+def _quality(level):
+    return max(0, min(11, level - 1))
+
+
+def _chain(written, body):
+    if not written:
+        return body
+    return written + list(body)
+
+
+def _vary(headers):
+    values = [v.strip() for v in headers.get('Vary', '').split(',') if v.strip()]
+    if 'accept-encoding' not in (v.lower() for v in values) and '*' not in values:
+        headers['Vary'] = ', '.join(values + ['Accept-Encoding'])
+
+
+def _suffix_etag(headers, suffix):
+    etag = headers.get('ETag')
+    if etag and etag.startswith('"') and not etag.endswith(suffix + '"'):
+        headers['ETag'] = etag[:-1] + suffix + '"'
+
+
+def _strip_etag_suffix(environ):
+    """Turn our encoded-copy ETags in If-None-Match back into the app's own.
+
+    Returns the suffix that was removed (None if there was none), so a 304
+    can hand the client back the tag it sent.
+    """
+    value = environ.get('HTTP_IF_NONE_MATCH')
+    if not value:
+        return None
+    found = None
+    for suffix in ETAG_SUFFIX.values():
+        if suffix + '"' in value:
+            value = value.replace(suffix + '"', '"')
+            found = suffix
+    environ['HTTP_IF_NONE_MATCH'] = value
+    return found
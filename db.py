@@ -1,18 +1,149 @@
-import os, json
+import os, json, time, tempfile, threading
+from functools import wraps
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
 from datetime import datetime
 try:
-    from pymongo import MongoClient
+    import fcntl
+except ImportError:
+    # Windows: writers are still serialized within one process
+    fcntl = None
+try:
+    from pymongo import MongoClient, ReturnDocument, UpdateOne
+    from pymongo.errors import DuplicateKeyError
 except Exception:
     MongoClient = None
+from sqlite_store import SQLiteStore
+
+
+# Secondary hash indexes kept in JSON mode (collection -> indexed fields;
+# a tuple is a compound key). Other collections are indexed on 'id' only.
+INDEXED_FIELDS = {
+    'students': ('id', 'email', 'student_id'),
+    'faculty': ('id', 'email'),
+    'curriculum': (('degree', 'year'),),
+}
+DEFAULT_INDEXED = ('id',)
+
+# JSON mode keeps one change counter per collection in the document itself,
+# {coll: [count, unix time of the last write]}, bumped by every applied
+# mutation, so the snapshot and the journal carry it and every worker reads
+# the same values (SQLite and MongoDB keep theirs in a _versions table).
+VERSIONS = '_versions'
+
+
+def _matches(record, match):
+    return all(record.get(k) == v for k, v in match.items())
+
+
+def _key(record, field):
+    if isinstance(field, tuple):
+        return tuple(record.get(f) for f in field)
+    return record.get(field)
+
+
+def _notifies(coll, action):
+    """Mark a Database method as a mutation of `coll` (see Database.on_change)."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            result = fn(self, *args, **kwargs)
+            self._notify(coll, action, args)
+            return result
+        return wrapper
+    return decorator
+
+
+def _sort_key(record, field):
+    return (str(record.get(field) or ''), str(record.get('id') or ''))
+
+
+def _split_engagement(blog):
+    """(likes, comments, counters) for a blog with embedded likes/comments arrays."""
+    keys = list(dict.fromkeys(blog.get('likes') or []))
+    likes = [{'id': f"{blog['id']}:{k}", 'blog_id': blog['id'], 'user_key': k,
+              'created_at': blog.get('created_at')} for k in keys]
+    comments = [dict(c, blog_id=blog['id']) for c in blog.get('comments') or []]
+    return likes, comments, {'like_count': len(likes), 'comment_count': len(comments)}
+
+
+def _author_key(blog):
+    """User key ('student:<student_id>' / 'faculty:<email>') of a blog's author."""
+    if blog.get('author_key'):
+        return blog['author_key']
+    if blog.get('student_id'):
+        return f"student:{blog['student_id']}"
+    if blog.get('author_email'):
+        return f"faculty:{blog['author_email']}"
+    return None
+
+
+def _map_strings(value, fn):
+    if isinstance(value, str):
+        return fn(value)
+    if isinstance(value, dict):
+        return {k: _map_strings(v, fn) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_map_strings(v, fn) for v in value]
+    return value
+
+
+def _bump(d, coll, at):
+    """Count one more write to `coll` in the document `d` (copying the counters)."""
+    versions = dict(d.get(VERSIONS) or {})
+    count, modified = versions.get(coll, (0, None))
+    versions[coll] = [count + 1, at or modified]
+    d[VERSIONS] = versions
+
+
+def _index_field(coll, match):
+    """The indexed field of `coll` that `match` looks up exactly, or None."""
+    for field in INDEXED_FIELDS.get(coll, DEFAULT_INDEXED):
+        if set(field if isinstance(field, tuple) else (field,)) == set(match):
+            return field
+    return None
 
 
 class Database:
-    def __init__(self, use_mongo=False, mongo_uri=''):
+    def __init__(self, use_mongo=False, mongo_uri='', journal=False, compact_every=500,
+                 use_sqlite=False, sqlite_path=''):
         self.use_mongo = use_mongo and MongoClient is not None
         self.mongo_uri = mongo_uri
         self.file = os.path.join(os.getcwd(), 'database.json')
 
-        if not self.use_mongo:
+        # SQLite mode: same method surface, backed by an embedded database
+        # with real indexes (see sqlite_store.py). MongoDB takes precedence.
+        self.use_sqlite = use_sqlite and not self.use_mongo
+        self.sql = None
+
+        # Journal mode: mutations are appended to <file>.log as one JSON line
+        # each; the log is folded back into the snapshot every
+        # `compact_every` records.
+        self.journal = journal
+        self.log_file = self.file + '.log'
+        self.compact_every = compact_every
+        self._log_records = 0
+
+        # Resident copy of database.json (JSON mode only). It is reused until
+        # the file's (mtime, size, inode) signature changes on disk.
+        # Stored as a (signature, document) tuple so readers can check and
+        # fetch it without taking a lock.
+        self._cache = None
+        self._cache_stats = {'hits': 0, 'misses': 0, 'reloads': 0}
+        self._load_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_owner = None
+        self._lock_fh = None
+        self._indexes = {}
+        self._orders = {}
+        self._listeners = []
+        self._batch = None  # records of the open transaction() (JSON mode)
+        self._staged = None  # its document, visible only to the thread running it
+
+        if self.use_sqlite:
+            self.sql = SQLiteStore(sqlite_path or os.path.join(os.getcwd(), 'database.sqlite3'))
+        elif not self.use_mongo:
             # JSON file mode
             if not os.path.exists(self.file):
                 initial = {
@@ -27,7 +158,10 @@ class Database:
                     'csa_members': [],
                     'past_csa': [],
                     'curriculum':[],
-                    'alumni':[]
+                    'alumni':[],
+                    'blog_likes': [],
+                    'blog_comments': [],
+                    'user_activity': []
                 }
                 with open(self.file, 'w') as f:
                     json.dump(initial, f, indent=2)
@@ -35,355 +169,1091 @@ class Database:
             # MongoDB mode
             self.client = MongoClient(self.mongo_uri)
             self.db = self.client.get_default_database()
+            self.db.blog_likes.create_index('id', unique=True)
+            self.db.blog_comments.create_index([('blog_id', 1), ('created_at', 1)])
+            self.db.user_activity.create_index('id', unique=True)
+        self.migrate_engagement()
+        if self._find_first('user_activity') is None and self._find_first('blogs') is not None:
+            self.rebuild_activity()
 
     # ---------- JSON helpers ----------
+    def _signature(self):
+        st = os.stat(self.file)
+        sig = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if self.journal and os.path.exists(self.log_file):
+            lt = os.stat(self.log_file)
+            sig += (lt.st_mtime_ns, lt.st_size, lt.st_ino)
+        return sig
+
     def _read(self):
-        with open(self.file, 'r') as f:
-            return json.load(f)
+        """Return the whole document, parsing the file only when it changed.
+
+        The returned dict is shared and must be treated as read-only: writers
+        never modify it in place, they build a new document and swap it in,
+        so readers need no lock and never see a half-applied change.
+        In SQLite mode the document is assembled from the tables.
+        """
+        if self.sql:
+            return self.sql.dump()
+        if self._batch is not None and self._lock_owner == threading.get_ident():
+            return self._staged  # inside transaction(): see its own writes
+        sig = self._signature()
+        cached = self._cache
+        if cached is not None and cached[0] == sig:
+            self._cache_stats['hits'] += 1
+            return cached[1]
+        with self._load_lock:
+            cached = self._cache
+            if cached is not None and cached[0] == sig:
+                self._cache_stats['hits'] += 1
+                return cached[1]
+            self._cache_stats['misses' if cached is None else 'reloads'] += 1
+            with open(self.file, 'r') as f:
+                data = json.load(f)
+            if self.journal:
+                self._replay_log(data)
+            self._cache = (sig, data)
+        if cached is not None:
+            self._notify(None, 'reload', ())
+        return data
 
     def _write(self, data):
-        with open(self.file, 'w') as f:
-            json.dump(data, f, indent=2, default=str)
+        """Atomically replace the snapshot (and, in journal mode, empty the log).
+
+        The document is written to a temp file next to database.json and
+        renamed over it, so a crash mid-write never truncates the database.
+        """
+        if self.sql:
+            return self.sql.replace_all(data)
+        with self._locked():
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.file),
+                                       prefix='.database.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(data, f, indent=2, default=str)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.file)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+            if self.journal:
+                open(self.log_file, 'w').close()
+                self._log_records = 0
+            self._cache = (self._signature(), data)
+
+    @contextmanager
+    def transaction(self):
+        """Group several mutations into one atomic change (JSON / SQLite).
+
+        In JSON mode the mutations are applied under the writer lock to a
+        private copy of the document, which only the thread running the
+        block reads. On exit they are persisted together (one snapshot
+        write, or one journal line) and only then is the copy swapped in
+        for every reader, so no request ever sees half of the group. If the
+        block raises, the copy is discarded. MongoDB callers use
+        per-document atomic operators instead.
+        """
+        if self.sql:
+            with self.sql.transaction():
+                yield
+            return
+        with self._locked():
+            if self._batch is not None:
+                yield
+                return
+            self._staged = self._read()
+            self._batch = []
+            try:
+                yield
+                if self._batch:
+                    d = self._staged
+                    if self.journal:
+                        record = self._batch[0] if len(self._batch) == 1 else {'op': 'batch', 'ops': self._batch}
+                        self._append_log(record, d)
+                    else:
+                        self._write(d)
+            finally:
+                self._batch = None
+                self._staged = None
+
+    @contextmanager
+    def _locked(self):
+        """Serialize writers: a thread lock in-process, flock across workers."""
+        with self._write_lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                self._lock_fh = open(self.file + '.lock', 'a')
+                fcntl.flock(self._lock_fh.fileno(), fcntl.LOCK_EX)
+            self._lock_depth += 1
+            self._lock_owner = threading.get_ident()
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    self._lock_owner = None
+                if self._lock_depth == 0 and self._lock_fh is not None:
+                    fcntl.flock(self._lock_fh.fileno(), fcntl.LOCK_UN)
+                    self._lock_fh.close()
+                    self._lock_fh = None
+
+    # ---------- change notifications ----------
+    def on_change(self, listener):
+        """Call listener(coll, action, args) after every add/update/delete.
+
+        `action` is 'add', 'update' or 'delete' and `args` the positional
+        arguments of the Database call. When JSON mode reloads a file changed
+        by another worker, listeners get (None, 'reload', ()): anything may
+        have changed.
+        """
+        self._listeners.append(listener)
+        return listener
+
+    def _notify(self, coll, action, args):
+        if coll is not None and self.use_mongo:
+            self.db['_versions'].update_one({'_id': coll},
+                                            {'$inc': {'v': 1}, '$set': {'modified': time.time()}},
+                                            upsert=True)
+        for listener in self._listeners:
+            listener(coll, action, args)
+
+    def collection_version(self, *colls):
+        """Validator for the current contents of `colls`: (token, modified).
+
+        `token` changes whenever any of the collections is written; `modified`
+        is a Unix timestamp no earlier than the last such write (or None).
+        Cheap enough for every request: one small keyed lookup in
+        SQLite/MongoDB, a stat() of database.json in JSON mode. Read it
+        *before* the data, so a token never describes a newer state than the
+        body.
+        """
+        if self.sql:
+            return self.sql.versions(colls)
+        if self.use_mongo:
+            found = {d['_id']: d for d in self.db['_versions'].find({'_id': {'$in': list(colls)}})}
+            token = '.'.join(str(found.get(c, {}).get('v', 0)) for c in colls)
+            stamps = [found[c].get('modified') for c in colls if c in found]
+            return token, max(stamps) if stamps else None
+        # _read() picks up (and announces) writes made by other workers
+        versions = self._read().get(VERSIONS, {})
+        found = [versions.get(c, (0, None)) for c in colls]
+        if all(modified for _, modified in found):
+            return '.'.join(str(v) for v, _ in found), max(modified for _, modified in found)
+        # never written since counters were kept: the files are no older
+        sig = self._cache[0]
+        return '.'.join(str(v) for v, _ in found), max(sig[0::3]) / 1e9
+
+    def cache_stats(self):
+        """Hit / miss / reload counters of the in-memory document cache."""
+        stats = dict(self._cache_stats)
+        lookups = stats['hits'] + stats['misses'] + stats['reloads']
+        stats['hit_ratio'] = (stats['hits'] / lookups) if lookups else 0.0
+        return stats
+
+    # ---------- JSON / SQLite queries ----------
+    def _find(self, coll, match=None):
+        if self.sql:
+            return self.sql.find(coll, match)
+        items = self._read().get(coll, [])
+        if match:
+            items = [it for it in items if _matches(it, match)]
+        return items
+
+    def _find_one(self, coll, match):
+        if self.sql:
+            return self.sql.find_one(coll, match)
+        items = self._read().get(coll, [])
+        pos = self._position(coll, items, match, use_index=True)
+        return items[pos] if pos is not None else None
+
+    def _find_first(self, coll):
+        if self.use_mongo:
+            return self.db[coll].find_one()
+        items = self._find(coll)
+        return items[0] if items else None
+
+    # ---------- JSON secondary indexes ----------
+    def _index(self, coll, items):
+        """{field: {key: position}} over `items`, built on first use.
+
+        Indexes are tied to the list object they were built from, so a
+        reload from disk (a new list) makes them rebuild lazily.
+        """
+        entry = self._indexes.get(coll)
+        if entry is not None and entry[0] is items:
+            return entry[1]
+        maps = {}
+        for field in INDEXED_FIELDS.get(coll, DEFAULT_INDEXED):
+            m = {}
+            for pos, it in enumerate(items):
+                m.setdefault(_key(it, field), pos)
+            maps[field] = m
+        self._indexes[coll] = (items, maps)
+        return maps
+
+    def _position(self, coll, items, match, use_index=False):
+        """Position of the first record in `items` matching `match`, or None."""
+        field = _index_field(coll, match) if use_index else None
+        if field is not None:
+            pos = self._index(coll, items)[field].get(_key(match, field))
+            if pos is None:
+                return None
+            if pos < len(items) and _matches(items[pos], match):
+                return pos
+            # index is mid-update by a writer; fall back to a scan
+        for pos, it in enumerate(items):
+            if _matches(it, match):
+                return pos
+        return None
+
+    def _sorted(self, coll, items, field):
+        """(keys, positions) of `items` ordered by (field, id), built on first use."""
+        entry = self._orders.get((coll, field))
+        if entry is not None and entry[0] is items:
+            return entry[1], entry[2]
+        keyed = sorted((_sort_key(it, field), pos) for pos, it in enumerate(items))
+        keys = [k for k, _ in keyed]
+        positions = [p for _, p in keyed]
+        self._orders[(coll, field)] = (items, keys, positions)
+        return keys, positions
+
+    def _page(self, coll, field, match=None, predicate=None, limit=None, offset=0,
+              after=None, newest_first=True):
+        """Records of `coll` ordered by (field, id), sliced by offset/limit.
+
+        `after` is a keyset cursor: the (field, id) of the last record on the
+        previous page. Only the records up to the end of the requested page
+        are visited.
+        """
+        if self.sql:
+            return self.sql.find(coll, match, order_by=(field, 'id'), desc=newest_first,
+                                 limit=limit, offset=offset, after=after)
+        items = self._read().get(coll, [])
+        keys, positions = self._sorted(coll, items, field)
+        if newest_first:
+            end = bisect_left(keys, tuple(after)) if after else len(keys)
+            walk = range(end - 1, -1, -1)
+        else:
+            start = bisect_right(keys, tuple(after)) if after else 0
+            walk = range(start, len(keys))
+        out = []
+        for i in walk:
+            it = items[positions[i]]
+            if match and not _matches(it, match):
+                continue
+            if predicate and not predicate(it):
+                continue
+            if offset:
+                offset -= 1
+                continue
+            out.append(it)
+            if limit is not None and len(out) >= limit:
+                break
+        return out
+
+    def _reindex(self, coll, old_items, new_items, changes):
+        """Carry the indexes of `old_items` over to `new_items` after a mutation."""
+        deleted = any(new is None for _, _, new in changes)
+        for (name, field), (items, keys, positions) in list(self._orders.items()):
+            if name != coll or items is not old_items:
+                continue
+            if deleted:
+                self._orders.pop((name, field), None)
+                continue
+            # copies, so readers still walking old_items see consistent lists
+            keys, positions = list(keys), list(positions)
+            for pos, old, new in changes:
+                key = _sort_key(new, field)
+                if old is not None:
+                    old_key = _sort_key(old, field)
+                    if old_key == key:
+                        continue
+                    i = bisect_left(keys, old_key)
+                    while positions[i] != pos:
+                        i += 1
+                    del keys[i], positions[i]
+                i = bisect_right(keys, key)
+                keys.insert(i, key)
+                positions.insert(i, pos)
+            self._orders[(name, field)] = (new_items, keys, positions)
+
+        entry = self._indexes.get(coll)
+        if entry is None or entry[0] is not old_items:
+            return
+        if deleted:
+            # a delete shifts every later position: rebuild on next lookup
+            self._indexes.pop(coll, None)
+            return
+        maps = entry[1]
+        for pos, old, new in changes:
+            for field, m in maps.items():
+                key = _key(new, field)
+                if old is not None:
+                    old_key = _key(old, field)
+                    if old_key != key and m.get(old_key) == pos:
+                        del m[old_key]
+                        for i, it in enumerate(new_items):
+                            if _key(it, field) == old_key:
+                                m[old_key] = i
+                                break
+                if m.get(key, pos) >= pos:
+                    m[key] = pos
+        self._indexes[coll] = (new_items, maps)
+
+    # ---------- JSON mutations / journal ----------
+    def _apply(self, d, op, use_index=False):
+        """Apply one mutation record to the document.
+
+        The touched collection list and record are copied rather than
+        modified, so documents already handed out by _read() stay intact.
+        Records are idempotent (insert replaces a record with the same id),
+        so replaying a log over a snapshot that already contains some of
+        its entries is harmless.
+
+        Returns the changes as (position, old, new) tuples; empty if
+        nothing matched.
+        """
+        kind = op['op']
+        if kind == 'batch':
+            return [c for sub in op['ops'] for c in self._apply(d, sub, use_index)]
+        changes = self._apply_one(d, op, use_index)
+        if changes:
+            _bump(d, op['coll'], op.get('at'))
+        return changes
+
+    def _apply_one(self, d, op, use_index):
+        kind = op['op']
+        name = op['coll']
+        items = d.get(name, [])
+
+        if kind == 'insert':
+            doc = op['doc']
+            pos = None
+            if doc.get('id') is not None:
+                pos = self._position(name, items, {'id': doc['id']}, use_index)
+            changes = [(pos, items[pos], doc) if pos is not None else (len(items), None, doc)]
+
+        elif kind == 'update':
+            pos = self._position(name, items, op['match'], use_index)
+            if pos is None:
+                return []
+            changes = [(pos, items[pos], dict(items[pos], **op['changes']))]
+
+        elif kind == 'upsert':
+            pos = self._position(name, items, op['match'], use_index)
+            changes = [(pos, items[pos], op['doc']) if pos is not None else (len(items), None, op['doc'])]
+
+        elif kind == 'delete':
+            removed = [it for it in items if _matches(it, op['match'])]
+            if not removed:
+                return []
+            d[name] = [it for it in items if not _matches(it, op['match'])]
+            return [(None, it, None) for it in removed]
+
+        else:
+            raise ValueError(f"unknown journal op: {kind}")
+
+        items = list(items)
+        for pos, old, new in changes:
+            if old is None:
+                items.append(new)
+            else:
+                items[pos] = new
+        d[name] = items
+        return changes
+
+    def _mutate(self, coll, op, **fields):
+        """Apply a mutation to the JSON store and persist it.
+
+        Runs under the writer lock and re-reads the file first, so a change
+        made by another worker in the meantime is never overwritten.
+        """
+        if self.sql:
+            return self.sql.apply(dict(fields, coll=coll, op=op))
+        record = dict(fields, coll=coll, op=op, at=time.time())
+        with self._locked():
+            d = dict(self._read())
+            old_items = d.get(coll, [])
+            changes = self._apply(d, record, use_index=True)
+            if changes:
+                if self._batch is not None:
+                    # inside transaction(): persisted when the block ends
+                    self._batch.append(record)
+                    self._staged = d
+                elif self.journal:
+                    self._append_log(record, d)
+                else:
+                    self._write(d)
+                self._reindex(coll, old_items, d[coll], changes)
+        return bool(changes)
+
+    def _append_log(self, record, d):
+        with open(self.log_file, 'a') as f:
+            f.write(json.dumps(record, default=str) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._log_records += 1
+        if self._log_records >= self.compact_every:
+            self._write(d)
+        else:
+            self._cache = (self._signature(), d)
+
+    def _replay_log(self, d):
+        self._log_records = 0
+        if not os.path.exists(self.log_file):
+            return
+        good = 0
+        with open(self.log_file, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b'\n'):
+                    break
+                self._apply(d, record)
+                self._log_records += 1
+                good += len(line)
+            torn = f.tell() != good
+        if torn and self._lock_owner == threading.get_ident():
+            # Holding the writer lock, a torn tail can only be left over from
+            # an interrupted append: drop it so the next record starts on a
+            # fresh line. Without the lock it may be an append in progress.
+            with open(self.log_file, 'r+b') as f:
+                f.truncate(good)
+
+    def compact(self):
+        """Fold the journal into database.json and start a fresh log."""
+        if self.use_mongo or self.sql or not self.journal:
+            return
+        with self._locked():
+            self._write(self._read())
+
+    # ---------- whole-database maintenance ----------
+    def iter_records(self):
+        """(collection, record) for every record in the database."""
+        if self.use_mongo:
+            for name in self.db.list_collection_names():
+                for doc in self.db[name].find({}, {'_id': 0}):
+                    yield name, doc
+            return
+        for name, items in self._read().items():
+            if name == VERSIONS:
+                continue
+            for record in items:
+                yield name, record
+
+    def rewrite_strings(self, fn):
+        """Replace every string value v in every record with fn(v).
+
+        Used by maintenance jobs such as re-pointing upload paths; returns
+        the number of records changed. Caches and listeners see a reload.
+        """
+        changed = 0
+        if self.use_mongo:
+            for name in self.db.list_collection_names():
+                for doc in self.db[name].find():
+                    new = _map_strings(doc, fn)
+                    if new != doc:
+                        self.db[name].replace_one({'_id': doc['_id']}, new)
+                        changed += 1
+        else:
+            with self.sql.transaction() if self.sql else self._locked():
+                d = self._read()
+                new = {}
+                for name, items in d.items():
+                    if name == VERSIONS:
+                        new[name] = items
+                        continue
+                    new[name] = [_map_strings(r, fn) for r in items]
+                    touched = sum(1 for a, b in zip(items, new[name]) if a != b)
+                    if touched:
+                        _bump(new, name, time.time())
+                    changed += touched
+                if changed:
+                    self._write(new)
+        if changed:
+            self._notify(None, 'reload', ())
+        return changed
+
+    def set_variants(self, coll, rid, field, src, variants):
+        """Store resized copies of record `rid`'s image `field` as `<field>_variants`.
+
+        Only if the field still holds `src`; returns whether it did.
+        """
+        match = {'id': rid, field: src}
+        changes = {field + '_variants': variants}
+        if self.use_mongo:
+            done = self.db[coll].update_one(match, {'$set': changes}).matched_count > 0
+        else:
+            done = self._mutate(coll, 'update', match=match, changes=changes)
+        if done:
+            self._notify(coll, 'update', (rid,))
+        return done
+
+    def bulk_update(self, coll, updates):
+        """Apply [(match, changes), ...] to `coll` as one write; returns how many matched.
+
+        For maintenance jobs touching many records: one snapshot write (or
+        journal line / SQLite commit / MongoDB bulk_write) instead of one
+        per record.
+        """
+        if not updates:
+            return 0
+        if self.use_mongo:
+            result = self.db[coll].bulk_write([UpdateOne(m, {'$set': c}) for m, c in updates], ordered=False)
+            matched = result.matched_count
+        else:
+            with self.transaction():
+                matched = sum(1 for m, c in updates if self._mutate(coll, 'update', match=m, changes=c))
+        if matched:
+            self._notify(coll, 'update', ())
+        return matched
 
     # ---------- STUDENTS ----------
+    @_notifies('students', 'add')
     def add_student(self, student):
         if self.use_mongo:
             return self.db.students.insert_one(student).inserted_id
-        d = self._read()
         student.setdefault('is_active', True)
-        d.setdefault('students', []).append(student)
-        self._write(d)
+        self._mutate('students', 'insert', doc=student)
         return student.get('id')
 
     def list_students(self):
         if self.use_mongo:
             return list(self.db.students.find())
-        return self._read().get('students', [])
+        return self._find('students')
 
     def find_student_by_email(self, email):
         if self.use_mongo:
             return self.db.students.find_one({'email': email})
-        d = self._read()
-        for s in d.get('students', []):
-            if s.get('email') == email:
-                return s
-        return None
+        return self._find_one('students', {'email': email})
 
     def find_student_by_student_id(self, student_id):
         if self.use_mongo:
             return self.db.students.find_one({'student_id': student_id})
-        d = self._read()
-        for s in d.get('students', []):
-            if s.get('student_id') == student_id:
-                return s
-        return None
+        return self._find_one('students', {'student_id': student_id})
 
+    def get_student(self, sid):
+        if self.use_mongo:
+            return self.db.students.find_one({'id': sid})
+        return self._find_one('students', {'id': sid})
+
+    @_notifies('students', 'update')
     def update_student(self, student_id, changes):
         if self.use_mongo:
             return self.db.students.update_one({'id': student_id}, {'$set': changes})
-        d = self._read()
-        for i, s in enumerate(d.get('students', [])):
-            if s.get('id') == student_id:
-                d['students'][i].update(changes)
-                self._write(d)
-                return True
-        return False
+        return self._mutate('students', 'update', match={'id': student_id}, changes=changes)
 
+    @_notifies('students', 'delete')
     def delete_student(self, student_id):
         if self.use_mongo:
             return self.db.students.delete_one({'id': student_id})
-        d = self._read()
-        d['students'] = [s for s in d.get('students', []) if s.get('id') != student_id]
-        self._write(d)
+        self._mutate('students', 'delete', match={'id': student_id})
         return True
 
     # ---------- BLOGS ----------
+    @_notifies('blogs', 'add')
     def add_blog(self, blog):
         if self.use_mongo:
-            return self.db.blogs.insert_one(blog).inserted_id
-        d = self._read()
-        d.setdefault('blogs', []).append(blog)
-        self._write(d)
+            inserted = self.db.blogs.insert_one(blog).inserted_id
+            self._track_activity(_author_key(blog), 'posts', blog.get('id'), True)
+            return inserted
+        with self.transaction():
+            self._mutate('blogs', 'insert', doc=blog)
+            self._track_activity(_author_key(blog), 'posts', blog.get('id'), True)
         return blog.get('id')
 
-    def list_blogs(self, approved_only=True, status=None):
+    def list_blogs(self, approved_only=True, status=None, limit=None, offset=0,
+                   after=None, newest_first=True):
+        """Blogs ordered by created_at (newest first by default).
+
+        limit/offset page through the result; `after` is a keyset cursor,
+        the (created_at, id) of the last blog already shown.
+        """
         if self.use_mongo:
             q = {}
             if approved_only:
                 q['status'] = 'approved'
             if status:
                 q['status'] = status
-            return list(self.db.blogs.find(q))
-        d = self._read()
-        blogs = d.get('blogs', [])
+            direction = -1 if newest_first else 1
+            if after:
+                op = '$lt' if newest_first else '$gt'
+                q['$or'] = [
+                    {'created_at': {op: after[0]}},
+                    {'created_at': after[0], 'id': {op: after[1]}},
+                ]
+            cursor = self.db.blogs.find(q).sort([('created_at', direction), ('id', direction)])
+            if offset:
+                cursor = cursor.skip(offset)
+            if limit is not None:
+                cursor = cursor.limit(limit)
+            return list(cursor)
+        match, predicate = None, None
         if status:
-            blogs = [b for b in blogs if b.get('status') == status]
-        if approved_only and not status:
-            blogs = [b for b in blogs if b.get('status') == 'approved' or b.get('approved')]
-        return blogs
+            match = {'status': status}
+        elif approved_only:
+            if self.sql:
+                match = {'status': 'approved'}
+            else:
+                predicate = lambda b: b.get('status') == 'approved' or b.get('approved')
+        return self._page('blogs', 'created_at', match=match, predicate=predicate,
+                          limit=limit, offset=offset, after=after, newest_first=newest_first)
 
     def get_blog(self, blog_id):
         if self.use_mongo:
             return self.db.blogs.find_one({'id': blog_id})
-        d = self._read()
-        for b in d.get('blogs', []):
-            if b.get('id') == blog_id:
-                return b
-        return None
+        return self._find_one('blogs', {'id': blog_id})
 
+    @_notifies('blogs', 'update')
     def update_blog(self, blog_id, changes):
         if self.use_mongo:
             return self.db.blogs.update_one({'id': blog_id}, {'$set': changes})
-        d = self._read()
-        for i, b in enumerate(d.get('blogs', [])):
-            if b.get('id') == blog_id:
-                d['blogs'][i].update(changes)
-                self._write(d)
-                return True
-        return False
+        return self._mutate('blogs', 'update', match={'id': blog_id}, changes=changes)
 
+    @_notifies('blogs', 'delete')
     def delete_blog(self, blog_id):
         if self.use_mongo:
+            self.db.blog_likes.delete_many({'blog_id': blog_id})
+            self.db.blog_comments.delete_many({'blog_id': blog_id})
+            for field in ('posts', 'liked'):
+                self.db.user_activity.update_many({field: blog_id}, {'$pull': {field: blog_id}})
+            self.db.user_activity.update_many({f'commented.{blog_id}': {'$exists': True}},
+                                              {'$unset': {f'commented.{blog_id}': ''}})
             return self.db.blogs.delete_one({'id': blog_id})
-        d = self._read()
-        d['blogs'] = [b for b in d.get('blogs', []) if b.get('id') != blog_id]
-        self._write(d)
+        with self.transaction():
+            for rec in self._find('user_activity'):
+                if blog_id in rec.get('posts', ()) or blog_id in rec.get('liked', ()) \
+                        or blog_id in rec.get('commented', {}):
+                    self._mutate('user_activity', 'upsert', match={'id': rec['id']}, doc=dict(
+                        rec,
+                        posts=[b for b in rec.get('posts', ()) if b != blog_id],
+                        liked=[b for b in rec.get('liked', ()) if b != blog_id],
+                        commented={b: n for b, n in rec.get('commented', {}).items() if b != blog_id},
+                    ))
+            self._mutate('blog_likes', 'delete', match={'blog_id': blog_id})
+            self._mutate('blog_comments', 'delete', match={'blog_id': blog_id})
+            self._mutate('blogs', 'delete', match={'id': blog_id})
         return True
 
+    # ---------- BLOG LIKES / COMMENTS ----------
+    # One record per like / comment, keyed by blog id; the blog itself only
+    # carries like_count / comment_count, so listings never load them.
+    @_notifies('blogs', 'update')
+    def toggle_blog_like(self, blog_id, user_key):
+        """Like `blog_id` as `user_key`, or take the like back.
+
+        Returns (liked, like_count).
+        """
+        like_id = f'{blog_id}:{user_key}'
+        if self.use_mongo:
+            if self.db.blog_likes.delete_one({'id': like_id}).deleted_count:
+                liked, delta = False, -1
+            else:
+                try:
+                    self.db.blog_likes.insert_one({'id': like_id, 'blog_id': blog_id, 'user_key': user_key,
+                                                   'created_at': datetime.utcnow().isoformat()})
+                    liked, delta = True, 1
+                except DuplicateKeyError:
+                    liked, delta = True, 0  # a concurrent request liked it first
+            self._track_activity(user_key, 'liked', blog_id, liked)
+            blog = self.db.blogs.find_one_and_update({'id': blog_id}, {'$inc': {'like_count': delta}},
+                                                     return_document=ReturnDocument.AFTER)
+            return liked, (blog or {}).get('like_count', 0)
+        with self.transaction():
+            blog = self._find_one('blogs', {'id': blog_id}) or {}
+            count = blog.get('like_count') or 0
+            if self._find_one('blog_likes', {'id': like_id}):
+                self._mutate('blog_likes', 'delete', match={'id': like_id})
+                liked, count = False, max(count - 1, 0)
+            else:
+                self._mutate('blog_likes', 'insert', doc={'id': like_id, 'blog_id': blog_id, 'user_key': user_key,
+                                                          'created_at': datetime.utcnow().isoformat()})
+                liked, count = True, count + 1
+            # absolute value, so replaying the journal stays idempotent
+            self._mutate('blogs', 'update', match={'id': blog_id}, changes={'like_count': count})
+            self._track_activity(user_key, 'liked', blog_id, liked)
+        return liked, count
+
+    def has_liked(self, blog_id, user_key):
+        like_id = f'{blog_id}:{user_key}'
+        if self.use_mongo:
+            return self.db.blog_likes.find_one({'id': like_id}) is not None
+        return self._find_one('blog_likes', {'id': like_id}) is not None
+
+    def list_blog_likes(self):
+        if self.use_mongo:
+            return list(self.db.blog_likes.find({}, {'_id': 0}))
+        return self._find('blog_likes')
+
+    @_notifies('blogs', 'update')
+    def add_blog_comment(self, blog_id, comment):
+        """Store `comment` under `blog_id` and bump the blog's comment_count."""
+        comment = dict(comment, blog_id=blog_id)
+        if self.use_mongo:
+            self.db.blog_comments.insert_one(dict(comment))
+            self.db.blogs.update_one({'id': blog_id}, {'$inc': {'comment_count': 1}})
+            self._track_activity(comment.get('author_key'), 'commented', blog_id, True)
+            return comment
+        with self.transaction():
+            blog = self._find_one('blogs', {'id': blog_id}) or {}
+            self._mutate('blog_comments', 'insert', doc=comment)
+            self._mutate('blogs', 'update', match={'id': blog_id},
+                         changes={'comment_count': (blog.get('comment_count') or 0) + 1})
+            self._track_activity(comment.get('author_key'), 'commented', blog_id, True)
+        return comment
+
+    def list_blog_comments(self, blog_id=None):
+        """Comments on `blog_id` (all comments if None), oldest first."""
+        match = {'blog_id': blog_id} if blog_id is not None else {}
+        if self.use_mongo:
+            return list(self.db.blog_comments.find(match, {'_id': 0}).sort('created_at', 1))
+        return self._find('blog_comments', match or None)
+
+    def migrate_engagement(self):
+        """Move likes/comments embedded in blog records into their own collections.
+
+        Older blogs carry `likes` (a list of user keys) and `comments` arrays;
+        they are split out and replaced by the two counters. Safe to re-run.
+        Returns the number of blogs converted.
+        """
+        if self.use_mongo:
+            blogs = list(self.db.blogs.find({'$or': [{'likes': {'$exists': True}},
+                                                     {'comments': {'$exists': True}}]}))
+            for b in blogs:
+                likes, comments, counts = _split_engagement(b)
+                for like in likes:
+                    self.db.blog_likes.replace_one({'id': like['id']}, like, upsert=True)
+                for c in comments:
+                    self.db.blog_comments.replace_one({'id': c.get('id'), 'blog_id': b['id']}, c, upsert=True)
+                self.db.blogs.update_one({'_id': b['_id']},
+                                         {'$set': counts, '$unset': {'likes': '', 'comments': ''}})
+            return len(blogs)
+        blogs = [b for b in self._find('blogs') if 'likes' in b or 'comments' in b]
+        if not blogs:
+            return 0
+        with self.transaction():
+            for b in blogs:
+                likes, comments, counts = _split_engagement(b)
+                for like in likes:
+                    self._mutate('blog_likes', 'insert', doc=like)
+                for c in comments:
+                    self._mutate('blog_comments', 'insert', doc=c)
+                doc = {k: v for k, v in b.items() if k not in ('likes', 'comments')}
+                self._mutate('blogs', 'upsert', match={'id': b['id']}, doc=dict(doc, **counts))
+        return len(blogs)
+
+    # ---------- USER ACTIVITY ----------
+    # One record per user key ('student:<student_id>' / 'faculty:<email>'):
+    # {'id', 'posts': [blog ids], 'liked': [blog ids], 'commented': {blog id: n}},
+    # kept up to date by the blog / like / comment methods above.
+    def get_user_activity(self, user_key):
+        empty = {'id': user_key, 'posts': [], 'liked': [], 'commented': {}}
+        if self.use_mongo:
+            found = self.db.user_activity.find_one({'id': user_key}, {'_id': 0})
+        else:
+            found = self._find_one('user_activity', {'id': user_key})
+        return dict(empty, **found) if found else empty
+
+    def _track_activity(self, user_key, field, blog_id, add):
+        """Record (add=True) or drop (add=False) `blog_id` in a user's `field`.
+
+        For 'commented', add=True counts one more comment and add=None drops
+        the blog altogether.
+        """
+        if not user_key or not blog_id:
+            return
+        if self.use_mongo:
+            if field == 'commented':
+                path = f'commented.{blog_id}'
+                update = {'$inc': {path: 1}} if add else {'$unset': {path: ''}}
+            else:
+                update = {'$addToSet' if add else '$pull': {field: blog_id}}
+            self.db.user_activity.update_one({'id': user_key}, update, upsert=True)
+            return
+        rec = self.get_user_activity(user_key)
+        if field == 'commented':
+            commented = dict(rec['commented'])
+            if add:
+                commented[blog_id] = commented.get(blog_id, 0) + 1
+            else:
+                commented.pop(blog_id, None)
+            value = commented
+        else:
+            value = [b for b in rec[field] if b != blog_id] + ([blog_id] if add else [])
+        self._mutate('user_activity', 'upsert', match={'id': user_key}, doc=dict(rec, **{field: value}))
+
+    def rebuild_activity(self):
+        """Recompute every user's activity record from blogs, likes and comments.
+
+        Comments older than the author_key field only carry a display name;
+        they are attributed when exactly one student or faculty has that name.
+        """
+        names = {}
+        for s in self.list_students():
+            names.setdefault(s.get('name'), []).append(f"student:{s.get('student_id')}")
+        for f in self.list_faculty():
+            names.setdefault(f.get('name'), []).append(f"faculty:{f.get('email')}")
+
+        activity = {}
+        def rec(key):
+            return activity.setdefault(key, {'id': key, 'posts': [], 'liked': [], 'commented': {}})
+        for b in self.list_blogs(approved_only=False):
+            key = _author_key(b)
+            if key:
+                rec(key)['posts'].append(b['id'])
+        for like in self.list_blog_likes():
+            if like.get('user_key'):
+                rec(like['user_key'])['liked'].append(like['blog_id'])
+        for c in self.list_blog_comments():
+            key = c.get('author_key')
+            if not key and len(names.get(c.get('author_name'), ())) == 1:
+                key = names[c['author_name']][0]
+            if key:
+                commented = rec(key)['commented']
+                commented[c['blog_id']] = commented.get(c['blog_id'], 0) + 1
+
+        if self.use_mongo:
+            self.db.user_activity.delete_many({})
+            if activity:
+                self.db.user_activity.insert_many(list(activity.values()))
+            return len(activity)
+        with self.transaction():
+            self._mutate('user_activity', 'delete', match={})
+            for doc in activity.values():
+                self._mutate('user_activity', 'insert', doc=doc)
+        return len(activity)
+
     # ---------- CONTACTS ----------
+    @_notifies('contacts', 'add')
     def add_contact(self, contact):
         if self.use_mongo:
             return self.db.contacts.insert_one(contact).inserted_id
-        d = self._read()
-        d.setdefault('contacts', []).append(contact)
-        self._write(d)
+        self._mutate('contacts', 'insert', doc=contact)
         return contact.get('id')
 
     def list_contacts(self):
         if self.use_mongo:
             return list(self.db.contacts.find())
-        return self._read().get('contacts', [])
+        return self._find('contacts')
 
+    @_notifies('contacts', 'update')
     def update_contact(self, contact_id, changes):
         if self.use_mongo:
             return self.db.contacts.update_one({'id': contact_id}, {'$set': changes})
-        d = self._read()
-        for i, c in enumerate(d.get('contacts', [])):
-            if c.get('id') == contact_id:
-                d['contacts'][i].update(changes)
-                self._write(d)
-                return True
-        return False
+        return self._mutate('contacts', 'update', match={'id': contact_id}, changes=changes)
 
+    @_notifies('contacts', 'delete')
     def delete_contact(self, contact_id):
         if self.use_mongo:
             return self.db.contacts.delete_one({'id': contact_id})
-        d = self._read()
-        d['contacts'] = [c for c in d.get('contacts', []) if c.get('id') != contact_id]
-        self._write(d)
+        self._mutate('contacts', 'delete', match={'id': contact_id})
         return True
 
     # ---------- NOTIFICATIONS ----------
+    @_notifies('notifications', 'add')
     def add_notification(self, n):
         if self.use_mongo:
             return self.db.notifications.insert_one(n).inserted_id
-        d = self._read()
-        d.setdefault('notifications', []).append(n)
-        self._write(d)
+        self._mutate('notifications', 'insert', doc=n)
         return n.get('id')
 
     def list_notifications(self):
         if self.use_mongo:
             return list(self.db.notifications.find())
-        return self._read().get('notifications', [])
+        return self._find('notifications')
+
+    def get_notification(self, nid):
+        if self.use_mongo:
+            return self.db.notifications.find_one({'id': nid})
+        return self._find_one('notifications', {'id': nid})
 
+    @_notifies('notifications', 'update')
     def update_notification(self, nid, changes):
         if self.use_mongo:
             return self.db.notifications.update_one({'id': nid}, {'$set': changes})
-        d = self._read()
-        for i, n in enumerate(d.get('notifications', [])):
-            if n.get('id') == nid:
-                d['notifications'][i].update(changes)
-                self._write(d)
-                return True
-        return False
+        return self._mutate('notifications', 'update', match={'id': nid}, changes=changes)
 
+    @_notifies('notifications', 'delete')
     def delete_notification(self, nid):
         if self.use_mongo:
             return self.db.notifications.delete_one({'id': nid})
-        d = self._read()
-        d['notifications'] = [n for n in d.get('notifications', []) if n.get('id') != nid]
-        self._write(d)
+        self._mutate('notifications', 'delete', match={'id': nid})
         return True
 
     # ---------- FACULTY ----------
+    @_notifies('faculty', 'add')
     def add_faculty(self, f):
         if self.use_mongo:
             return self.db.faculty.insert_one(f).inserted_id
-        d = self._read()
-        d.setdefault('faculty', []).append(f)
-        self._write(d)
+        self._mutate('faculty', 'insert', doc=f)
         return f.get('id')
 
     def list_faculty(self):
         if self.use_mongo:
             return list(self.db.faculty.find())
-        return self._read().get('faculty', [])
+        return self._find('faculty')
+
+    def get_faculty(self, fid):
+        if self.use_mongo:
+            return self.db.faculty.find_one({'id': fid})
+        return self._find_one('faculty', {'id': fid})
 
+    def find_faculty_by_email(self, email):
+        if self.use_mongo:
+            return self.db.faculty.find_one({'email': email})
+        return self._find_one('faculty', {'email': email})
+
+    @_notifies('faculty', 'update')
     def update_faculty(self, fid, changes):
         if self.use_mongo:
             return self.db.faculty.update_one({'id': fid}, {'$set': changes})
-        d = self._read()
-        for i, f in enumerate(d.get('faculty', [])):
-            if f.get('id') == fid:
-                d['faculty'][i].update(changes)
-                self._write(d)
-                return True
-        return False
+        return self._mutate('faculty', 'update', match={'id': fid}, changes=changes)
 
+    @_notifies('faculty', 'delete')
     def delete_faculty(self, fid):
         if self.use_mongo:
             return self.db.faculty.delete_one({'id': fid})
-        d = self._read()
-        d['faculty'] = [f for f in d.get('faculty', []) if f.get('id') != fid]
-        self._write(d)
+        self._mutate('faculty', 'delete', match={'id': fid})
         return True
 
     # ---------- EVENTS ----------
+    @_notifies('events', 'add')
     def add_event(self, e):
         if self.use_mongo:
             return self.db.events.insert_one(e).inserted_id
-        d = self._read()
-        d.setdefault('events', []).append(e)
-        self._write(d)
+        self._mutate('events', 'insert', doc=e)
         return e.get('id')
 
     def list_events(self):
         if self.use_mongo:
             return list(self.db.events.find())
-        return self._read().get('events', [])
+        return self._find('events')
 
+    def get_event(self, eid):
+        if self.use_mongo:
+            return self.db.events.find_one({'id': eid})
+        return self._find_one('events', {'id': eid})
+
+    @_notifies('events', 'update')
     def update_event(self, eid, changes):
         if self.use_mongo:
             return self.db.events.update_one({'id': eid}, {'$set': changes})
-        d = self._read()
-        for i, e in enumerate(d.get('events', [])):
-            if e.get('id') == eid:
-                d['events'][i].update(changes)
-                self._write(d)
-                return True
-        return False
+        return self._mutate('events', 'update', match={'id': eid}, changes=changes)
 
+    @_notifies('events', 'delete')
     def delete_event(self, eid):
         if self.use_mongo:
             return self.db.events.delete_one({'id': eid})
-        d = self.__read()
-        d['events'] = [e for e in d.get('events', []) if e.get('id') != eid]
-        self._write(d)
+        self._mutate('events', 'delete', match={'id': eid})
         return True
 
     # ---------- GALLERY ----------
+    @_notifies('gallery', 'add')
     def add_gallery(self, g):
         if self.use_mongo:
             return self.db.gallery.insert_one(g).inserted_id
-        d = self._read()
-        d.setdefault('gallery', []).append(g)
-        self._write(d)
+        self._mutate('gallery', 'insert', doc=g)
         return g.get('id')
 
     def list_gallery(self):
         if self.use_mongo:
             return list(self.db.gallery.find())
-        return self._read().get('gallery', [])
+        return self._find('gallery')
+
+    def get_gallery(self, gid):
+        if self.use_mongo:
+            return self.db.gallery.find_one({'id': gid})
+        return self._find_one('gallery', {'id': gid})
 
+    @_notifies('gallery', 'delete')
     def delete_gallery(self, gid):
         if self.use_mongo:
             return self.db.gallery.delete_one({'id': gid})
-        d = self._read()
-        d['gallery'] = [g for g in d.get('gallery', []) if g.get('id') != gid]
-        self._write(d)
+        self._mutate('gallery', 'delete', match={'id': gid})
         return True
 
     # ---------- RESEARCH ----------
+    @_notifies('research', 'add')
     def add_research(self, r):
         if self.use_mongo:
             return self.db.research.insert_one(r).inserted_id
-        d = self._read()
-        d.setdefault('research', []).append(r)
-        self._write(d)
+        self._mutate('research', 'insert', doc=r)
         return r.get('id')
 
     def list_research(self):
         if self.use_mongo:
             return list(self.db.research.find())
-        return self._read().get('research', [])
+        return self._find('research')
+
+    def get_research(self, rid):
+        if self.use_mongo:
+            return self.db.research.find_one({'id': rid})
+        return self._find_one('research', {'id': rid})
 
+    @_notifies('research', 'delete')
     def delete_research(self, rid):
         if self.use_mongo:
             return self.db.research.delete_one({'id': rid})
-        d = self._read()
-        d['research'] = [r for r in d.get('research', []) if r.get('id') != rid]
-        self._write(d)
+        self._mutate('research', 'delete', match={'id': rid})
         return True
 
     # ---------- CSA MEMBERS ----------
     def list_csa_members(self):
         if self.use_mongo:
             return list(self.db.csa_members.find())
-        return self._read().get('csa_members', [])
+        return self._find('csa_members')
+
+    def get_csa_member(self, mid):
+        if self.use_mongo:
+            return self.db.csa_members.find_one({'id': mid})
+        return self._find_one('csa_members', {'id': mid})
 
+    @_notifies('csa_members', 'add')
     def add_csa_member(self, m):
         if self.use_mongo:
             return self.db.csa_members.insert_one(m).inserted_id
-        d = self._read()
-        d.setdefault('csa_members', []).append(m)
-        self._write(d)
+        self._mutate('csa_members', 'insert', doc=m)
         return m.get('id')
 
+    @_notifies('csa_members', 'update')
     def update_csa_member(self, mid, changes):
         if self.use_mongo:
             return self.db.csa_members.update_one({'id': mid}, {'$set': changes})
-        d = self._read()
-        for i, m in enumerate(d.get('csa_members', [])):
-            if m.get('id') == mid:
-                d['csa_members'][i].update(changes)
-                self._write(d)
-                return True
-        return False
+        return self._mutate('csa_members', 'update', match={'id': mid}, changes=changes)
 
+    @_notifies('csa_members', 'delete')
     def delete_csa_member(self, mid):
         if self.use_mongo:
             return self.db.csa_members.delete_one({'id': mid})
-        d = self._read()
-        d['csa_members'] = [m for m in d.get('csa_members', []) if m.get('id') != mid]
-        self._write(d)
+        self._mutate('csa_members', 'delete', match={'id': mid})
         return True
 
     # ---------- PAST CSA (PDF per year) ----------
     def list_past_csa(self):
         if self.use_mongo:
             return list(self.db.past_csa.find())
-        data = self._read()
-        return data.get('past_csa', [])
+        return self._find('past_csa')
 
+    def get_past_csa(self, entry_id):
+        if self.use_mongo:
+            return self.db.past_csa.find_one({'id': entry_id})
+        return self._find_one('past_csa', {'id': entry_id})
+
+    @_notifies('past_csa', 'add')
     def add_past_csa(self, entry):
         if self.use_mongo:
             return self.db.past_csa.insert_one(entry).inserted_id
-        data = self._read()
-        items = data.get('past_csa', [])
-        items.append(entry)
-        data['past_csa'] = items
-        self._write(data)
+        self._mutate('past_csa', 'insert', doc=entry)
         return entry.get('id')
 
+    @_notifies('past_csa', 'delete')
     def delete_past_csa(self, entry_id):
         if self.use_mongo:
             return self.db.past_csa.delete_one({'id': entry_id})
-        data = self._read()
-        items = data.get('past_csa', [])
-        items = [e for e in items if e.get('id') != entry_id]
-        data['past_csa'] = items
-        self._write(data)
+        self._mutate('past_csa', 'delete', match={'id': entry_id})
         return True
     # ---------- CURRICULUM / SYLLABUS ----------
     def list_curriculum(self):
@@ -393,10 +1263,17 @@ class Database:
                 r.pop("_id", None)   # 🔥 REMOVE ObjectId
             return records
 
-        data = self._read()
-        return data.get('curriculum', [])
+        return self._find('curriculum')
 
+    def get_curriculum(self, degree, year):
+        if self.use_mongo:
+            record = self.db.curriculum.find_one({'degree': degree, 'year': year})
+            if record:
+                record.pop("_id", None)
+            return record
+        return self._find_one('curriculum', {'degree': degree, 'year': year})
 
+    @_notifies('curriculum', 'update')
     def add_or_update_curriculum(self, entry):
         """
         entry = {
@@ -413,38 +1290,20 @@ class Database:
                 upsert=True
             )
 
-        data = self._read()
-        items = data.get('curriculum', [])
-
         # replace if exists
-        replaced = False
-        for i, it in enumerate(items):
-            if it.get('degree') == entry.get('degree') and it.get('year') == entry.get('year'):
-                items[i] = entry
-                replaced = True
-                break
-
-        if not replaced:
-            items.append(entry)
-
-        data['curriculum'] = items
-        self._write(data)
+        self._mutate('curriculum', 'upsert',
+                     match={'degree': entry.get('degree'), 'year': entry.get('year')},
+                     doc=entry)
         return True
 
+    @_notifies('curriculum', 'delete')
     def delete_curriculum(self, degree, year):
         if self.use_mongo:
             return self.db.curriculum.delete_one(
                 {'degree': degree, 'year': year}
             )
 
-        data = self._read()
-        items = data.get('curriculum', [])
-        items = [
-            it for it in items
-            if not (it.get('degree') == degree and it.get('year') == year)
-        ]
-        data['curriculum'] = items
-        self._write(data)
+        self._mutate('curriculum', 'delete', match={'degree': degree, 'year': year})
         return True
 
     # ---------- ALUMNI / TESTIMONIALS ----------
@@ -455,24 +1314,26 @@ class Database:
                 r.pop("_id", None)
             return records
 
-        data = self._read()
-        return data.get("alumni", [])
+        return self._find("alumni")
 
+    @_notifies('alumni', 'add')
     def add_alumni(self, entry):
         if self.use_mongo:
             return self.db.alumni.insert_one(entry).inserted_id
 
-        data = self._read()
-        data.setdefault("alumni", []).append(entry)
-        self._write(data)
+        self._mutate("alumni", "insert", doc=entry)
         return True
 
+    def get_alumni(self, aid):
+        if self.use_mongo:
+            return self.db.alumni.find_one({"id": aid}, {"_id": 0})
+        return self._find_one("alumni", {"id": aid})
+
+    @_notifies('alumni', 'delete')
     def delete_alumni(self, aid):
         if self.use_mongo:
             return self.db.alumni.delete_one({"id": aid})
 
-        data = self._read()
-        data["alumni"] = [a for a in data.get("alumni", []) if a.get("id") != aid]
-        self._write(data)
+        self._mutate("alumni", "delete", match={"id": aid})
         return True
 
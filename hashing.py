@@ -0,0 +1,137 @@
+import os, logging, threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.security import generate_password_hash, check_password_hash
+
+log = logging.getLogger(__name__)
+
+# What the stored hashes in database.json use (Werkzeug 2.2's default).
+DEFAULT_METHOD = 'pbkdf2:sha256:260000'
+
+
+class HashingBusy(ServiceUnavailable):
+    description = 'Too many sign-ins at once. Please try again in a few seconds.'
+
+
+class PasswordHasher:
+    """Password hashing and checking on a small process pool.
+
+    PBKDF2 is deliberately slow (tens of milliseconds per call), so it is
+    kept off the request threads: each hash() / verify() is run by one of
+    `workers` processes while the request thread waits for the answer.
+    At most `max_queue` calls wait behind the running ones; past that the
+    caller gets HashingBusy (503 with Retry-After) at once instead of
+    piling up, and so does a call not answered within `timeout` seconds.
+    With workers=0 everything runs inline.
+
+    Hashes are made with `method`. After a successful verify() of a hash
+    made with anything else, rehash_later() replaces it in the background.
+    """
+
+    def __init__(self, method=DEFAULT_METHOD, workers=1, max_queue=32, timeout=10, retry_after=2):
+        self.method = method
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats = {'hashed': 0, 'verified': 0, 'rejected': 0, 'shed': 0, 'rehashed': 0}
+
+    # ---------- request side ----------
+    def hash(self, password):
+        hashed = self._call(generate_password_hash, password, self.method)
+        self._count('hashed')
+        return hashed
+
+    def verify(self, stored, password):
+        """True if `password` matches the stored hash (False for a malformed hash)."""
+        ok = self._call(_check, stored, password)
+        self._count('verified' if ok else 'rejected')
+        return ok
+
+    def needs_rehash(self, stored):
+        return bool(stored) and stored.split('$', 1)[0] != self.method
+
+    def rehash_later(self, password, save):
+        """Hash `password` with the current method in the background, then save(new_hash).
+
+        Skipped (until the next login) when the pool is busy.
+        """
+        def done(f):
+            try:
+                save(f.result() if f else generate_password_hash(password, self.method))
+                self._count('rehashed')
+            except Exception as e:
+                log.warning("Could not store a rehashed password: %s", e)
+
+        if self.workers <= 0:
+            return done(None)
+        future = self._submit(generate_password_hash, password, self.method, shed=False)
+        if future is not None:
+            future.add_done_callback(done)
+        return future
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, pending=self._pending, workers=self.workers, method=self.method)
+
+    # ---------- pool ----------
+    def _call(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        future = self._submit(fn, *args)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            self._count('shed')
+            raise self._busy() from None
+
+    def _submit(self, fn, *args, shed=True):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                if not shed:
+                    return None
+                self._stats['shed'] += 1
+                raise self._busy()
+            self._pending += 1
+        try:
+            future = self._executor().submit(fn, *args)
+        except Exception:
+            self._finished(None)
+            raise
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def _busy(self):
+        return HashingBusy(retry_after=self.retry_after)
+
+    def _executor(self):
+        # a pool does not survive a fork: a forked worker starts its own
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(self.workers)
+                self._pid = os.getpid()
+            return self._pool
+
+    def _count(self, what):
+        with self._lock:
+            self._stats[what] += 1
+
+    def shutdown(self):
+        if self._pool is not None and self._pid == os.getpid():
+            self._pool.shutdown(wait=True)
+
+
+def _check(stored, password):
+    try:
+        return check_password_hash(stored, password)
+    except Exception:  # broken or unknown hash format
+        return False
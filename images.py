@@ -0,0 +1,208 @@
+import os, json, logging, threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional: without it pages use the original files
+    Image = None
+
+log = logging.getLogger(__name__)
+
+# Widths (px) of the generated copies; see ImageVariants.
+WIDTHS = (320, 640, 1280)
+FORMATS = (
+    ('webp', 'image/webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpg', 'image/jpeg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+
+
+class ImageVariants:
+    """Resized WebP and JPEG copies of uploaded photos, made in the background.
+
+    submit() hands the resize to a process pool and returns at once; when
+    it finishes, on_done(variants) is called (on a pool thread) with a list
+    of {'src', 'width', 'type'} dicts for the record to store next to the
+    original. Copies are written next to the original as
+    <name>-<width>w.<ext>, one per width in `widths` narrower than the
+    image plus one at its own width, so the set is complete for srcset.
+    """
+
+    def __init__(self, store, widths=WIDTHS, workers=1):
+        self.store = store
+        self.widths = tuple(sorted(widths))
+        self.workers = workers
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stats = {'submitted': 0, 'done': 0, 'failed': 0}
+
+    @property
+    def enabled(self):
+        return Image is not None and self.workers > 0
+
+    def submit(self, src, on_done):
+        """Generate variants of the upload at path `src`; returns the future or None."""
+        name = self.store.name_of(src)
+        if not name or not self.enabled:
+            return None
+        future = self._executor().submit(render, self.store.root, name, self.widths)
+        self._stats['submitted'] += 1
+        future.add_done_callback(lambda f: self._finished(f, src, on_done))
+        return future
+
+    def _finished(self, future, src, on_done):
+        try:
+            variants = self._variants(future.result())
+            if variants:
+                on_done(variants)
+            self._stats['done'] += 1
+        except Exception as e:
+            self._stats['failed'] += 1
+            log.warning("Could not make resized copies of %s: %s", src, e)
+
+    def _variants(self, made):
+        return [{'src': self.store.url_prefix + name, 'width': width, 'type': mime}
+                for name, width, mime in made]
+
+    def _executor(self):
+        # a pool does not survive a fork: a forked worker starts its own
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(self.workers)
+                self._pid = os.getpid()
+            return self._pool
+
+    def shutdown(self):
+        if self._pool is not None and self._pid == os.getpid():
+            self._pool.shutdown(wait=True)
+
+    def stats(self):
+        return dict(self._stats, enabled=self.enabled)
+
+    # ---------- existing uploads ----------
+    def backfill(self, db, fields, progress_path, workers=None, echo=print):
+        """Make the missing variants for every record image named by `fields`.
+
+        `fields` is [(collection, field), ...]. Distinct images are resized
+        in parallel by `workers` processes, and each finished one is
+        appended to `progress_path`, so an interrupted run resumes where it
+        stopped. The records are then updated with one write per
+        collection and the progress file is removed. Returns
+        {collection: records updated}.
+        """
+        if Image is None:
+            raise RuntimeError('Pillow is not installed')
+        wanted = {}
+        for coll, field in fields:
+            wanted.setdefault(coll, []).append(field)
+        refs = {}  # image name -> [(collection, record id, field, value)]
+        for coll, record in db.iter_records():
+            for field in wanted.get(coll, ()):
+                if record.get('id') is None or record.get(field + '_variants'):
+                    continue
+                name = self.store.name_of(record.get(field))
+                if name:
+                    refs.setdefault(name, []).append((coll, record['id'], field, record[field]))
+
+        done = _read_progress(progress_path)
+        todo = [name for name in refs if name not in done]
+        echo(f"{len(refs)} image(s) without variants, {len(refs) - len(todo)} done in an earlier run")
+        if todo:
+            with ProcessPoolExecutor(workers or self.workers or 1) as pool, open(progress_path, 'a') as progress:
+                futures = {pool.submit(render, self.store.root, name, self.widths): name for name in todo}
+                for n, future in enumerate(as_completed(futures), 1):
+                    name = futures[future]
+                    try:
+                        done[name] = future.result()
+                    except Exception as e:
+                        echo(f"[{n}/{len(todo)}] {name}: {e}")
+                        continue
+                    progress.write(json.dumps({'name': name, 'made': done[name]}) + '\n')
+                    progress.flush()
+                    echo(f"[{n}/{len(todo)}] {name}: {len(done[name])} file(s)")
+
+        updates = {}
+        for name, users in refs.items():
+            variants = self._variants(done.get(name) or ())
+            for coll, rid, field, value in users:
+                if variants:
+                    updates.setdefault(coll, []).append(({'id': rid, field: value}, {field + '_variants': variants}))
+        counts = {coll: db.bulk_update(coll, items) for coll, items in updates.items()}
+        if os.path.exists(progress_path):
+            os.remove(progress_path)
+        return counts
+
+
+def render(root, name, widths):
+    """Write the resized copies of root/name; return [(name, width, mime type)].
+
+    Runs in a pool process. Copies that already exist (the same image was
+    uploaded before) are reused.
+    """
+    path = os.path.join(root, name)
+    base = os.path.splitext(name)[0]
+    with Image.open(path) as im:
+        if getattr(im, 'is_animated', False):
+            return []  # a still copy would drop the animation
+        # let the JPEG decoder scale down while decoding
+        im.draft(None, (widths[-1], widths[-1]))
+        im = ImageOps.exif_transpose(im)
+        sizes = [w for w in widths if w < im.width] + [min(im.width, widths[-1])]
+        made = []
+        for width in dict.fromkeys(sizes):
+            height = max(1, round(im.height * width / im.width))
+            resized = im.resize((width, height), Image.LANCZOS) if width != im.width else im
+            for ext, mime, fmt, options in FORMATS:
+                out = f'{base}-{width}w.{ext}'
+                dest = os.path.join(root, out)
+                if not os.path.exists(dest):
+                    _save(resized, dest, fmt, options)
+                made.append((out, width, mime))
+        return made
+
+
+def _save(im, dest, fmt, options):
+    if fmt == 'JPEG' and im.mode != 'RGB':
+        if im.mode in ('RGBA', 'LA', 'P'):
+            im = im.convert('RGBA')
+            flat = Image.new('RGB', im.size, 'white')
+            flat.paste(im, mask=im.getchannel('A'))
+            im = flat
+        else:
+            im = im.convert('RGB')
+    elif fmt == 'WEBP' and im.mode not in ('RGB', 'RGBA'):
+        im = im.convert('RGBA' if 'A' in im.getbands() or im.mode == 'P' else 'RGB')
+    tmp = os.path.join(os.path.dirname(dest), '.upload-' + os.path.basename(dest) + '.tmp')
+    im.save(tmp, fmt, **options)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, dest)
+
+
+def _read_progress(path):
+    done = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # last line cut short by a crash
+                done[entry['name']] = entry['made']
+    except FileNotFoundError:
+        pass
+    return done
+
+
+# ---------- template helpers ----------
+def srcset(variants, mime='image/webp'):
+    """'url 320w, url 640w' for the variants of one type ('' if there are none)."""
+    return ', '.join(f"{v['src']} {v['width']}w" for v in variants or () if v.get('type') == mime)
+
+
+def variant(variants, width, mime='image/jpeg'):
+    """URL of the smallest variant at least `width` px wide (else the widest), or None."""
+    found = sorted((v['width'], v['src']) for v in variants or () if v.get('type') == mime)
+    for w, src in found:
+        if w >= width:
+            return src
+    return found[-1][1] if found else None
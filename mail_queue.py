@@ -0,0 +1,165 @@
+import os, json, time, uuid, random, threading, tempfile
+from flask_mail import Message
+from smtp_pool import SMTPPool
+
+# Fields of a flask_mail.Message that survive the trip through the spool.
+FIELDS = ('subject', 'recipients', 'body', 'html', 'sender', 'cc', 'bcc', 'reply_to')
+
+
+class MailQueue:
+    """Disk-backed outbound mail queue drained by a pool of worker threads.
+
+    Each queued message is one JSON file under <directory>/pending, named
+    after the time it is next due, so a sorted listing is the send order.
+    A worker claims up to `batch_size` due messages by renaming them into
+    active/ (atomic, so several workers or processes never send the same
+    file twice), sends them over one pooled SMTP connection and deletes
+    them. A failed send goes back to pending/ with an exponential
+    backoff delay; after `max_attempts` it is parked in failed/. Messages
+    still pending or in flight when the process stops are picked up again
+    on the next start.
+    """
+
+    def __init__(self, app, mail, directory, workers=2, max_attempts=6,
+                 base_delay=10, max_delay=3600, poll=5, lease=600,
+                 batch_size=20, pool=None):
+        self.app = app
+        self.mail = mail
+        self.pool = pool or SMTPPool(mail, size=max(workers, 1))
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll = poll
+        self.lease = lease
+        self.dirs = {name: os.path.join(directory, name) for name in ('pending', 'active', 'failed')}
+        for path in self.dirs.values():
+            os.makedirs(path, exist_ok=True)
+        self._wake = threading.Condition()
+        self._claim_lock = threading.Lock()
+        self._stats = {'queued': 0, 'sent': 0, 'retried': 0, 'failed': 0}
+        self._threads = []
+        self._workers = workers
+        self._pid = None
+
+    # ---------- producer side ----------
+    def enqueue(self, msg):
+        """Spool a flask_mail.Message for delivery and return immediately."""
+        record = {f: getattr(msg, f, None) for f in FIELDS}
+        now = time.time()
+        record.update(id=uuid.uuid4().hex, attempts=0, not_before=now, queued_at=now)
+        self._store('pending', record)
+        self._stats['queued'] += 1
+        self.start()
+        with self._wake:
+            self._wake.notify()
+        return record['id']
+
+    def stats(self):
+        counts = {name: len(os.listdir(path)) for name, path in self.dirs.items()}
+        return dict(self._stats, smtp=self.pool.stats(), **counts)
+
+    # ---------- workers ----------
+    def start(self):
+        """Start the worker threads (once); also re-queues abandoned messages."""
+        if self._pid == os.getpid() or self._workers <= 0:
+            return
+        with self._claim_lock:
+            if self._pid == os.getpid():
+                return
+            # threads do not survive a fork: a forked worker starts its own
+            self._pid = os.getpid()
+            self._threads = []
+            self._recover()
+            for i in range(self._workers):
+                t = threading.Thread(target=self._run, name=f'mail-queue-{i}', daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _run(self):
+        while True:
+            paths = self._claim()
+            if not paths:
+                with self._wake:
+                    self._wake.wait(self.poll)
+                self._recover()
+                self.pool.evict_idle()
+                continue
+            self._deliver(paths)
+
+    def _claim(self):
+        """Move up to batch_size due messages into active/; return their paths."""
+        now = time.time()
+        claimed = []
+        with self._claim_lock:
+            for name in sorted(os.listdir(self.dirs['pending'])):
+                if name.startswith('.'):
+                    continue  # still being written
+                if float(name.split('-', 1)[0]) > now or len(claimed) >= self.batch_size:
+                    break
+                src = os.path.join(self.dirs['pending'], name)
+                dst = os.path.join(self.dirs['active'], name)
+                try:
+                    os.replace(src, dst)
+                except FileNotFoundError:
+                    continue
+                os.utime(dst)  # start of this worker's lease
+                claimed.append(dst)
+        return claimed
+
+    def _deliver(self, paths):
+        records = []
+        for path in paths:
+            with open(path) as f:
+                records.append(json.load(f))
+        with self.app.app_context():
+            messages = [Message(**{k: r[k] for k in FIELDS if r.get(k) is not None}) for r in records]
+            try:
+                results = self.pool.send_batch(messages)
+            except Exception as e:  # could not connect at all
+                results = [e] * len(messages)
+        for path, record, error in zip(paths, records, results):
+            if error is None:
+                self._stats['sent'] += 1
+            else:
+                self._failed(record, error)
+            os.remove(path)
+
+    def _failed(self, record, e):
+        # the retry (or failure) record is written before the claim is
+        # dropped, so a crash in between can only duplicate a message
+        record['attempts'] += 1
+        record['last_error'] = str(e)
+        if record['attempts'] >= self.max_attempts:
+            self.app.logger.error("Giving up on mail %s to %s: %s", record['id'], record['recipients'], e)
+            self._store('failed', record)
+            self._stats['failed'] += 1
+        else:
+            delay = min(self.base_delay * 2 ** (record['attempts'] - 1), self.max_delay)
+            record['not_before'] = time.time() + delay * random.uniform(0.8, 1.2)
+            self.app.logger.warning("Mail %s failed (attempt %d), retrying in %ds: %s",
+                                    record['id'], record['attempts'], delay, e)
+            self._store('pending', record)
+            self._stats['retried'] += 1
+
+    def _recover(self):
+        """Return messages whose sender died mid-delivery to pending/."""
+        cutoff = time.time() - self.lease
+        for name in os.listdir(self.dirs['active']):
+            path = os.path.join(self.dirs['active'], name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.replace(path, os.path.join(self.dirs['pending'], name))
+            except FileNotFoundError:
+                pass
+
+    # ---------- spool files ----------
+    def _store(self, state, record):
+        name = f"{record['not_before']:017.6f}-{record['id']}.json"
+        directory = self.dirs[state]
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(record, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(directory, name))
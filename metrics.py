@@ -0,0 +1,211 @@
+import time, inspect, threading
+from bisect import bisect_left
+from functools import wraps
+from flask import request
+
+# Upper bounds (seconds) of the latency histogram buckets: about six per
+# decade from 0.5 ms to 10 s, plus an open-ended last one.
+BUCKETS = (0.0005, 0.0007, 0.001, 0.0015, 0.002, 0.003, 0.005, 0.007, 0.01, 0.015, 0.02, 0.03,
+           0.05, 0.07, 0.1, 0.15, 0.2, 0.3, 0.5, 0.7, 1.0, 1.5, 2.0, 3.0, 5.0, 7.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Counts of observed durations per bucket, Prometheus style."""
+
+    __slots__ = ('counts', 'count', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """Estimate of the q-quantile, interpolated inside its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                if i == len(BUCKETS):
+                    return BUCKETS[-1]  # beyond the last bound: report the bound
+                low = BUCKETS[i - 1] if i else 0.0
+                return low + (BUCKETS[i] - low) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+    def summary(self):
+        return {'count': self.count, 'sum': self.sum,
+                'mean': self.sum / self.count if self.count else None,
+                **{f'p{int(q * 100)}': self.quantile(q) for q in QUANTILES}}
+
+
+class Metrics:
+    """Per-request timing of the slow parts of a request.
+
+    Wraps the Flask app as WSGI middleware (install it after any other
+    middleware so its total covers them). For every request it records
+    the time until the response headers go out in a histogram per
+    endpoint, and, when `server_timing` is on, adds a Server-Timing
+    header, e.g. `db;dur=1.8;desc="14 calls", render;dur=6.2, total;dur=9.1`,
+    which browser dev tools show under the request's Timing tab.
+
+    The phases are whatever was passed through timed() / instrument():
+    each call adds its duration to the current request's phase and to a
+    histogram per phase. Calls made outside a request (mail workers,
+    index rebuilds) only go to the phase histogram. A phase nested in
+    itself (a Database method calling another) is timed once, at the
+    outermost call.
+
+    Numbers are per process; each worker reports its own.
+    """
+
+    def __init__(self, app, server_timing=True):
+        self.wsgi_app = app.wsgi_app
+        self.server_timing = server_timing
+        self.started = time.time()
+        self._endpoints = {}   # endpoint -> Histogram
+        self._phases = {}      # phase -> Histogram
+        self._statuses = {}    # (endpoint, status code) -> count
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        app.wsgi_app = self
+        app.before_request(self._note_endpoint)
+
+    def _note_endpoint(self):
+        request.environ['metrics.endpoint'] = request.endpoint
+
+    # ---------- instrumentation ----------
+    def timed(self, phase, fn):
+        """`fn` wrapped so that every call is timed as `phase`."""
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            local = self._local
+            active = getattr(local, 'active', None)
+            if active is None:
+                active = local.active = set()
+            if phase in active:
+                return fn(*args, **kwargs)
+            active.add(phase)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                active.discard(phase)
+                self.record(phase, time.perf_counter() - start)
+        return wrapper
+
+    def instrument(self, obj, phase, methods=None):
+        """Time the given methods of `obj` (default: its public ones) as `phase`."""
+        if methods is None:
+            methods = [name for name, fn in inspect.getmembers(type(obj), callable)
+                       if not name.startswith('_') and not inspect.isgeneratorfunction(fn)]
+        for name in methods:
+            setattr(obj, name, self.timed(phase, getattr(obj, name)))
+
+    def record(self, phase, seconds):
+        timings = getattr(self._local, 'timings', None)
+        if timings is not None:
+            spent = timings.setdefault(phase, [0.0, 0])
+            spent[0] += seconds
+            spent[1] += 1
+        with self._lock:
+            hist = self._phases.get(phase)
+            if hist is None:
+                hist = self._phases[phase] = Histogram()
+            hist.observe(seconds)
+
+    # ---------- WSGI ----------
+    def __call__(self, environ, start_response):
+        local = self._local
+        local.timings = timings = {}
+        start = time.perf_counter()
+
+        def timed_start_response(status, headers, exc_info=None):
+            total = time.perf_counter() - start
+            if self.server_timing:
+                headers = list(headers)
+                headers.append(('Server-Timing', _server_timing(timings, total)))
+            self._observe(environ.get('metrics.endpoint'), status, total)
+            return start_response(status, headers, exc_info)
+
+        try:
+            return self.wsgi_app(environ, timed_start_response)
+        finally:
+            local.timings = None
+
+    def _observe(self, endpoint, status, seconds):
+        endpoint = endpoint or 'unmatched'  # 404s and requests that failed before routing
+        code = status[:3]
+        with self._lock:
+            hist = self._endpoints.get(endpoint)
+            if hist is None:
+                hist = self._endpoints[endpoint] = Histogram()
+            hist.observe(seconds)
+            self._statuses[(endpoint, code)] = self._statuses.get((endpoint, code), 0) + 1
+
+    # ---------- reports ----------
+    def snapshot(self):
+        """Per-endpoint and per-phase latency summaries (seconds), slowest p95 first."""
+        with self._lock:
+            endpoints = {e: h.summary() for e, h in self._endpoints.items()}
+            phases = {p: h.summary() for p, h in self._phases.items()}
+            statuses = dict(self._statuses)
+        for (endpoint, code), n in statuses.items():
+            endpoints[endpoint].setdefault('statuses', {})[code] = n
+        order = lambda item: -(item[1]['p95'] or 0)
+        return {'uptime': time.time() - self.started,
+                'endpoints': dict(sorted(endpoints.items(), key=order)),
+                'phases': dict(sorted(phases.items(), key=order))}
+
+    def prometheus(self, prefix='portal'):
+        """The histograms in the Prometheus text exposition format."""
+        with self._lock:
+            endpoints = [(e, list(h.counts), h.count, h.sum) for e, h in sorted(self._endpoints.items())]
+            phases = [(p, list(h.counts), h.count, h.sum) for p, h in sorted(self._phases.items())]
+            statuses = sorted(self._statuses.items())
+        lines = []
+        for name, label, rows, what in (
+                ('request_duration_seconds', 'endpoint', endpoints, 'Time until the response headers were sent.'),
+                ('phase_duration_seconds', 'phase', phases, 'Time spent per call in an instrumented phase.')):
+            name = f'{prefix}_{name}'
+            lines += [f'# HELP {name} {what}', f'# TYPE {name} histogram']
+            for key, counts, count, total in rows:
+                labels = f'{label}="{_escape(key)}"'
+                cumulative = 0
+                for bound, n in zip(BUCKETS + ('+Inf',), counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{labels}}} {total:.6f}')
+                lines.append(f'{name}_count{{{labels}}} {count}')
+        name = f'{prefix}_requests_total'
+        lines += [f'# HELP {name} Responses by endpoint and status code.', f'# TYPE {name} counter']
+        for (endpoint, code), n in statuses:
+            lines.append(f'{name}{{endpoint="{_escape(endpoint)}",status="{code}"}} {n}')
+        name = f'{prefix}_uptime_seconds'
+        lines += [f'# TYPE {name} gauge', f'{name} {time.time() - self.started:.0f}']
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._phases.clear()
+            self._statuses.clear()
+            self.started = time.time()
+
+
+def _server_timing(timings, total):
+    parts = [f'{phase};dur={spent * 1000:.2f};desc="{calls} call{"s" if calls != 1 else ""}"'
+             for phase, (spent, calls) in timings.items()]
+    parts.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(parts)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
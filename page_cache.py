@@ -0,0 +1,155 @@
+import time, threading
+from collections import OrderedDict
+from functools import wraps
+from flask import request, session, make_response
+
+
+class PageCache:
+    """In-process LRU cache of fully rendered GET responses.
+
+    Entries are keyed by (endpoint, query string, login bucket) and tagged
+    with the Database collections the page was built from (a logged-in
+    visitor's page also with their account collection, for the navbar);
+    invalidate(tag) drops every page that used that collection. A page
+    rendered while one of its collections was invalidated is not stored,
+    since it may hold the data from before the change. Entries also expire after
+    `ttl` seconds, which bounds staleness for changes this process cannot
+    see (e.g. another worker writing to MongoDB).
+    """
+
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (expires_at, tags, body, status, headers)
+        self._tags = {}                 # tag -> set of keys
+        self._generations = {}          # tag -> number of invalidations
+        self._epoch = 0                 # number of clear() calls
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    # ---------- storage ----------
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry
+
+    def generation(self, tags):
+        """Token that changes whenever any of `tags` is invalidated."""
+        with self._lock:
+            return self._generation(tags)
+
+    def _generation(self, tags):
+        return self._epoch, tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def set(self, key, tags, body, status, headers, generation=None):
+        """Store a page; skipped if `tags` were invalidated since `generation` was taken."""
+        with self._lock:
+            if generation is not None and generation != self._generation(tags):
+                return False
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, tags, body, status, headers)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._stats['evictions'] += 1
+            return True
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry:
+            for tag in entry[1]:
+                keys = self._tags.get(tag)
+                if keys:
+                    keys.discard(key)
+
+    def invalidate(self, *tags):
+        """Drop every page tagged with any of `tags`."""
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+                for key in list(self._tags.pop(tag, ())):
+                    self._drop(key)
+                    self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._stats['invalidations'] += len(self._entries)
+            self._epoch += 1
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries))
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['hits'] / lookups) if lookups else 0.0
+        return stats
+
+    # ---------- Database hook ----------
+    def on_db_change(self, coll, action, args):
+        """Database.on_change listener: drop pages built from `coll`."""
+        if coll is None:
+            self.clear()
+        else:
+            self.invalidate(coll)
+
+    # ---------- view decorator ----------
+    def cached(self, *tags):
+        """Serve a GET view from the cache; `tags` name the collections it reads."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                # pending flash messages are rendered once, so never cache them
+                if self.max_entries <= 0 or request.method != 'GET' or session.get('_flashes'):
+                    return view(*args, **kwargs)
+
+                bucket, account = _login_bucket()
+                key = (request.endpoint, request.query_string, bucket)
+                page_tags = tags + (account,) if account else tags
+                entry = self.get(key)
+                if entry is not None:
+                    _, _, body, status, headers = entry
+                    resp = make_response(body, status, headers)
+                    resp.headers['X-Page-Cache'] = 'HIT'
+                    return resp
+
+                generation = self.generation(page_tags)
+                resp = make_response(view(*args, **kwargs))
+                if resp.status_code == 200 and not resp.direct_passthrough:
+                    headers = [(k, v) for k, v in resp.headers.items() if k.lower() != 'set-cookie']
+                    self.set(key, page_tags, resp.get_data(), resp.status_code, headers, generation)
+                resp.headers['X-Page-Cache'] = 'MISS'
+                return resp
+            return wrapper
+        return decorator
+
+
+# Collection holding the accounts of each session role.
+ACCOUNTS = {'student': 'students', 'faculty': 'faculty'}
+
+
+def _login_bucket():
+    """(bucket, account collection) of the page variant this visitor gets.
+
+    Anonymous visitors share one entry; logged-in users see their own name in
+    the navbar, so each of them gets a private entry, dropped whenever their
+    account collection changes (a profile edit, a deactivation).
+    """
+    for role, coll in ACCOUNTS.items():
+        user = session.get(role)
+        if user:
+            # the account id (a whole profile dict in older signed-cookie sessions)
+            return f"{role}:{user.get('id') if isinstance(user, dict) else user}", coll
+    return 'anon', None
@@ -0,0 +1,406 @@
+import os, re, json, math, time, heapq, hashlib, tempfile, threading
+from functools import lru_cache
+from operator import itemgetter
+
+# What is searchable: per collection, the Database getter / lister, the
+# indexed fields with their weights (a title word counts as three body
+# words), the field the result summary comes from, the record fields
+# copied into results, and which records are public.
+SOURCES = {
+    'blogs': {
+        'get': 'get_blog', 'list': 'list_blogs',
+        'fields': {'title': 3, 'content': 1}, 'summary': 'content',
+        'keep': ('author_name', 'created_at'),
+        'visible': lambda r: bool(r.get('approved')),
+    },
+    'research': {
+        'get': 'get_research', 'list': 'list_research',
+        'fields': {'title': 3, 'author': 2, 'description': 1}, 'summary': 'description',
+        'keep': ('author', 'date', 'pdf_link', 'pdf_path'),
+    },
+    'events': {
+        'get': 'get_event', 'list': 'list_events',
+        'fields': {'title': 3, 'description': 1}, 'summary': 'description',
+        'keep': ('date', 'location'),
+    },
+    'notifications': {
+        'get': 'get_notification', 'list': 'list_notifications',
+        'fields': {'title': 3, 'message': 1}, 'summary': 'message',
+        'keep': ('date', 'link_url', 'file_path'),
+        'visible': lambda r: r.get('is_active', True),
+    },
+}
+SUMMARY_CHARS = 200
+FORMAT = 1  # bump when the stored layout or the tokenizer changes
+
+TAG = re.compile(r'<[^>]*>')
+WORD = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset('''a an and are as at be but by for from has have he her his i if in into is it
+its me my no not of on or our she so than that the their them then there these they this to
+was we were what when which who will with you your'''.split())
+
+
+class SearchIndex:
+    """In-process full-text index with BM25 ranking over public records.
+
+    Keeps, per document, the weighted term frequencies of its stemmed
+    words (the forward index, which is what is saved to `path`) and, per
+    term, the documents containing it (rebuilt from the forward index on
+    load, without re-tokenizing). on_db_change() applies adds, updates
+    and deletes as they happen in this process and counts them per
+    collection. Before each query each collection's version token is
+    read; if it moved by more than the writes applied here since the
+    last reconcile, the collection changed in a way this process did
+    not follow (another worker, a reload, a bulk update) and is
+    reconciled with the database by content hash, so only changed
+    records are re-tokenized. Every collection is reconciled at least
+    every `max_age` seconds, for writes another worker interleaved with
+    ours. Saves are batched: one write `save_delay` seconds after the
+    last change.
+    """
+
+    def __init__(self, db, path, sources=SOURCES, k1=1.2, b=0.75, save_delay=2.0, max_age=300):
+        self.db = db
+        self.path = path
+        self.sources = sources
+        self.k1 = k1
+        self.b = b
+        self.save_delay = save_delay
+        self.max_age = max_age
+        self._docs = {}       # 'coll:id' -> {'coll', 'id', 'title', 'summary', ..., 'len', 'hash', 'terms'}
+        self._postings = {}   # term -> {'coll:id': weighted tf}
+        self._total_len = 0
+        self._tokens = {}     # coll -> collection_version() at the last reconcile
+        self._applied = {}    # coll -> writes on_db_change() applied since then
+        self._synced = None   # monotonic time of the last full reconcile
+        self._lock = threading.RLock()
+        self._timer = None
+        self._stats = {'queries': 0, 'syncs': 0, 'indexed': 0, 'removed': 0, 'saves': 0}
+        self.load()
+
+    # ---------- queries ----------
+    def search(self, query, limit=10, offset=0, colls=None):
+        """Best matches for `query`: (total, [result dicts]) ordered by score."""
+        self.refresh()
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            self._stats['queries'] += 1
+            n_docs = len(self._docs)
+            if not terms or not n_docs:
+                return 0, []
+            avg_len = self._total_len / n_docs
+            k1, b = self.k1, self.b
+            scores = {}
+            for term in terms:
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for key, tf in posting.items():
+                    norm = k1 * (1 - b + b * self._docs[key]['len'] / avg_len)
+                    scores[key] = scores.get(key, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+            if colls:
+                scores = {k: s for k, s in scores.items() if self._docs[k]['coll'] in colls}
+            best = heapq.nlargest(offset + limit, scores.items(), key=itemgetter(1))[offset:]
+            results = []
+            for key, score in best:
+                doc = self._docs[key]
+                results.append({k: v for k, v in doc.items() if k not in ('len', 'hash', 'terms')}
+                               | {'score': round(score, 4)})
+            return len(scores), results
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, documents=len(self._docs), terms=len(self._postings))
+
+    # ---------- keeping up with the database ----------
+    def on_db_change(self, coll, action, args):
+        """Database.on_change listener: re-index the record that changed."""
+        if coll is None:
+            with self._lock:
+                self._tokens.clear()  # anything may have changed: reconcile all
+            return
+        source = self.sources.get(coll)
+        if source is None:
+            return
+        if not args:
+            with self._lock:
+                self._tokens.pop(coll, None)  # bulk update: reconcile the collection
+            return
+        if action == 'add' and isinstance(args[0], dict):
+            record = args[0]
+        elif action == 'delete':
+            record = None
+        else:
+            record = getattr(self.db, source['get'])(args[0])
+        rid = record.get('id') if record else args[0]
+        with self._lock:
+            if self._put(coll, rid, record):
+                self._save_later()
+            self._applied[coll] = self._applied.get(coll, 0) + 1
+
+    def refresh(self):
+        """Reconcile the collections that changed in ways the index did not follow."""
+        if self._synced is None or time.monotonic() - self._synced > self.max_age:
+            self.sync()
+            return
+        stale = []
+        for coll in self.sources:
+            token = self.db.collection_version(coll)[0]
+            with self._lock:
+                if self._followed(coll, token):
+                    # every write since the last reconcile was applied here
+                    self._tokens[coll] = token
+                    self._applied[coll] = 0
+                else:
+                    stale.append(coll)
+        if stale:
+            self.sync(stale)
+
+    def _followed(self, coll, token):
+        base = self._tokens.get(coll)
+        if base is None:
+            return False
+        if token == base:
+            return True
+        try:
+            return int(token) == int(base) + self._applied.get(coll, 0)
+        except ValueError:
+            return False
+
+    def sync(self, colls=None):
+        """Re-index changed records and drop vanished ones; returns how many changed."""
+        colls = list(self.sources) if colls is None else colls
+        current = set()
+        changed = 0
+        with self._lock:
+            for coll in colls:
+                # read the token first: a write racing the listing shows up next time
+                self._tokens[coll] = self.db.collection_version(coll)[0]
+                self._applied[coll] = 0
+                for record in getattr(self.db, self.sources[coll]['list'])():
+                    rid = record.get('id')
+                    if rid is None:
+                        continue
+                    current.add(_key(coll, rid))
+                    changed += self._put(coll, rid, record)
+            for key in [k for k, doc in self._docs.items() if doc['coll'] in colls and k not in current]:
+                changed += self._remove(key)
+            if len(colls) == len(self.sources):
+                self._synced = time.monotonic()
+            self._stats['syncs'] += 1
+            if changed:
+                self._save_later()
+        return changed
+
+    def rebuild(self):
+        with self._lock:
+            self._docs, self._postings, self._total_len = {}, {}, 0
+            self.sync()
+            self.save()
+
+    def _put(self, coll, rid, record):
+        """Index `record` under coll:rid (None or a hidden record removes it)."""
+        key = _key(coll, rid)
+        source = self.sources[coll]
+        if record is None or not source.get('visible', _always)(record):
+            return self._remove(key)
+        shown = [record.get(f) for f in (*source['fields'], *source.get('keep', ()))]
+        digest = hashlib.blake2b(repr(shown).encode(), digest_size=16).hexdigest()
+        old = self._docs.get(key)
+        if old is not None and old['hash'] == digest:
+            return 0
+        texts = {f: _text(record.get(f)) for f in source['fields']}
+        keep = {f: _plain(record.get(f)) for f in source.get('keep', ())}
+        terms = {}
+        for field, weight in source['fields'].items():
+            for term in tokenize(texts[field]):
+                terms[term] = terms.get(term, 0) + weight
+        summary = texts.get(source.get('summary'), '')
+        if len(summary) > SUMMARY_CHARS:
+            summary = summary[:SUMMARY_CHARS].rsplit(' ', 1)[0] + '…'
+        self._remove(key)
+        self._add(key, dict(keep, coll=coll, id=rid, title=texts.get('title', ''), summary=summary,
+                            len=sum(terms.values()), hash=digest, terms=terms))
+        self._stats['indexed'] += 1
+        return 1
+
+    def _add(self, key, doc):
+        self._docs[key] = doc
+        self._total_len += doc['len']
+        for term, tf in doc['terms'].items():
+            self._postings.setdefault(term, {})[key] = tf
+
+    def _remove(self, key):
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return 0
+        self._total_len -= doc['len']
+        for term in doc['terms']:
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(key, None)
+                if not posting:
+                    del self._postings[term]
+        self._stats['removed'] += 1
+        return 1
+
+    # ---------- persistence ----------
+    def load(self):
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return False
+        if saved.get('format') != FORMAT:
+            return False
+        with self._lock:
+            self._docs, self._postings, self._total_len = {}, {}, 0
+            for key, doc in saved['docs'].items():
+                self._add(key, doc)
+        return True
+
+    def save(self):
+        with self._lock:
+            self._timer = None
+            data = json.dumps({'format': FORMAT, 'docs': self._docs}, separators=(',', ':'))
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.search-', suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+        self._stats['saves'] += 1
+
+    def _save_later(self):
+        if self._timer is None:
+            self._timer = threading.Timer(self.save_delay, self.save)
+            self._timer.daemon = True
+            self._timer.start()
+
+
+def _key(coll, rid):
+    return f'{coll}:{rid}'
+
+
+def _always(record):
+    return True
+
+
+def _text(value):
+    """Plain text of a field: HTML tags dropped, whitespace collapsed."""
+    if value is None:
+        return ''
+    return ' '.join(TAG.sub(' ', str(value)).split())
+
+
+def _plain(value):
+    return value if value is None or isinstance(value, (str, int, float, bool)) else str(value)
+
+
+def tokenize(text):
+    """Lowercased, stemmed words of `text` minus stopwords."""
+    return [stem(w) for w in WORD.findall(text.lower()) if w not in STOPWORDS]
+
+
+# ---------- Porter stemmer ----------
+# M. F. Porter, "An algorithm for suffix stripping", Program 14(3), 1980.
+
+def _is_consonant(word, i):
+    ch = word[i]
+    if ch in 'aeiou':
+        return False
+    if ch == 'y':
+        return i == 0 or not _is_consonant(word, i - 1)
+    return True
+
+
+def _measure(stem_):
+    """m in [C](VC){m}[V]."""
+    m, prev_vowel = 0, False
+    for i in range(len(stem_)):
+        vowel = not _is_consonant(stem_, i)
+        if prev_vowel and not vowel:
+            m += 1
+        prev_vowel = vowel
+    return m
+
+
+def _has_vowel(stem_):
+    return any(not _is_consonant(stem_, i) for i in range(len(stem_)))
+
+
+def _double_consonant(word):
+    return len(word) > 1 and word[-1] == word[-2] and _is_consonant(word, len(word) - 1)
+
+
+def _cvc(word):
+    return (len(word) >= 3 and _is_consonant(word, len(word) - 3)
+            and not _is_consonant(word, len(word) - 2) and _is_consonant(word, len(word) - 1)
+            and word[-1] not in 'wxy')
+
+
+def _replace(word, rules, min_m):
+    """Apply the first rule whose suffix matches, if the stem's m > min_m."""
+    for suffix, repl in rules:
+        if word.endswith(suffix):
+            stem_ = word[:len(word) - len(suffix)]
+            return stem_ + repl if _measure(stem_) > min_m else word
+    return word
+
+
+_STEP2 = (('ational', 'ate'), ('tional', 'tion'), ('enci', 'ence'), ('anci', 'ance'), ('izer', 'ize'),
+          ('bli', 'ble'), ('alli', 'al'), ('entli', 'ent'), ('eli', 'e'), ('ousli', 'ous'),
+          ('ization', 'ize'), ('ation', 'ate'), ('ator', 'ate'), ('alism', 'al'), ('iveness', 'ive'),
+          ('fulness', 'ful'), ('ousness', 'ous'), ('aliti', 'al'), ('iviti', 'ive'), ('biliti', 'ble'),
+          ('logi', 'log'))
+_STEP3 = (('icate', 'ic'), ('ative', ''), ('alize', 'al'), ('iciti', 'ic'), ('ical', 'ic'),
+          ('ful', ''), ('ness', ''))
+_STEP4 = ('al', 'ance', 'ence', 'er', 'ic', 'able', 'ible', 'ant', 'ement', 'ment', 'ent', 'ion',
+          'ou', 'ism', 'ate', 'iti', 'ous', 'ive', 'ize')
+
+
+@lru_cache(maxsize=8192)
+def stem(word):
+    if len(word) <= 2 or not word.isalpha():
+        return word
+    # step 1a
+    if word.endswith('sses') or word.endswith('ies'):
+        word = word[:-2]
+    elif word.endswith('s') and not word.endswith('ss'):
+        word = word[:-1]
+    # step 1b
+    if word.endswith('eed'):
+        if _measure(word[:-3]) > 0:
+            word = word[:-1]
+    else:
+        for suffix in ('ed', 'ing'):
+            if word.endswith(suffix) and _has_vowel(word[:-len(suffix)]):
+                word = word[:-len(suffix)]
+                if word.endswith(('at', 'bl', 'iz')):
+                    word += 'e'
+                elif _double_consonant(word) and word[-1] not in 'lsz':
+                    word = word[:-1]
+                elif _measure(word) == 1 and _cvc(word):
+                    word += 'e'
+                break
+    # step 1c
+    if word.endswith('y') and _has_vowel(word[:-1]):
+        word = word[:-1] + 'i'
+    word = _replace(word, _STEP2, 0)
+    word = _replace(word, _STEP3, 0)
+    # step 4
+    for suffix in sorted(_STEP4, key=len, reverse=True):
+        if word.endswith(suffix):
+            stem_ = word[:-len(suffix)]
+            if _measure(stem_) > 1 and (suffix != 'ion' or stem_.endswith(('s', 't'))):
+                word = stem_
+            break
+    # step 5
+    if word.endswith('e'):
+        stem_ = word[:-1]
+        m = _measure(stem_)
+        if m > 1 or (m == 1 and not _cvc(stem_)):
+            word = stem_
+    if _measure(word) > 1 and _double_consonant(word) and word.endswith('l'):
+        word = word[:-1]
+    return word
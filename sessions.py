@@ -0,0 +1,175 @@
+import time, secrets, sqlite3, threading
+from collections import OrderedDict
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+serializer = TaggedJSONSerializer()  # what Flask's cookie sessions use (tuples, bytes, datetimes)
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session data kept on the server; the cookie only carries `sid`."""
+
+    def __init__(self, initial=None, sid=None, expires=None):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires = expires      # stored idle deadline, None if not stored yet
+        self.modified = False
+        self.rotated_from = None
+
+    def rotate(self):
+        """Move the data to a fresh id (call on login, against session fixation)."""
+        if self.sid and self.rotated_from is None:
+            self.rotated_from = self.sid
+        self.sid = None
+        self.modified = True
+
+
+class ServerSessionInterface(SessionInterface):
+    """Flask session interface backed by a MemoryStore or SQLiteSessionStore.
+
+    The cookie holds an unguessable random id and nothing else. A session
+    expires after `idle` seconds without a request; its deadline is
+    pushed back at most once every `touch_every` seconds, so a plain page
+    view costs one keyed read and, usually, no write. Empty sessions are
+    never stored. Expired rows are purged in bulk every `purge_every`
+    seconds (and by `flask sessions-purge`).
+    """
+
+    def __init__(self, store, idle=24 * 3600, touch_every=300, purge_every=3600):
+        self.store = store
+        self.idle = idle
+        self.touch_every = touch_every
+        self.purge_every = purge_every
+        self._next_purge = time.time() + purge_every
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            found = self.store.get(sid)
+            if found is not None and found[1] > time.time():
+                return ServerSession(serializer.loads(found[0]), sid, found[1])
+        return ServerSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.rotated_from:
+            self.store.delete(session.rotated_from)
+        if not session:
+            if session.sid and session.expires is not None:
+                self.store.delete(session.sid)
+            if session.sid or session.rotated_from:
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app))
+            return
+        now = time.time()
+        new = session.sid is None
+        if new:
+            session.sid = secrets.token_urlsafe(32)
+        expires = now + self.idle
+        if new or session.modified or session.expires is None:
+            self.store.set(session.sid, serializer.dumps(dict(session)), expires)
+        elif expires - session.expires >= self.touch_every:
+            self.store.touch(session.sid, expires)
+        if now >= self._next_purge:
+            self._next_purge = now + self.purge_every
+            self.store.purge(now)
+        if new:
+            response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session),
+                                httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                                secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app))
+
+
+class MemoryStore:
+    """Sessions in a per-process LRU; only for a single-process server."""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # sid -> (data, expires)
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        with self._lock:
+            found = self._entries.get(sid)
+            if found is not None:
+                self._entries.move_to_end(sid)
+            return found
+
+    def set(self, sid, data, expires):
+        with self._lock:
+            self._entries[sid] = (data, expires)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def touch(self, sid, expires):
+        with self._lock:
+            found = self._entries.get(sid)
+            if found is not None:
+                self._entries[sid] = (found[0], expires)
+
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+    def purge(self, now=None, everything=False):
+        """Drop expired sessions (all of them with everything=True); returns how many."""
+        now = time.time() if now is None else now
+        with self._lock:
+            dead = list(self._entries) if everything else [s for s, (_, exp) in self._entries.items() if exp <= now]
+            for sid in dead:
+                del self._entries[sid]
+        return len(dead)
+
+    def count(self):
+        return len(self._entries)
+
+
+class SQLiteSessionStore:
+    """Sessions in an SQLite file shared by every worker process (WAL mode)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(
+            'CREATE TABLE IF NOT EXISTS sessions '
+            '(sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL) WITHOUT ROWID;'
+            'CREATE INDEX IF NOT EXISTS ix_sessions_expires ON sessions (expires);')
+
+    def _conn(self):
+        # sqlite3 connections cannot be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, sid):
+        return self._conn().execute('SELECT data, expires FROM sessions WHERE sid = ?', (sid,)).fetchone()
+
+    def set(self, sid, data, expires):
+        self._conn().execute('INSERT OR REPLACE INTO sessions (sid, data, expires) VALUES (?, ?, ?)',
+                             (sid, data, expires))
+
+    def touch(self, sid, expires):
+        self._conn().execute('UPDATE sessions SET expires = ? WHERE sid = ?', (expires, sid))
+
+    def delete(self, sid):
+        self._conn().execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+    def purge(self, now=None, everything=False):
+        """Drop expired sessions (all of them with everything=True); returns how many."""
+        if everything:
+            return self._conn().execute('DELETE FROM sessions').rowcount
+        now = time.time() if now is None else now
+        return self._conn().execute('DELETE FROM sessions WHERE expires <= ?', (now,)).rowcount
+
+    def count(self):
+        return self._conn().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
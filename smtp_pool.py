@@ -0,0 +1,128 @@
+import time, smtplib, threading
+from contextlib import contextmanager
+
+
+class SMTPPool:
+    """Bounded pool of open, authenticated Flask-Mail connections.
+
+    A connection is reused for as long as the server keeps it: one that sat
+    idle longer than `keepalive` seconds is probed with NOOP before reuse,
+    and one idle longer than `idle_timeout` is closed (evict_idle() does
+    this for connections nobody asks for). At most `size` connections are
+    open at once; callers beyond that wait for one to be released.
+    """
+
+    def __init__(self, mail, size=2, keepalive=30, idle_timeout=120):
+        self.mail = mail
+        self.keepalive = keepalive
+        self.idle_timeout = idle_timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = []  # [(connection, released_at)], most recent last
+        self._lock = threading.Lock()
+        self._stats = {'opened': 0, 'reused': 0, 'closed': 0, 'sent': 0}
+
+    @contextmanager
+    def connection(self):
+        """A live flask_mail.Connection; returned to the pool afterwards.
+
+        If the block raises, the connection is assumed broken and closed.
+        """
+        with self._slots:
+            conn = self._checkout()
+            try:
+                yield conn
+            except BaseException:
+                self._close(conn)
+                raise
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+
+    def send_batch(self, messages):
+        """Send `messages` over one pooled connection.
+
+        Returns one entry per message: None when it was sent, otherwise the
+        exception. A dropped connection is re-opened once and the remaining
+        messages carry on over the new one; if it cannot be re-opened, the
+        unsent messages get that error and the ones already sent keep None.
+        """
+        results = []
+        try:
+            with self.connection() as conn:
+                for i, msg in enumerate(messages):
+                    try:
+                        conn.send(msg)
+                        results.append(None)
+                        self._stats['sent'] += 1
+                    except smtplib.SMTPServerDisconnected:
+                        try:
+                            conn.host = conn.configure_host()
+                        except Exception as e:
+                            results.extend([e] * (len(messages) - i))
+                            raise _Reconnect from e  # closes the broken connection
+                        self._stats['opened'] += 1
+                        try:
+                            conn.send(msg)
+                            results.append(None)
+                            self._stats['sent'] += 1
+                        except Exception as e:
+                            results.append(e)
+                    except Exception as e:
+                        results.append(e)
+        except _Reconnect:
+            pass
+        return results
+
+    def evict_idle(self):
+        """Close connections idle for longer than `idle_timeout`."""
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            stale = [c for c, t in self._idle if t < cutoff]
+            self._idle = [(c, t) for c, t in self._idle if t >= cutoff]
+        for conn in stale:
+            self._close(conn)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        return dict(self._stats, idle=len(self._idle))
+
+    # ---------- internals ----------
+    def _checkout(self):
+        self.evict_idle()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, released = self._idle.pop()
+            if time.monotonic() - released < self.keepalive or self._alive(conn):
+                self._stats['reused'] += 1
+                return conn
+            self._close(conn)
+        conn = self.mail.connect()
+        conn.__enter__()
+        self._stats['opened'] += 1
+        return conn
+
+    @staticmethod
+    def _alive(conn):
+        if conn.host is None:  # MAIL_SUPPRESS_SEND: nothing to probe
+            return True
+        try:
+            return conn.host.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _close(self, conn):
+        self._stats['closed'] += 1
+        try:
+            conn.__exit__(None, None, None)
+        except (smtplib.SMTPException, OSError):
+            pass
+
+
+class _Reconnect(Exception):
+    """A dropped connection could not be re-opened mid-batch."""
@@ -0,0 +1,243 @@
+import json, time, sqlite3, threading
+
+# Every collection is one table: the full record is kept as JSON in `doc`,
+# and the fields used for lookups are copied into real, indexed columns.
+COLUMNS = ('id', 'email', 'student_id', 'status', 'degree', 'year', 'created_at', 'blog_id')
+
+INDEXES = {
+    'students': [('id',), ('email',), ('student_id',)],
+    'blogs': [('id',), ('status',), ('student_id',), ('created_at', 'id'), ('status', 'created_at', 'id')],
+    'faculty': [('id',), ('email',)],
+    'curriculum': [('degree', 'year')],
+    'blog_comments': [('id',), ('blog_id', 'created_at')],
+}
+DEFAULT_INDEXES = [('id',)]
+
+COLLECTIONS = (
+    'students', 'blogs', 'contacts', 'faculty', 'events', 'notifications',
+    'gallery', 'research', 'csa_members', 'past_csa', 'curriculum', 'alumni',
+    'blog_likes', 'blog_comments', 'user_activity',
+)
+
+
+class SQLiteStore:
+    """Embedded SQLite engine behind the Database method surface.
+
+    Uses WAL mode (readers never block the writer) and one connection per
+    thread, since sqlite3 connections cannot be shared between threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._tables = set()
+        self._tables_lock = threading.Lock()
+        with self._tx() as conn:
+            # one change counter per collection (see Database.collection_version)
+            conn.execute('CREATE TABLE IF NOT EXISTS _versions '
+                         '(name TEXT PRIMARY KEY, v INTEGER NOT NULL, modified REAL)')
+            for name in COLLECTIONS:
+                self._create(conn, name)
+
+    # ---------- connections / schema ----------
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _tx(self):
+        return _Transaction(self._conn())
+
+    def transaction(self):
+        """`with` block grouping several apply() calls into one transaction."""
+        return self._tx()
+
+    def _create(self, conn, name):
+        if name in self._tables:
+            return
+        if not name.isidentifier():
+            raise ValueError(f"bad collection name: {name}")
+        cols = ', '.join(f'{c} TEXT' for c in COLUMNS)
+        conn.execute(
+            f'CREATE TABLE IF NOT EXISTS {name} '
+            f'(pk INTEGER PRIMARY KEY AUTOINCREMENT, {cols}, doc TEXT NOT NULL)'
+        )
+        # tables created before a column was added to COLUMNS get it here
+        have = {r[1] for r in conn.execute(f'PRAGMA table_info({name})')}
+        for c in COLUMNS:
+            if c not in have:
+                conn.execute(f'ALTER TABLE {name} ADD COLUMN {c} TEXT')
+                conn.execute(f"UPDATE {name} SET {c} = json_extract(doc, '$.\"{c}\"')")
+        for fields in INDEXES.get(name, DEFAULT_INDEXES):
+            conn.execute(
+                f'CREATE INDEX IF NOT EXISTS ix_{name}_{"_".join(fields)} '
+                f'ON {name} ({", ".join(fields)})'
+            )
+        with self._tables_lock:
+            self._tables.add(name)
+
+    @staticmethod
+    def _where(match):
+        clauses, params = [], []
+        for k, v in (match or {}).items():
+            col = k if k in COLUMNS else f"json_extract(doc, '$.\"{k}\"')"
+            if v is None:
+                clauses.append(f'{col} IS NULL')
+            else:
+                clauses.append(f'{col} = ?')
+                params.append(_column_value(v) if k in COLUMNS else v)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    @staticmethod
+    def _row(doc):
+        return [_column_value(doc.get(c)) for c in COLUMNS] + [json.dumps(doc, default=str)]
+
+    # ---------- reads ----------
+    def find(self, name, match=None, order_by=None, desc=False, limit=None, offset=0, after=None):
+        """Records matching `match`, in insertion order or by `order_by` columns.
+
+        `after` is a keyset cursor: the `order_by` values of the last record
+        already returned.
+        """
+        where, params = self._where(match)
+        order = 'pk'
+        if order_by:
+            cols = ', '.join(order_by)
+            direction = ' DESC' if desc else ''
+            order = ', '.join(c + direction for c in order_by)
+            if after:
+                marks = ', '.join('?' * len(order_by))
+                where += (' AND ' if where else ' WHERE ') + f'({cols}) {"<" if desc else ">"} ({marks})'
+                params += [_column_value(v) for v in after]
+        sql = f'SELECT doc FROM {name}{where} ORDER BY {order}'
+        if limit is not None or offset:
+            sql += ' LIMIT ? OFFSET ?'
+            params += [-1 if limit is None else limit, offset]
+        conn = self._conn()
+        self._create(conn, name)
+        rows = conn.execute(sql, params)
+        return [json.loads(r[0]) for r in rows]
+
+    def find_one(self, name, match):
+        where, params = self._where(match)
+        conn = self._conn()
+        self._create(conn, name)
+        row = conn.execute(f'SELECT doc FROM {name}{where} ORDER BY pk LIMIT 1', params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def versions(self, names):
+        """(token, last modified timestamp) of the change counters for `names`."""
+        marks = ', '.join('?' * len(names))
+        rows = dict((r[0], r[1:]) for r in self._conn().execute(
+            f'SELECT name, v, modified FROM _versions WHERE name IN ({marks})', list(names)))
+        token = '.'.join(str(rows.get(n, (0,))[0]) for n in names)
+        stamps = [rows[n][1] for n in names if n in rows]
+        return token, max(stamps) if stamps else None
+
+    def dump(self):
+        """Whole database as one dict, in the same shape as database.json."""
+        return {name: self.find(name) for name in sorted(self._tables)}
+
+    # ---------- writes ----------
+    def apply(self, op):
+        """Apply one Database mutation record (insert/update/upsert/delete)."""
+        name, kind = op['coll'], op['op']
+        with self._tx() as conn:
+            self._create(conn, name)
+            if kind == 'insert':
+                self._insert(conn, name, op['doc'])
+                self._bump(conn, name)
+                return True
+            where, params = self._where(op.get('match'))
+            if kind == 'delete':
+                if conn.execute(f'DELETE FROM {name}{where}', params).rowcount == 0:
+                    return False
+                self._bump(conn, name)
+                return True
+            row = conn.execute(f'SELECT pk, doc FROM {name}{where} ORDER BY pk LIMIT 1', params).fetchone()
+            if kind == 'update':
+                if not row:
+                    return False
+                doc = dict(json.loads(row[1]), **op['changes'])
+            elif kind == 'upsert':
+                if not row:
+                    self._insert(conn, name, op['doc'])
+                    self._bump(conn, name)
+                    return True
+                doc = op['doc']
+            else:
+                raise ValueError(f"unknown op: {kind}")
+            sets = ', '.join(f'{c} = ?' for c in COLUMNS + ('doc',))
+            conn.execute(f'UPDATE {name} SET {sets} WHERE pk = ?', self._row(doc) + [row[0]])
+            self._bump(conn, name)
+            return True
+
+    @staticmethod
+    def _bump(conn, name):
+        conn.execute('INSERT INTO _versions (name, v, modified) VALUES (?, 1, ?) '
+                     'ON CONFLICT(name) DO UPDATE SET v = v + 1, modified = excluded.modified',
+                     (name, time.time()))
+
+    def _insert(self, conn, name, doc):
+        # like JSON mode, inserting an id that exists replaces that record in place
+        if doc.get('id') is not None:
+            row = conn.execute(f'SELECT pk FROM {name} WHERE id = ? ORDER BY pk LIMIT 1',
+                               (_column_value(doc['id']),)).fetchone()
+            if row:
+                sets = ', '.join(f'{c} = ?' for c in COLUMNS + ('doc',))
+                conn.execute(f'UPDATE {name} SET {sets} WHERE pk = ?', self._row(doc) + [row[0]])
+                return
+        cols = ', '.join(COLUMNS + ('doc',))
+        marks = ', '.join('?' * (len(COLUMNS) + 1))
+        conn.execute(f'INSERT INTO {name} ({cols}) VALUES ({marks})', self._row(doc))
+
+    def replace_all(self, data):
+        """Replace every table with the collections in `data` (one transaction)."""
+        with self._tx() as conn:
+            for name, items in data.items():
+                self._create(conn, name)
+                conn.execute(f'DELETE FROM {name}')
+                for doc in items:
+                    self._insert(conn, name, doc)
+                self._bump(conn, name)
+
+
+class _Transaction:
+    """`with` block that runs as one IMMEDIATE transaction (reentrant per thread)."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        if not self.conn.in_transaction:
+            self.conn.execute('BEGIN IMMEDIATE')
+            self.owner = True
+        else:
+            self.owner = False
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.owner:
+            self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+def _column_value(v):
+    if v is None or isinstance(v, str):
+        return v
+    if isinstance(v, bool):
+        return 'true' if v else 'false'
+    return str(v)
+
+
+def migrate_json_to_sqlite(json_path, sqlite_path):
+    """One-shot copy of database.json into a SQLite file. Returns row counts."""
+    with open(json_path, 'r') as f:
+        # '_versions' holds JSON mode's change counters, not records
+        data = {name: items for name, items in json.load(f).items() if not name.startswith('_')}
+    store = SQLiteStore(sqlite_path)
+    store.replace_all(data)
+    return {name: len(items) for name, items in data.items()}
@@ -0,0 +1,184 @@
+import re, time, logging, threading, unicodedata
+from bisect import bisect_left, insort
+
+log = logging.getLogger(__name__)
+WORD = re.compile(r'\w+')
+
+# What /api/suggest completes: per collection, the Database getter and
+# lister, the field shown as the suggestion, extra fields that can be typed
+# instead (matched from their start), the secondary text, and which
+# records anonymous visitors may see (students never).
+SOURCES = {
+    'students': {
+        'get': 'get_student', 'list': 'list_students',
+        'label': 'name', 'keys': ('student_id',), 'detail': 'student_id',
+        'public': lambda r: False,
+    },
+    'faculty': {
+        'get': 'get_faculty', 'list': 'list_faculty',
+        'label': 'name', 'keys': (), 'detail': 'role',
+        'public': lambda r: True,
+    },
+    'blogs': {
+        'get': 'get_blog', 'list': 'list_blogs', 'list_args': {'approved_only': False},
+        'label': 'title', 'keys': (), 'detail': 'author_name',
+        'public': lambda r: bool(r.get('approved')),
+    },
+}
+
+
+class Suggester:
+    """Prefix completion over names and titles, answered from memory.
+
+    Every label is folded (lowercase, accents dropped) and entered into
+    one sorted list under each of its words and under the whole label,
+    so "sha" finds both "Sharma, A." and "Prof. Shah". A lookup is a
+    bisect to the first entry >= the prefix and a short scan, and never
+    touches the Database. The list follows this process's writes through
+    on_db_change(); the first build, and a rebuild whenever another
+    worker's writes show up (a JSON reload) or the data is older than
+    `max_age` seconds, runs on a background thread while lookups keep
+    using the current list.
+    """
+
+    def __init__(self, db, sources=SOURCES, max_age=300):
+        self.db = db
+        self.sources = sources
+        self.max_age = max_age
+        self._entries = []   # sorted (folded term, folded label, coll, id)
+        self._items = {}     # (coll, id) -> (entries, suggestion dict, public)
+        self._built = None   # monotonic time of the last full build
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._stats = {'lookups': 0, 'rebuilds': 0, 'updates': 0}
+        self._rebuild_later()
+
+    # ---------- lookups ----------
+    def suggest(self, prefix, limit=8, colls=None, public_only=True):
+        """Up to `limit` suggestion dicts whose label or key starts with `prefix`."""
+        if self._built is None:
+            return []  # first build still running
+        if time.monotonic() - self._built > self.max_age:
+            self._rebuild_later()
+        prefix = fold(prefix)
+        if not prefix:
+            return []
+        found, seen = [], set()
+        with self._lock:
+            self._stats['lookups'] += 1
+            entries = self._entries
+            i = bisect_left(entries, (prefix,))
+            while i < len(entries) and len(found) < limit:
+                term, _, coll, rid = entries[i]
+                if not term.startswith(prefix):
+                    break
+                i += 1
+                if (coll, rid) in seen or (colls and coll not in colls):
+                    continue
+                seen.add((coll, rid))
+                _, item, public = self._items[(coll, rid)]
+                if public or not public_only:
+                    found.append(item)
+        return found
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), items=len(self._items))
+
+    # ---------- keeping up with the database ----------
+    def on_db_change(self, coll, action, args):
+        """Database.on_change listener: update the record that changed."""
+        if coll is None:
+            self._rebuild_later()
+            return
+        source = self.sources.get(coll)
+        if source is None:
+            return
+        if self._built is None:
+            self._stats['updates'] += 1  # the first build goes again
+            return
+        if not args:
+            self._rebuild_later()
+            return
+        if action == 'add' and isinstance(args[0], dict):
+            record = args[0]
+        elif action == 'delete':
+            record = None
+        else:
+            record = getattr(self.db, source['get'])(args[0])
+        rid = record.get('id') if record else args[0]
+        with self._lock:
+            self._drop(coll, rid)
+            if record is not None:
+                self._add(coll, record)
+            self._stats['updates'] += 1
+
+    def rebuild(self):
+        """Re-read every source collection and swap in a fresh list."""
+        entries, items = [], {}
+        for coll, source in self.sources.items():
+            for record in getattr(self.db, source['list'])(**source.get('list_args', {})):
+                made = self._entry(coll, record)
+                if made:
+                    items[(coll, record['id'])] = made
+                    entries.extend(made[0])
+        entries.sort()
+        with self._lock:
+            self._entries, self._items = entries, items
+            self._built = time.monotonic()
+            self._stats['rebuilds'] += 1
+
+    def _rebuild_later(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def run():
+            try:
+                while True:
+                    # writes applied to the old list while this one was
+                    # being read may be missing from it: go again
+                    updates = self._stats['updates']
+                    self.rebuild()
+                    if self._stats['updates'] == updates:
+                        break
+            except Exception as e:
+                log.warning("Could not rebuild suggestions: %s", e)
+            finally:
+                self._rebuilding = False
+        threading.Thread(target=run, name='suggest-rebuild', daemon=True).start()
+
+    def _entry(self, coll, record):
+        """(entries, suggestion, public) for a record, or None if it has no label."""
+        source = self.sources[coll]
+        label = str(record.get(source['label']) or '').strip()
+        if not label or record.get('id') is None:
+            return None
+        folded = fold(label)
+        terms = {folded, *WORD.findall(folded)}
+        terms.update(fold(str(record[k])) for k in source.get('keys', ()) if record.get(k))
+        rid = record['id']
+        item = {'type': coll, 'id': rid, 'label': label, 'detail': record.get(source['detail']) or ''}
+        return [(t, folded, coll, rid) for t in terms if t], item, source['public'](record)
+
+    def _add(self, coll, record):
+        made = self._entry(coll, record)
+        if made:
+            self._items[(coll, record['id'])] = made
+            for entry in made[0]:
+                insort(self._entries, entry)
+
+    def _drop(self, coll, rid):
+        made = self._items.pop((coll, rid), None)
+        if made:
+            for entry in made[0]:
+                i = bisect_left(self._entries, entry)
+                if i < len(self._entries) and self._entries[i] == entry:
+                    del self._entries[i]
+
+
+def fold(text):
+    """Lowercase `text` and strip accents, for accent-insensitive matching."""
+    text = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(ch for ch in text if not unicodedata.combining(ch)).strip()
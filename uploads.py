@@ -0,0 +1,494 @@
+import os, io, re, time, shutil, hashlib, tempfile, mimetypes
+from collections import Counter
+from flask import Request, Response, current_app, send_file, abort
+from werkzeug import formparser
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from werkzeug.security import safe_join
+from werkzeug.urls import url_quote
+from werkzeug.datastructures import FileStorage
+from werkzeug.sansio.multipart import MultipartDecoder, Data, Epilogue, Field, File, NeedData
+from werkzeug.utils import secure_filename
+
+CHUNK_SIZE = 64 * 1024
+# Seconds a blob is kept after it was last saved even if nothing refers to
+# it: the request that saved it may not have written its record yet.
+GRACE = 3600
+
+# Leading bytes every file of a given extension starts with.
+SIGNATURES = {
+    'png': (b'\x89PNG\r\n\x1a\n',),
+    'jpg': (b'\xff\xd8\xff',),
+    'jpeg': (b'\xff\xd8\xff',),
+    'gif': (b'GIF87a', b'GIF89a'),
+    'pdf': (b'%PDF-',),
+    'doc': (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1',),
+    'docx': (b'PK\x03\x04',),
+}
+# File names that are never reused for other content: a SHA-256 digest (plus
+# a -<width>w suffix for resized copies) or the uuid prefix of older uploads.
+IMMUTABLE_NAME = re.compile(r'^(?P<digest>[0-9a-f]{64})(-\d+w)?\.|^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}-')
+SNIFF_BYTES = max(len(sig) for sigs in SIGNATURES.values() for sig in sigs)
+# Photos are often saved under the wrong image extension (a PNG named .jpg);
+# browsers and Pillow go by content, so any image type passes for another.
+IMAGE_SIGNATURES = tuple({sig for ext in ('png', 'jpg', 'gif') for sig in SIGNATURES[ext]})
+
+
+class UploadStore:
+    """Content-addressed store for user uploads (static/uploads).
+
+    A file is stored once, as <sha256 of its bytes>.<ext>, however many
+    records use it: the digest is computed while the upload is streamed to
+    a temp file, and if a blob with that name already exists the copy is
+    dropped. Records keep referring to blobs by path ('/uploads/<name>');
+    a blob's reference count is the number of record fields naming it, and
+    release() / gc() delete blobs whose count has dropped to zero.
+    """
+
+    def __init__(self, root, url_prefix='/uploads/'):
+        self.root = root
+        self.url_prefix = url_prefix
+        os.makedirs(root, exist_ok=True)
+
+    # ---------- writes ----------
+    def save(self, storage):
+        """Store a werkzeug FileStorage and return its public path."""
+        if isinstance(storage.stream, UploadSink) and storage.stream.store is self:
+            return self._commit(storage.stream)
+        h = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix='.upload-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = storage.stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    h.update(chunk)
+                    out.write(chunk)
+            name = h.hexdigest() + _extension(storage.filename)
+            dest = os.path.join(self.root, name)
+            if os.path.exists(dest):
+                os.remove(tmp)
+                os.utime(dest)  # restart the gc grace period
+            else:
+                os.chmod(tmp, 0o644)
+                os.replace(tmp, dest)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return self.url_prefix + name
+
+    def _commit(self, sink):
+        """Move a file the request parser already streamed and hashed into place."""
+        name = sink.hexdigest() + _extension(sink.filename)
+        dest = os.path.join(self.root, name)
+        sink.file.close()
+        if os.path.exists(dest):
+            os.remove(sink.path)
+            os.utime(dest)
+        else:
+            os.chmod(sink.path, 0o644)
+            os.replace(sink.path, dest)
+        sink.path = None
+        return self.url_prefix + name
+
+    def request_class(self, limits=None, types=None):
+        """A Flask request class whose file uploads stream into this store.
+
+        `limits` maps endpoint names to a body size cap in bytes; other
+        endpoints use MAX_CONTENT_LENGTH. A request whose Content-Length is
+        over the cap is refused before any of it is read.
+
+        `types` maps endpoint names to the file extensions they accept; a
+        file of any other type is refused with 415 as soon as its part
+        starts. Other endpoints accept any type. Either way, a file whose
+        extension is in SIGNATURES must start with the matching bytes.
+        """
+        store, limits = self, dict(limits or {})
+        types = {endpoint: frozenset(exts) for endpoint, exts in (types or {}).items()}
+
+        class UploadRequest(Request):
+            form_data_parser_class = _FormDataParser
+
+            @property
+            def max_content_length(self):
+                return limits.get(self.endpoint, current_app.config['MAX_CONTENT_LENGTH'])
+
+            def _load_form_data(self):
+                # Werkzeug reads and discards the rest of a refused body; an
+                # oversized upload is turned away without reading any of it
+                limit = self.max_content_length
+                if 'form' not in self.__dict__ and limit is not None and (self.content_length or 0) > limit:
+                    raise RequestEntityTooLarge()
+                super()._load_form_data()
+
+            def _get_stream_for_parsing(self):
+                self._body = _RequestBody(super()._get_stream_for_parsing())
+                return self._body
+
+            def _get_file_stream(self, total_content_length, content_type,
+                                 filename=None, content_length=None):
+                if not filename:  # empty file input
+                    return io.BytesIO()
+                return UploadSink(store, filename, self.max_content_length, self._body,
+                                  types.get(self.endpoint))
+
+        return UploadRequest
+
+    # ---------- serving ----------
+    def send(self, filename, accel_prefix=None):
+        """Response serving the upload at `filename` (relative to the store root).
+
+        Names in IMMUTABLE_NAME are cached for a year without revalidation;
+        anything else must be revalidated by ETag. send_file answers Range
+        requests (206, for PDF viewers) and If-None-Match (304). With
+        `accel_prefix` the file itself is left to nginx: the response only
+        carries X-Accel-Redirect: <accel_prefix>/<filename>, which must be an
+        `internal` location aliasing the store root, and the cache headers.
+        """
+        path = safe_join(self.root, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        match = IMMUTABLE_NAME.match(os.path.basename(filename))
+        if accel_prefix:
+            resp = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+            resp.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + url_quote(filename)
+        else:
+            etag = match.group(0).rstrip('.') if match and match.group('digest') else True
+            resp = send_file(path, conditional=True, etag=etag)
+            resp.accept_ranges = 'bytes'
+        if match:
+            resp.cache_control.no_cache = None
+            resp.cache_control.public = True
+            resp.cache_control.max_age = 365 * 24 * 3600
+            resp.cache_control.immutable = True
+        else:
+            resp.cache_control.no_cache = True
+        return resp
+
+    # ---------- reference counting ----------
+    def name_of(self, ref):
+        """Path under the store root that a record value refers to, or None.
+
+        Accepts every form stored over time: '/uploads/x.jpg',
+        '/static/uploads/alumni/x.jpg', 'uploads/past_csa/x.pdf' or a bare
+        file name.
+        """
+        if not isinstance(ref, str) or not ref or ref.startswith(('http://', 'https://')):
+            return None
+        if 'uploads/' in ref:
+            ref = ref.split('uploads/', 1)[1]
+        elif '/' in ref or '.' not in ref or any(c.isspace() for c in ref):
+            return None
+        ref = os.path.normpath(ref.split('?', 1)[0])
+        if ref.startswith(('.', os.sep)):
+            return None
+        return ref if os.path.isfile(os.path.join(self.root, ref)) else None
+
+    def ref_counts(self, db):
+        """{name: number of record fields referring to it} across the database."""
+        counts = Counter()
+        for _, record in db.iter_records():
+            for value in _strings(record):
+                name = self.name_of(value)
+                if name:
+                    counts[name] += 1
+        return counts
+
+    def release(self, db, *refs, grace=GRACE):
+        """Delete the blobs behind `refs` that no record refers to any more.
+
+        `refs` are paths or whole records (every field is checked). Call
+        after the record holding them was deleted or changed. A blob saved
+        within the last `grace` seconds is left for gc(): another request
+        may have just stored the same content and not written its record.
+        """
+        names = {n for ref in refs for n in map(self.name_of, _strings(ref)) if n}
+        if not names:
+            return []
+        counts = self.ref_counts(db)
+        cutoff = time.time() - grace
+        removed = []
+        for name in names:
+            path = os.path.join(self.root, name)
+            if not counts[name] and os.path.getmtime(path) <= cutoff:
+                os.remove(path)
+                removed.append(name)
+        return removed
+
+    def gc(self, db, grace=GRACE, dry_run=False):
+        """Delete every unreferenced file older than `grace` seconds.
+
+        The grace period keeps a file that was just uploaded, but whose
+        record is not written yet, from being collected.
+        """
+        counts = self.ref_counts(db)
+        cutoff = time.time() - grace
+        removed = []
+        for name in os.listdir(self.root):
+            # temp files of uploads interrupted by a crash
+            path = os.path.join(self.root, name)
+            if name.startswith('.upload-') and os.path.getmtime(path) < cutoff and not dry_run:
+                os.remove(path)
+        for name in self._files():
+            path = os.path.join(self.root, name)
+            if counts[name] or os.path.getmtime(path) > cutoff:
+                continue
+            if not dry_run:
+                os.remove(path)
+            removed.append(name)
+        return removed
+
+    def dedup(self, db):
+        """Move every legacy upload to its content address and repoint the records.
+
+        Byte-identical copies collapse into one blob. Returns {old: new}.
+        """
+        renames = {}
+        for name in self._files():
+            base = os.path.basename(name)
+            digest, ext = os.path.splitext(base)
+            if name == base and len(digest) == 64 and ext == ext.lower():
+                continue  # already content-addressed
+            path = os.path.join(self.root, name)
+            with open(path, 'rb') as f:
+                new = _digest(f).hexdigest() + _extension(base)
+            dest = os.path.join(self.root, new)
+            if not os.path.exists(dest):
+                # old and new name both stay valid until the records are repointed
+                try:
+                    os.link(path, dest)
+                except OSError:
+                    shutil.copy2(path, dest)
+            renames[name] = new
+        if not renames:
+            return renames
+
+        def repoint(value):
+            name = self.name_of(value)
+            if name not in renames:
+                return value
+            return value[:len(value) - len(value.split('uploads/', 1)[-1])] + renames[name]
+        db.rewrite_strings(repoint)
+        for name in renames:
+            os.remove(os.path.join(self.root, name))
+        return renames
+
+    def _files(self):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            for f in filenames:
+                if not f.startswith('.'):
+                    yield os.path.relpath(os.path.join(dirpath, f), self.root)
+
+
+class UploadSink:
+    """Where the multipart parser writes an uploaded file.
+
+    Bytes go straight to a temp file in the store's directory while being
+    hashed, so UploadStore.save() only has to rename it, and memory use
+    does not grow with the file. The extension must be in `allowed` (if
+    given), and if it is one of SIGNATURES the first bytes must match it;
+    a file over `limit` bytes is cut off as soon as it crosses the limit. Unless saved, the temp file is
+    deleted when the request is closed.
+    """
+
+    def __init__(self, store, filename, limit=None, body=None, allowed=None):
+        ext = _extension(filename)[1:]
+        if allowed is not None and ext not in allowed:
+            _abandon(body)
+            raise UnsupportedMediaType(f'Files of type .{ext or "?"} cannot be uploaded.')
+        self.store = store
+        self.filename = filename
+        self.limit = limit
+        self.body = body
+        self.size = 0
+        self._ext = ext
+        self._head = b''
+        self._checked = ext not in SIGNATURES  # nothing to sniff
+        self._hash = hashlib.sha256()
+        fd, self.path = tempfile.mkstemp(dir=store.root, prefix='.upload-', suffix='.tmp')
+        self.file = os.fdopen(fd, 'w+b')
+
+    def write(self, data):
+        self.size += len(data)
+        if self.limit is not None and self.size > self.limit:
+            self.close()
+            _abandon(self.body)
+            raise RequestEntityTooLarge(f'{self.filename} is larger than {self.limit // (1024 * 1024)} MB.')
+        if not self._checked:
+            self._head += data[:SNIFF_BYTES - len(self._head)]
+            if len(self._head) == SNIFF_BYTES:
+                self._sniff()
+        self._hash.update(data)
+        return self.file.write(data)
+
+    def _sniff(self):
+        self._checked = True
+        allowed = IMAGE_SIGNATURES if SIGNATURES[self._ext][0] in IMAGE_SIGNATURES else SIGNATURES[self._ext]
+        if not self._head.startswith(allowed):
+            self.close()
+            _abandon(self.body)
+            raise UnsupportedMediaType(f'{self.filename} is not a valid .{self._ext} file.')
+
+    def seek(self, offset, whence=0):
+        # the parser rewinds once the part is complete: check short files now
+        if not self._checked:
+            self._sniff()
+        return self.file.seek(offset, whence)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def __getattr__(self, name):  # read, readline, tell, ... of the temp file
+        return getattr(self.file, name)
+
+    def close(self):
+        self.file.close()
+        if self.path:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+
+class _RequestBody:
+    """Request stream as handed to the form parser.
+
+    The parser drains whatever is left of the body when it stops; after an
+    upload was refused (abandoned) the rest is left unread instead.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.abandoned = False
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    def exhaust(self):
+        if self.abandoned:
+            return
+        exhaust = getattr(self.stream, 'exhaust', None)
+        if exhaust is not None:
+            exhaust()
+        else:
+            while self.stream.read(CHUNK_SIZE):
+                pass
+
+
+def _abandon(body):
+    if body is not None:
+        body.abandoned = True
+
+
+class _MultipartDecoder(MultipartDecoder):
+    """Werkzeug's multipart decoder with bounded buffering of file data.
+
+    While no boundary is in sight the stock decoder hands out file data only
+    up to the buffer's last line break, in case the boundary starts there;
+    a file whose last line break came early (a PDF header, then binary
+    without one) is therefore held in memory whole. A boundary cut off by
+    the end of the buffer can only start in its last few bytes.
+    """
+
+    def last_newline(self):
+        if self.buffer.find(b'--' + self.boundary) != -1:
+            return super().last_newline()
+        start = max(0, len(self.buffer) - len(self.boundary) - 8)
+        breaks = [i for i in (self.buffer.find(b'\r', start), self.buffer.find(b'\n', start)) if i != -1]
+        return min(breaks, default=len(self.buffer))
+
+
+
+class _MultiPartParser(formparser.MultiPartParser):
+    """Werkzeug's multipart parser, driving _MultipartDecoder.
+
+    Werkzeug 2.2 names its decoder class inside parse(), so the event loop
+    is repeated here rather than swapping the class module-wide.
+    """
+
+    def parse(self, stream, boundary, content_length):
+        decoder = _MultipartDecoder(boundary, self.max_form_memory_size, max_parts=self.max_form_parts)
+        fields, files = [], []
+        container = None
+        remaining = content_length
+        try:
+            while True:
+                size = self.buffer_size if remaining is None else min(self.buffer_size, remaining)
+                data = stream.read(size) if size else b''
+                if remaining is not None:
+                    remaining -= len(data)
+                decoder.receive_data(data or None)  # None: end of the body
+                event = decoder.next_event()
+                while not isinstance(event, (Epilogue, NeedData)):
+                    if isinstance(event, Field):
+                        part, container = event, []
+                        write = container.append
+                    elif isinstance(event, File):
+                        part, container = event, self.start_file_streaming(event, content_length)
+                        write = container.write
+                    elif isinstance(event, Data):
+                        write(event.data)
+                        if not event.more_data:
+                            if isinstance(part, Field):
+                                value = b''.join(container).decode(self.get_part_charset(part.headers), self.errors)
+                                fields.append((part.name, value))
+                            else:
+                                container.seek(0)
+                                files.append((part.name, FileStorage(container, part.filename, part.name,
+                                                                     headers=part.headers)))
+                            container = None
+                    event = decoder.next_event()
+                if not data:
+                    return self.cls(fields), self.cls(files)
+        except BaseException:
+            # a part was refused or the body is malformed: drop the temp
+            # files of the parts already received and of the current one
+            for _, storage in files:
+                storage.stream.close()
+            if container is not None and hasattr(container, 'close'):
+                container.close()
+            raise
+
+
+class _FormDataParser(formparser.FormDataParser):
+    """Form parser of UploadStore.request_class(): multipart goes through _MultiPartParser."""
+
+    @formparser.exhaust_stream
+    def _parse_multipart(self, stream, mimetype, content_length, options):
+        parser = _MultiPartParser(self.stream_factory, self.charset, self.errors,
+                                  max_form_memory_size=self.max_form_memory_size, cls=self.cls,
+                                  max_form_parts=self.max_form_parts)
+        boundary = options.get('boundary', '').encode('ascii')
+        if not boundary:
+            raise ValueError('Missing boundary')
+        form, files = parser.parse(stream, boundary, content_length)
+        return stream, form, files
+
+    parse_functions = dict(formparser.FormDataParser.parse_functions,
+                           **{'multipart/form-data': _parse_multipart})
+
+
+def _extension(filename):
+    name = secure_filename(filename or '')
+    return ('.' + name.rsplit('.', 1)[1].lower()) if '.' in name else ''
+
+
+def _digest(f):
+    h = hashlib.sha256()
+    for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+        h.update(chunk)
+    return h
+
+
+def _strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from _strings(v)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            yield from _strings(v)
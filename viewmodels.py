@@ -0,0 +1,35 @@
+_set = object.__setattr__
+
+
+class View:
+    """Read-only attribute access to a record dict, for templates.
+
+    `View(record, created_at=dt)` lets a template write {{ post.title }}
+    without building a class per row. The record itself becomes the
+    instance __dict__, so it is wrapped rather than copied (keyword
+    overrides go into a merged copy) and attribute lookups take
+    CPython's plain instance-dict path. A missing field raises
+    AttributeError, which Jinja renders as undefined, and
+    getattr(view, name, default) works as for any object. Assigning an
+    attribute raises, so a view never writes into a cached record.
+    """
+
+    def __init__(self, data=None, **overrides):
+        if data is None:
+            data = {}
+        _set(self, '__dict__', {**data, **overrides} if overrides else data)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __getitem__(self, key):
+        return self.__dict__[key]
+
+    def __contains__(self, key):
+        return key in self.__dict__
+
+    def __repr__(self):
+        return f"View({self.__dict__!r})"